@@ -1,2 +1,2 @@
 from app.db.base_class import Base
-from app.models import User, Document 
\ No newline at end of file
+from app.models import User, Document, StorageBlob 
\ No newline at end of file
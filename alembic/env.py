@@ -4,6 +4,7 @@ from sqlalchemy import pool
 from alembic import context
 from app.core.config import settings
 from app.db.base_class import Base
+from app.models.search import CONTENT_TABLE, SEARCH_TABLE
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -26,6 +27,12 @@ target_metadata = Base.metadata
 def get_url():
     return settings.DATABASE_URL
 
+def include_name(name, type_, parent_names):
+    # Os índices de busca (e as tabelas internas do FTS5) são mantidos fora do ORM
+    if type_ == "table" and name is not None:
+        return not name.startswith((SEARCH_TABLE, CONTENT_TABLE))
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -44,6 +51,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -67,7 +75,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,66 @@
+"""create users and documents
+
+Revision ID: 5d9e1c3b7a20
+Revises:
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9e1c3b7a20'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Bancos criados antes das migrações (create_all do esquema original) já
+    # têm as duas tabelas: seguem direto para as revisões seguintes
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('users') and inspector.has_table('documents'):
+        return
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_full_name', 'users', ['full_name'])
+
+    op.create_table(
+        'documents',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('original_filename', sa.String(), nullable=False),
+        sa.Column('storage_filename', sa.String(), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        # Mesmo nome que o Postgres dá à constraint; 3f1c2a9d8e7b a remove por ele
+        sa.UniqueConstraint('storage_filename', name='documents_storage_filename_key'),
+    )
+    op.create_index('ix_documents_id', 'documents', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_id', table_name='documents')
+    op.drop_table('documents')
+    op.drop_index('ix_users_full_name', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
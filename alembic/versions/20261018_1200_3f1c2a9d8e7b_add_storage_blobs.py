@@ -0,0 +1,72 @@
+"""add storage_blobs and allow shared storage_filename
+
+Revision ID: 3f1c2a9d8e7b
+Revises: 5d9e1c3b7a20
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8e7b'
+down_revision = '5d9e1c3b7a20'
+branch_labels = None
+depends_on = None
+
+
+def _documents_table(unique_storage_filename: bool) -> sa.Table:
+    # Definição explícita usada pelo modo batch do SQLite, que não consegue
+    # remover a constraint UNIQUE sem nome criada por unique=True
+    return sa.Table(
+        'documents',
+        sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('original_filename', sa.String(), nullable=False),
+        sa.Column('storage_filename', sa.String(), nullable=False, unique=unique_storage_filename),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'storage_blobs',
+        sa.Column('storage_filename', sa.String(), primary_key=True),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table(
+            'documents', copy_from=_documents_table(False), recreate='always'
+        ) as batch_op:
+            # A tabela recriada a partir de copy_from não herda os índices existentes
+            batch_op.create_index('ix_documents_id', ['id'])
+            batch_op.create_index('ix_documents_storage_filename', ['storage_filename'])
+    else:
+        op.drop_constraint('documents_storage_filename_key', 'documents', type_='unique')
+        op.create_index('ix_documents_storage_filename', 'documents', ['storage_filename'])
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        op.drop_index('ix_documents_storage_filename', table_name='documents')
+        with op.batch_alter_table(
+            'documents', copy_from=_documents_table(True), recreate='always'
+        ) as batch_op:
+            batch_op.create_index('ix_documents_id', ['id'])
+    else:
+        op.drop_index('ix_documents_storage_filename', table_name='documents')
+        op.create_unique_constraint(
+            'documents_storage_filename_key', 'documents', ['storage_filename']
+        )
+
+    op.drop_table('storage_blobs')
@@ -0,0 +1,25 @@
+"""add composite index for keyset listing of documents per user
+
+Revision ID: 8b2d4e6f1a3c
+Revises: 3f1c2a9d8e7b
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6f1a3c'
+down_revision = '3f1c2a9d8e7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_documents_user_created_id', 'documents', ['user_id', 'created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_created_id', table_name='documents')
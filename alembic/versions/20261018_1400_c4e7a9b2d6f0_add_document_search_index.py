@@ -0,0 +1,73 @@
+"""add full-text search index for documents
+
+Revision ID: c4e7a9b2d6f0
+Revises: 8b2d4e6f1a3c
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a9b2d6f0'
+down_revision = '8b2d4e6f1a3c'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLE = 'document_search'
+
+SQLITE_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description, original_filename, owner,
+        tokenize = 'unicode61 remove_diacritics 2', detail = column
+    )
+    """,
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+        document_id INTEGER PRIMARY KEY REFERENCES documents (id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        search_vector TSVECTOR NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_vector ON {SEARCH_TABLE} USING GIN (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_user_id ON {SEARCH_TABLE} (user_id)",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+        bind.execute(sa.text(f"""
+            INSERT INTO {SEARCH_TABLE} (document_id, user_id, search_vector)
+            SELECT id, user_id,
+                setweight(to_tsvector(CAST(:config AS regconfig), unaccent(coalesce(title, ''))), 'A') ||
+                setweight(to_tsvector(CAST(:config AS regconfig), unaccent(coalesce(description, ''))), 'B') ||
+                setweight(to_tsvector(CAST(:config AS regconfig), unaccent(
+                    regexp_replace(coalesce(original_filename, ''), '[^[:alnum:]]+', ' ', 'g')
+                )), 'C')
+            FROM documents
+            ON CONFLICT (document_id) DO NOTHING
+        """), {"config": settings.SEARCH_PG_CONFIG})
+    else:
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        op.execute(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, original_filename, owner)
+            SELECT id, coalesce(title, ''), coalesce(description, ''),
+                coalesce(original_filename, ''), 'u' || user_id
+            FROM documents
+        """)
+
+
+def downgrade() -> None:
+    op.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
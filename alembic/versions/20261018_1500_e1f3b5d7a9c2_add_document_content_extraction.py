@@ -0,0 +1,61 @@
+"""add extracted content index and extraction status
+
+Revision ID: e1f3b5d7a9c2
+Revises: c4e7a9b2d6f0
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f3b5d7a9c2'
+down_revision = 'c4e7a9b2d6f0'
+branch_labels = None
+depends_on = None
+
+CONTENT_TABLE = 'document_content'
+
+
+def upgrade() -> None:
+    op.create_table(
+        'document_extractions',
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('storage_filename', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('chunk_count', sa.Integer(), nullable=False),
+        sa.Column('char_count', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('extracted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('document_id')
+    )
+
+    # O conteúdo é indexado depois, em lotes: python -m app.db.migrations.reindex_document_content
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CONTENT_TABLE} (
+                document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                search_vector TSVECTOR NOT NULL,
+                PRIMARY KEY (document_id, chunk_index)
+            )
+        """)
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{CONTENT_TABLE}_vector ON {CONTENT_TABLE} USING GIN (search_vector)"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{CONTENT_TABLE}_user_id ON {CONTENT_TABLE} (user_id)")
+    else:
+        op.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {CONTENT_TABLE} USING fts5(
+                content, owner,
+                tokenize = 'unicode61 remove_diacritics 2', detail = column
+            )
+        """)
+
+
+def downgrade() -> None:
+    op.execute(f"DROP TABLE IF EXISTS {CONTENT_TABLE}")
+    op.drop_table('document_extractions')
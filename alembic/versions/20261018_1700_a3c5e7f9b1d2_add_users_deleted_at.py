@@ -0,0 +1,24 @@
+"""add users.deleted_at for batched account deletion
+
+Revision ID: a3c5e7f9b1d2
+Revises: f2a4c6e8b0d1
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d2'
+down_revision = 'f2a4c6e8b0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'deleted_at')
@@ -0,0 +1,39 @@
+"""add per-user storage usage counters
+
+Revision ID: b4d6f8a0c2e3
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c2e3'
+down_revision = 'a3c5e7f9b1d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_usage',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('document_count', sa.Integer(), nullable=False),
+        sa.Column('bytes_used', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    # Contadores iniciais a partir dos documentos existentes
+    op.execute("""
+        INSERT INTO user_usage (user_id, document_count, bytes_used, updated_at)
+        SELECT user_id, COUNT(*), COALESCE(SUM(file_size), 0), CURRENT_TIMESTAMP
+        FROM documents
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_usage')
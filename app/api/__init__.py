@@ -1,6 +1 @@
-from app.api import auth, documents, users
-
-
-
-
-
+from app.api import auth, users
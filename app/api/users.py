@@ -1,6 +1,7 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.models import User
 from app.schemas import user
@@ -10,26 +11,26 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[user.User])
 async def read_users(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
 ) -> Any:
     """
     Retrieve users.
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.scalars(select(User).offset(skip).limit(limit))).all()
     return users
 
 @router.get("/{user_id}", response_model=user.User)
 async def read_user(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int,
 ) -> Any:
     """
     Get user by ID.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,14 +41,14 @@ async def read_user(
 @router.put("/{user_id}", response_model=user.User)
 async def update_user(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int,
     user_in: user.UserUpdate,
 ) -> Any:
     """
     Update user.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -55,42 +56,42 @@ async def update_user(
         )
     for field, value in user_in.dict(exclude_unset=True).items():
         if field == "password" and value:
-            value = security.get_password_hash(value)
+            value = await security.hash_password(value)
         setattr(user, field, value)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.delete("/{user_id}", response_model=user.User)
 async def delete_user(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int,
 ) -> Any:
     """
     Delete user.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return user
 
 @router.post("/", response_model=user.User)
 async def create_user(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_in: user.UserCreate,
 ) -> Any:
     """
     Create new user.
     """
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = await db.scalar(select(User).where(User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -98,10 +99,10 @@ async def create_user(
         )
     user = User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await security.hash_password(user_in.password),
         full_name=user_in.full_name
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user 
\ No newline at end of file
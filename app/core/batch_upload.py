@@ -0,0 +1,144 @@
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
+from typing import AsyncIterator, List, NamedTuple, Optional, Sequence
+import asyncio
+import io
+import logging
+import mimetypes
+import posixpath
+import tarfile
+import zipfile
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.core.storage import LOCAL_POOL, FileTooLargeError, save_upload_file
+
+logger = logging.getLogger(__name__)
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class TooManyFilesError(Exception):
+    """O lote tem mais arquivos que BATCH_UPLOAD_MAX_FILES."""
+
+    def __init__(self, max_files: int):
+        self.max_files = max_files
+        super().__init__(f"O envio excede o limite de {max_files} arquivos")
+
+
+class PendingUpload(NamedTuple):
+    file: UploadFile
+    # Membros de um tar compartilham a leitura do arquivo e são gravados um por vez
+    lock: Optional[asyncio.Lock] = None
+    # Arquivo que não pode ser lido (ex.: membro de zip protegido por senha)
+    error: Optional[str] = None
+
+
+class SavedUpload(NamedTuple):
+    original_filename: str
+    storage_filename: Optional[str]
+    file_size: int
+    content_type: str
+    error: Optional[str] = None
+
+
+def _member_upload(stream, name: str, size: int) -> UploadFile:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return UploadFile(
+        file=stream,
+        size=size,
+        filename=posixpath.basename(name),
+        headers=Headers({"content-type": content_type})
+    )
+
+
+def _skipped(name: str) -> bool:
+    """Pastas e arquivos ocultos/de sistema (.DS_Store, __MACOSX/) não viram documentos."""
+    return any(part.startswith(".") or part == "__MACOSX" for part in name.split("/"))
+
+
+def _zip_members(archive: zipfile.ZipFile) -> List[PendingUpload]:
+    pending = []
+    for info in archive.infolist():
+        if info.is_dir() or _skipped(info.filename):
+            continue
+        if info.flag_bits & 0x1:
+            upload = _member_upload(io.BytesIO(), info.filename, 0)
+            pending.append(PendingUpload(upload, error="Arquivo protegido por senha"))
+            continue
+        # Membros do zip podem ser lidos em paralelo: o ZipFile serializa os acessos
+        pending.append(PendingUpload(_member_upload(archive.open(info), info.filename, info.file_size)))
+    return pending
+
+
+def _tar_members(archive: tarfile.TarFile, lock: asyncio.Lock) -> List[PendingUpload]:
+    return [
+        PendingUpload(_member_upload(archive.extractfile(member), member.name, member.size), lock)
+        for member in archive.getmembers()
+        if member.isfile() and not _skipped(member.name)
+    ]
+
+
+@asynccontextmanager
+async def expand_uploads(files: Sequence[UploadFile]) -> AsyncIterator[List[PendingUpload]]:
+    """
+    Lista os arquivos a gravar: os enviados e, no lugar de cada .zip/.tar,
+    os arquivos de dentro dele, lidos direto do arquivo compactado sem
+    extraí-lo antes. Os arquivos compactados ficam abertos até o fim do bloco.
+    """
+    async with AsyncExitStack() as stack:
+        pending: List[PendingUpload] = []
+        for file in files:
+            name = (file.filename or "").lower()
+            try:
+                if name.endswith(ZIP_EXTENSIONS):
+                    archive = await run_in_pool(LOCAL_POOL, zipfile.ZipFile, file.file)
+                    stack.callback(archive.close)
+                    pending.extend(await run_in_pool(LOCAL_POOL, _zip_members, archive))
+                elif name.endswith(TAR_EXTENSIONS):
+                    archive = await run_in_pool(LOCAL_POOL, tarfile.open, fileobj=file.file, mode="r:*")
+                    stack.callback(archive.close)
+                    pending.extend(await run_in_pool(LOCAL_POOL, _tar_members, archive, asyncio.Lock()))
+                else:
+                    pending.append(PendingUpload(file))
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError):
+                pending.append(PendingUpload(file, error="Arquivo compactado inválido"))
+            if len(pending) > settings.BATCH_UPLOAD_MAX_FILES:
+                raise TooManyFilesError(settings.BATCH_UPLOAD_MAX_FILES)
+        yield pending
+
+
+async def save_upload_files(
+    uploads: Sequence[PendingUpload],
+    concurrency: Optional[int] = None,
+    storage=None
+) -> List[SavedUpload]:
+    """
+    Grava vários arquivos com save_upload_file, até concurrency ao mesmo
+    tempo, e retorna o resultado de cada um na ordem recebida. A falha de
+    um arquivo fica no resultado dele e não interrompe os outros.
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.BATCH_UPLOAD_CONCURRENCY)
+
+    async def save(upload: PendingUpload) -> SavedUpload:
+        file = upload.file
+        content_type = file.content_type or "application/octet-stream"
+        if upload.error:
+            return SavedUpload(file.filename, None, 0, content_type, upload.error)
+        async with upload.lock or nullcontext(), semaphore:
+            try:
+                original_filename, storage_filename, file_size = await save_upload_file(
+                    file, storage=storage
+                )
+            except FileTooLargeError:
+                return SavedUpload(file.filename, None, 0, content_type, "Arquivo muito grande")
+            except Exception as e:
+                logger.exception("Erro ao salvar arquivo", extra={"filename": file.filename})
+                return SavedUpload(file.filename, None, 0, content_type, "Erro ao salvar o arquivo")
+        return SavedUpload(original_filename, storage_filename, file_size, content_type)
+
+    return list(await asyncio.gather(*(save(upload) for upload in uploads)))
+
@@ -13,14 +13,125 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./guarda_docs.db"
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
     
+    # Pool de conexões (por engine, em cada worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # segundos esperando uma conexão livre
+    DB_POOL_RECYCLE: int = 1800  # segundos até reabrir uma conexão
+    DB_POOL_PRE_PING: bool = True
+    
+    # SQLite: pragmas aplicados a cada conexão
+    SQLITE_JOURNAL_MODE: str = "wal"
+    SQLITE_SYNCHRONOUS: str = "normal"
+    SQLITE_BUSY_TIMEOUT: int = 5000  # ms esperando o lock de escrita
+    
     # Security
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     ALGORITHM: str = "HS256"
     
+    # Cache do usuário autenticado ("memory", "redis" ou "none")
+    USER_CACHE_BACKEND: str = "memory"
+    USER_CACHE_TTL: int = 60  # segundos
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    REDIS_URL: Optional[str] = None
+    
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    STORAGE_QUOTA_BYTES: int = 0  # Espaço máximo por usuário (soma dos arquivos); 0 = sem limite
+    USAGE_RECONCILE_INTERVAL: int = 24 * 60 * 60  # segundos entre reconciliações dos contadores de uso; 0 = só manual
+    USAGE_RECONCILE_BATCH_SIZE: int = 500  # Usuários conferidos por transação na reconciliação
+    BATCH_UPLOAD_MAX_FILES: int = 500  # Arquivos por envio em lote (contando os de dentro de .zip/.tar)
+    BATCH_UPLOAD_CONCURRENCY: int = 4  # Arquivos gravados ao mesmo tempo em cada envio em lote
+    EXPORT_MAX_DOCUMENTS: int = 1000  # Documentos escolhidos um a um por exportação (sem limite para "todos")
+    EXPORT_COMPRESSION_LEVEL: int = 6  # Nível do deflate nos ZIPs de exportação
+    EXPORT_COMPRESSION_MAX_WORKERS: int = 2  # Threads dedicadas à compressão das exportações
     UPLOAD_FOLDER: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB por leitura durante o upload
+    DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # 256KB por bloco enviado no download
+    STORAGE_DEDUP: bool = False  # Armazena arquivos pelo SHA-256, uma cópia por conteúdo
+    # Arquivos deduplicados gravados há menos que isso (segundos) não são apagados:
+    # um upload do mesmo conteúdo pode estar entre o rename e o commit
+    STORAGE_DEDUP_DELETE_GRACE: int = 10 * 60
+    UPLOAD_SHARD_DEPTH: int = 2  # Níveis de subdiretórios (2 caracteres hex cada) na pasta de uploads
+    DOCUMENTS_PAGE_SIZE: int = 50  # Documentos por página nas listagens
+    SEARCH_PG_CONFIG: str = "portuguese"  # Configuração de texto do Postgres usada na busca
+    
+    # Extração do conteúdo dos arquivos para a busca (em segundo plano)
+    EXTRACTION_MAX_WORKERS: int = 2  # Threads dedicadas à extração
+    EXTRACTION_MAX_FILE_SIZE: int = 50 * 1024 * 1024  # Arquivos maiores não são lidos
+    EXTRACTION_TIMEOUT: int = 60  # segundos por arquivo
+    EXTRACTION_MAX_CHARS: int = 1_000_000  # Texto além disso é ignorado
+    EXTRACTION_CHUNK_SIZE: int = 2000  # Caracteres por trecho indexado
+    
+    # Fila de jobs executados pelo worker.py ("database" ou "redis")
+    JOB_QUEUE_BACKEND: str = "database"
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF: int = 10  # segundos antes da 1ª nova tentativa; dobra a cada falha
+    JOB_RETRY_BACKOFF_MAX: int = 60 * 60
+    JOB_VISIBILITY_TIMEOUT: int = 5 * 60  # segundos até outro worker poder pegar o job
+    JOB_WORKER_CONCURRENCY: int = 4  # Jobs executados ao mesmo tempo por worker
+    JOB_POLL_INTERVAL: float = 1.0  # segundos entre consultas com a fila vazia
+    JOB_RETENTION_DAYS: int = 7  # Jobs concluídos são apagados depois disso
+    USER_PURGE_BATCH_SIZE: int = 1000  # Documentos apagados por transação ao excluir um usuário
+    
+    # Storage backend ("local" ou "s3")
+    STORAGE_TYPE: str = "local"
+    AWS_ACCESS_KEY_ID: Optional[str] = None
+    AWS_SECRET_ACCESS_KEY: Optional[str] = None
+    AWS_REGION: Optional[str] = None
+    AWS_BUCKET_NAME: Optional[str] = None
+    
+    # Limite de threads de E/S por backend de storage
+    STORAGE_LOCAL_MAX_WORKERS: int = 8
+    STORAGE_S3_MAX_WORKERS: int = 16
+    
+    # Hash de senhas: custo do bcrypt e threads dedicadas a ele
+    PASSWORD_HASH_ROUNDS: int = 12
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    
+    # S3: upload em partes e URLs pré-assinadas
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024  # A partir de 16MB usa multipart
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # Tamanho de cada parte (mínimo do S3: 5MB)
+    S3_MULTIPART_CONCURRENCY: int = 4  # Partes enviadas em paralelo por arquivo
+    S3_PRESIGNED_EXPIRES: int = 15 * 60  # Validade das URLs pré-assinadas, em segundos
+    S3_ENDPOINT_URL: Optional[str] = None  # Endpoint compatível com S3 (ex.: MinIO)
+    DIRECT_UPLOAD_TOKEN_EXPIRE_MINUTES: int = 24 * 60  # Prazo para concluir um upload direto
+    
+    # Entrega dos downloads depois da checagem de permissão:
+    # local: "app" (a aplicação envia os bytes), "x-accel" (nginx) ou "x-sendfile"
+    # s3: "app" ou "presigned" (redireciona para uma URL GET pré-assinada)
+    LOCAL_DOWNLOAD_DELIVERY: str = "app"
+    S3_DOWNLOAD_DELIVERY: str = "app"
+    X_ACCEL_REDIRECT_PREFIX: str = "/protected-uploads/"  # Location "internal" do nginx
+    S3_PRESIGNED_GET_EXPIRES: int = 60  # Validade da URL de download, em segundos
+    
+    # Logs da aplicação (stdout, escritos por uma thread a partir de uma fila)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" (um objeto por linha) ou "text"
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # Fração dos registros de DEBUG mantida (0 a 1)
+    
+    # Métricas do Prometheus (GET /metrics)
+    METRICS_ENABLED: bool = True
+    # Diretório compartilhado pelos workers do Hypercorn: /metrics soma os
+    # valores de todos. Deve ser esvaziado antes de iniciar o servidor.
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # segundos entre medições do atraso do event loop
+    
+    # Diagnóstico de consultas (log): lentas e repetidas numa requisição (N+1)
+    SLOW_QUERY_THRESHOLD: float = 0.5  # segundos; 0 desliga
+    # Inclui os valores (truncados) no log; podem conter dados pessoais.
+    # Mesmo ligado, senhas, hashes e tokens são mascarados.
+    SLOW_QUERY_LOG_PARAMETERS: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 10  # Execuções da mesma consulta numa requisição; 0 desliga
+    
+    # Perfil de requisições para diagnóstico (X-Profile: 1 de um admin ou por sorteio).
+    # Desligado, o middleware nem é instalado.
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fração das requisições perfiladas sem pedido explícito
+    PROFILING_INTERVAL: float = 0.005  # segundos entre leituras das pilhas
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 100  # Perfis mantidos; os mais antigos são apagados
     
     # Email
     SMTP_TLS: bool = True
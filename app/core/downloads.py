@@ -0,0 +1,283 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from urllib.parse import quote
+import os
+
+from fastapi import Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from app.models import Document
+
+# Função que produz os bytes do intervalo fechado [inicio, fim] do arquivo
+RangeOpener = Callable[[int, int], AsyncIterator[bytes]]
+
+# Acima disso o pedido é tratado como abuso e o arquivo é servido inteiro
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    """Nenhum dos intervalos pedidos cabe no arquivo."""
+
+
+def document_etag(document: Document) -> str:
+    """
+    Validador forte do conteúdo do documento.
+
+    O storage_filename muda sempre que o arquivo é substituído, então junto
+    com o tamanho identifica o conteúdo sem precisar ler o arquivo.
+    """
+    digest = sha1(f"{document.storage_filename}:{document.file_size}".encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def document_last_modified(document: Document) -> datetime:
+    last_modified = document.updated_at or document.created_at
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # Datas HTTP têm resolução de segundos
+    return last_modified.replace(microsecond=0)
+
+
+def parse_range_header(header: Optional[str], file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Interpreta o cabeçalho Range e retorna os intervalos (inicio, fim) inclusivos,
+    ordenados e sem sobreposição.
+
+    Retorna None quando o cabeçalho está ausente ou é inválido (o arquivo deve
+    ser servido inteiro) e lança RangeNotSatisfiable quando nenhum intervalo
+    cabe no arquivo.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, sep, end_str = part.partition("-")
+        if not sep:
+            return None
+        start_str, end_str = start_str.strip(), end_str.strip()
+        try:
+            if not start_str:
+                # Sufixo: os últimos N bytes
+                suffix = int(end_str)
+                if suffix <= 0:
+                    continue
+                start, end = max(file_size - suffix, 0), file_size - 1
+            else:
+                start = int(start_str)
+                if end_str:
+                    end = int(end_str)
+                    if end < start:
+                        return None
+                    end = min(end, file_size - 1)
+                else:
+                    end = file_size - 1
+        except ValueError:
+            return None
+        if start >= file_size or start < 0:
+            continue
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Avalia If-None-Match e, na falta dele, If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag, weak=True)
+    since = _parse_http_date(request.headers.get("if-modified-since"))
+    return since is not None and last_modified <= since
+
+
+def _if_range_matches(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # If-Range exige comparação forte
+        return _etag_matches(if_range, etag, weak=False)
+    since = _parse_http_date(if_range)
+    return since is not None and last_modified == since
+
+
+def content_disposition(filename: str, disposition_type: str = "attachment") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition_type}; filename*=utf-8''{quoted}"
+    return f'{disposition_type}; filename="{filename}"'
+
+
+def build_offload_response(
+    request: Request,
+    *,
+    etag: str,
+    last_modified: datetime,
+    filename: str,
+    media_type: Optional[str],
+    redirect_header: str,
+    redirect_target: str,
+) -> Response:
+    """
+    Entrega o arquivo ao proxy reverso (X-Accel-Redirect no nginx, X-Sendfile
+    no Apache/lighttpd). A aplicação só responde 304 quando pode; Range e a
+    transferência dos bytes ficam com o proxy.
+    """
+    headers = {
+        "etag": etag,
+        "last-modified": format_datetime(last_modified, usegmt=True),
+        "cache-control": "private, no-cache",
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["content-disposition"] = content_disposition(filename)
+    headers[redirect_header] = redirect_target
+    return Response(
+        content=b"",
+        headers=headers,
+        media_type=media_type or "application/octet-stream",
+    )
+
+
+async def _multipart_body(
+    open_range: RangeOpener,
+    ranges: List[Tuple[int, int]],
+    parts_headers: List[bytes],
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    for (start, end), part_header in zip(ranges, parts_headers):
+        yield part_header
+        async for chunk in open_range(start, end):
+            yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode("latin-1")
+
+
+def build_download_response(
+    request: Request,
+    *,
+    open_range: RangeOpener,
+    file_size: int,
+    etag: str,
+    last_modified: datetime,
+    filename: str,
+    media_type: Optional[str],
+) -> Response:
+    """
+    Monta a resposta de download tratando GET condicional (304) e Range
+    (206 com um ou vários intervalos, 416 quando não satisfazível).
+
+    Não depende do backend: os bytes vêm de open_range, que pode ler um
+    arquivo local ou um objeto no S3.
+    """
+    media_type = media_type or "application/octet-stream"
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": format_datetime(last_modified, usegmt=True),
+        "cache-control": "private, no-cache",
+    }
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["content-disposition"] = content_disposition(filename)
+
+    ranges = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get("range"), file_size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{file_size}"
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers,
+            )
+
+    if not ranges:
+        headers["content-length"] = str(file_size)
+        body = open_range(0, file_size - 1) if file_size else None
+        if body is None:
+            return Response(content=b"", headers=headers, media_type=media_type)
+        return StreamingResponse(body, headers=headers, media_type=media_type)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+        headers["content-length"] = str(end - start + 1)
+        return StreamingResponse(
+            open_range(start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            headers=headers,
+            media_type=media_type,
+        )
+
+    boundary = os.urandom(12).hex()
+    parts_headers = [
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+        ).encode("latin-1")
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    headers["content-length"] = str(
+        sum(len(h) for h in parts_headers)
+        + sum(end - start + 1 for start, end in ranges)
+        + len(closing)
+    )
+    return StreamingResponse(
+        _multipart_body(open_range, ranges, parts_headers, boundary),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        headers=headers,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+    )
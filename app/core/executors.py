@@ -0,0 +1,100 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+import asyncio
+import functools
+import threading
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Cada pool tem seu próprio limite de concorrência, definido no Settings,
+# para que um backend lento não consuma as threads dos outros
+POOL_SIZE_SETTINGS = {
+    "storage-local": "STORAGE_LOCAL_MAX_WORKERS",
+    "storage-s3": "STORAGE_S3_MAX_WORKERS",
+    "password-hash": "PASSWORD_HASH_MAX_WORKERS",
+    "extraction": "EXTRACTION_MAX_WORKERS",
+    "compression": "EXPORT_COMPRESSION_MAX_WORKERS",
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+# Tarefas enviadas a cada pool: na fila (aguardando thread) e em execução
+_queued: Dict[str, int] = {}
+_running: Dict[str, int] = {}
+_stats_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Retorna (criando na primeira chamada) o pool de threads com o nome dado."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(name)
+            if executor is None:
+                max_workers = getattr(settings, POOL_SIZE_SETTINGS[name])
+                executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f"guardadocs-{name}"
+                )
+                _executors[name] = executor
+    return executor
+
+
+def _tracked(name: str, func: Callable[[], T]) -> T:
+    with _stats_lock:
+        _queued[name] -= 1
+        _running[name] = _running.get(name, 0) + 1
+    try:
+        return func()
+    finally:
+        with _stats_lock:
+            _running[name] -= 1
+
+
+async def run_in_pool(name: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Executa uma função bloqueante no pool indicado sem travar o event loop.
+    Chamadas além do limite do pool aguardam na fila dele.
+    """
+    executor = get_executor(name)
+    with _stats_lock:
+        _queued[name] = _queued.get(name, 0) + 1
+    future = executor.submit(_tracked, name, functools.partial(func, *args, **kwargs))
+    future.add_done_callback(functools.partial(_discard_cancelled, name))
+    return await asyncio.wrap_future(future)
+
+
+def _discard_cancelled(name: str, future: Future) -> None:
+    # Tarefa cancelada antes de começar sai da fila sem passar por _tracked
+    if future.cancelled():
+        with _stats_lock:
+            _queued[name] -= 1
+
+
+def get_pool_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Ocupação de cada pool já criado: limite de threads, tarefas em execução
+    e profundidade da fila.
+    """
+    with _lock:
+        executors = dict(_executors)
+    with _stats_lock:
+        return {
+            name: {
+                "max_workers": executor._max_workers,
+                "running": _running.get(name, 0),
+                "queued": _queued.get(name, 0),
+            }
+            for name, executor in executors.items()
+        }
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -8,7 +8,7 @@ from google.oauth2 import id_token
 import google.auth.transport.requests
 from app.core.config import settings
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
 from app.core.security import create_access_token
@@ -88,7 +88,7 @@ async def google_login():
     return Response(status_code=302, headers={"Location": f"{auth_url}?{'&'.join(f'{k}={v}' for k, v in params.items())}"})
 
 @router.get("/login/google/callback")
-async def google_callback(request: Request, code: str, db: Session = Depends(get_db)):
+async def google_callback(request: Request, code: str, db: AsyncSession = Depends(get_db)):
     token_url = "https://oauth2.googleapis.com/token"
     async with httpx.AsyncClient() as client:
         token_response = await client.post(
@@ -117,15 +117,15 @@ async def google_callback(request: Request, code: str, db: Session = Depends(get
         user_info = user_info_response.json()
         
         # Check if user exists by google_id
-        db_user = crud_user.get_by_google_id(db, google_id=user_info["id"])
+        db_user = await crud_user.get_by_google_id(db, google_id=user_info["id"])
         
         if not db_user:
             # Check if user exists by email
-            db_user = crud_user.get_by_email(db, email=user_info["email"])
+            db_user = await crud_user.get_by_email(db, email=user_info["email"])
             
             if db_user:
                 # Update existing user with google_id
-                db_user = crud_user.update(db, db_obj=db_user, obj_in={"google_id": user_info["id"]})
+                db_user = await crud_user.update(db, db_obj=db_user, obj_in={"google_id": user_info["id"]})
             else:
                 # Create new user
                 user_in = UserCreate(
@@ -134,7 +134,7 @@ async def google_callback(request: Request, code: str, db: Session = Depends(get
                     google_id=user_info["id"],
                     is_active=True,
                 )
-                db_user = crud_user.create(db, obj_in=user_in)
+                db_user = await crud_user.create(db, obj_in=user_in)
         
         response = Response(status_code=302, headers={"Location": "/"})
         access_token = create_access_token(subject=db_user.id)
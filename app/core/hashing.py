@@ -1,12 +1,26 @@
+import logging
+import time
+
 import bcrypt
 
+from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.core.metrics import PASSWORD_HASH_DURATION
+
+logger = logging.getLogger(__name__)
+
+# bcrypt leva centenas de ms por chamada; nas rotas async ele roda neste pool
+PASSWORD_HASH_POOL = "password-hash"
+
 def get_password_hash(password: str) -> str:
     # Gera um salt e faz o hash da senha
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=settings.PASSWORD_HASH_ROUNDS)
     # Converte a senha para bytes antes de fazer o hash
     password_bytes = password.encode('utf-8')
     # Gera o hash
+    started = time.perf_counter()
     hashed = bcrypt.hashpw(password_bytes, salt)
+    PASSWORD_HASH_DURATION.labels("hash").observe(time.perf_counter() - started)
     # Retorna o hash como string
     return hashed.decode('utf-8')
 
@@ -16,7 +30,30 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         password_bytes = plain_password.encode('utf-8')
         hashed_bytes = hashed_password.encode('utf-8')
         # Verifica o hash
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
+        started = time.perf_counter()
+        try:
+            return bcrypt.checkpw(password_bytes, hashed_bytes)
+        finally:
+            PASSWORD_HASH_DURATION.labels("verify").observe(time.perf_counter() - started)
     except Exception as e:
-        print(f"Erro na verificação da senha: {str(e)}")
-        return False 
\ No newline at end of file
+        logger.warning("Erro na verificação da senha: %s", e)
+        return False
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Indica se o hash foi gerado com um custo diferente do configurado
+    (formato $2b$<custo>$...).
+    """
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.PASSWORD_HASH_ROUNDS
+
+async def hash_password(password: str) -> str:
+    """Versão de get_password_hash para rotas async."""
+    return await run_in_pool(PASSWORD_HASH_POOL, get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Versão de verify_password para rotas async."""
+    return await run_in_pool(PASSWORD_HASH_POOL, verify_password, plain_password, hashed_password)
@@ -0,0 +1,190 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+
+from app.core.config import settings
+
+# Loggers da aplicação: logging.getLogger(__name__) nos módulos de app.*
+APP_LOGGER = "app"
+
+REQUEST_ID_HEADER = "x-request-id"
+# Ids aceitos do proxy/cliente; qualquer outra coisa é trocada por um gerado aqui
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Atributos que todo LogRecord tem; o resto veio de extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Anota o registro com o id da requisição em que foi emitido."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Descarta parte dos registros de DEBUG (LOG_DEBUG_SAMPLE_RATE) ou dos que
+    trazem extra={"sample_rate": ...}: eventos de alto volume entram no log
+    por amostragem. Avisos e erros passam sempre.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno > logging.DEBUG:
+                return True
+            rate = settings.LOG_DEBUG_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em extra={...}."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sample_rate":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível para desenvolvimento, com o id da requisição."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Só enfileira o registro: a formatação e a escrita no stdout acontecem na
+    thread do QueueListener, e um stdout lento não trava o event loop. O
+    traceback é convertido em texto aqui, enquanto ainda está disponível.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Escreve no sys.stdout do momento (que os testes trocam), não no da criação."""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def setup_logging() -> None:
+    """
+    Configura os loggers de app.* (nível LOG_LEVEL, formato LOG_FORMAT) com
+    a fila e a thread de escrita. Pode ser chamada mais de uma vez.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    output = StdoutHandler()
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    handler = BackgroundQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(RequestIdFilter())
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+
+    _listener = QueueListener(handler.queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Escreve o que ainda está na fila e para a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    Middleware ASGI que dá um id a cada requisição: o X-Request-ID recebido
+    (do nginx, por exemplo) ou um novo. Ele vai nos logs emitidos durante a
+    requisição e volta no cabeçalho X-Request-ID da resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != REQUEST_ID_HEADER.encode()]
+                message["headers"] = headers + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,236 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter as StatementCounter
+from typing import Iterator, Optional
+import asyncio
+import os
+import time
+
+import jinja2
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.query_log import log_slow_query, report_repeated_statements
+
+# O modo multiprocesso do prometheus_client é decidido na importação: a
+# variável precisa existir antes do primeiro import do pacote
+if settings.METRICS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_MULTIPROC_DIR)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+)
+
+NAMESPACE = "guardadocs"
+
+# Rotas sem correspondência (404) num só rótulo: o caminho bruto multiplicaria as séries
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Tempo de resposta por rota, até o último byte",
+    ["method", "route", "status"], namespace=NAMESPACE,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Consultas ao banco feitas durante uma requisição",
+    ["route"], namespace=NAMESPACE, buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Tempo somado das consultas ao banco de uma requisição",
+    ["route"], namespace=NAMESPACE,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Tempo de cada consulta, pelo tipo de comando",
+    ["operation"], namespace=NAMESPACE,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+TEMPLATE_RENDER = Histogram(
+    "template_render_seconds", "Tempo de renderização de cada template Jinja",
+    ["template"], namespace=NAMESPACE,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+)
+STORAGE_DURATION = Histogram(
+    "storage_operation_duration_seconds", "Tempo das operações de storage por backend",
+    ["backend", "operation"], namespace=NAMESPACE,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+STORAGE_BYTES = Counter(
+    "storage_bytes", "Bytes lidos e gravados no storage por backend",
+    ["backend", "direction"], namespace=NAMESPACE
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_seconds", "Tempo do bcrypt (hash e verificação), sem a espera no pool",
+    ["operation"], namespace=NAMESPACE,
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2)
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries", "Consultas acima de SLOW_QUERY_THRESHOLD, pelo tipo de comando",
+    ["operation"], namespace=NAMESPACE
+)
+REPEATED_QUERIES = Counter(
+    "db_repeated_queries", "Consultas repetidas N_PLUS_ONE_THRESHOLD vezes ou mais numa requisição (N+1)",
+    ["route"], namespace=NAMESPACE
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Atraso do event loop em acordar uma tarefa agendada",
+    namespace=NAMESPACE,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+
+class RequestStats:
+    """Consultas ao banco da requisição atual, somadas pelos eventos da engine."""
+
+    __slots__ = ("queries", "db_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        # Execuções de cada consulta (o SQL com marcadores, sem os valores)
+        self.statements: StatementCounter = StatementCounter()
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def route_label(scope) -> str:
+    """Caminho declarado da rota ("/documents/{document_id}"), não o acessado."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede o tempo de cada requisição HTTP até o fim do
+    corpo da resposta (inclusive downloads e exportações em streaming) e as
+    consultas ao banco feitas por ela. As consultas repetidas (N+1) são
+    avisadas no log mesmo com METRICS_ENABLED desligado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = route_label(scope)
+            repeated = report_repeated_statements(stats.statements, route)
+            if settings.METRICS_ENABLED:
+                REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(
+                    time.perf_counter() - started
+                )
+                DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+                DB_TIME_PER_REQUEST.labels(route).observe(stats.db_time)
+                if repeated:
+                    REPEATED_QUERIES.labels(route).inc(repeated)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Mede cada consulta da engine (síncrona; na assíncrona, engine.sync_engine),
+    soma as da requisição atual em RequestStats e registra no log as que
+    passam de SLOW_QUERY_THRESHOLD, com os parâmetros.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        DB_QUERY_DURATION.labels(operation).observe(elapsed)
+        if log_slow_query(statement, parameters, executemany, elapsed):
+            SLOW_QUERIES.labels(operation).inc()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            stats.statements[statement] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def discard_query_timer(exception_context):
+        # Consulta com erro não chega ao after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+class TimedTemplate(jinja2.Template):
+    """Template Jinja que mede o próprio render."""
+
+    def render(self, *args, **kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATE_RENDER.labels(self.name or "<string>").observe(time.perf_counter() - started)
+
+
+def instrument_templates(environment: jinja2.Environment) -> None:
+    environment.template_class = TimedTemplate
+
+
+@contextmanager
+def storage_timer(backend: str, operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STORAGE_DURATION.labels(backend, operation).observe(time.perf_counter() - started)
+
+
+def count_storage_bytes(backend: str, direction: str, size: int) -> None:
+    if size:
+        STORAGE_BYTES.labels(backend, direction).inc(size)
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """
+    Dorme interval segundos e mede quanto a mais demorou para acordar: o
+    tempo que o loop passou ocupado com outras tarefas (ou travado por
+    código síncrono) antes de voltar a esta.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+
+def render_metrics():
+    """
+    (corpo, content type) no formato texto do Prometheus. No modo
+    multiprocesso, soma os valores de todos os workers do Hypercorn a partir
+    dos arquivos de METRICS_MULTIPROC_DIR.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
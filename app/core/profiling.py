@@ -0,0 +1,211 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.core.log import current_request_id
+from app.core.security import get_current_user_from_request
+from app.core.storage import LOCAL_POOL
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Pedido explícito de perfil: cabeçalho X-Profile: 1 ou ?_profile=1 (só administradores)
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "_profile"
+PROFILE_ID_HEADER = "x-profile-id"
+
+_VALID_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+# Pilhas cujo quadro mais interno é uma espera: threads ociosas (pools, fila
+# de logs) e o event loop sem trabalho. Contá-las só encheria o flamegraph.
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("handlers.py", "dequeue"),
+}
+
+# Um perfil por vez em cada processo: a amostragem vê todas as threads
+_busy = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    # Ponto e vírgula separa os quadros no formato "folded"
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Profiler estatístico: uma thread lê as pilhas de todas as outras a cada
+    interval segundos e conta cada pilha no formato "folded" (raiz;...;folha),
+    o mesmo de flamegraph.pl, speedscope e inferno. Enquanto não é iniciado
+    não custa nada; durante a coleta, o custo é o da leitura das pilhas.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="guardadocs-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+def profile_path(profile_id: str, extension: str = "folded") -> Optional[str]:
+    """Caminho do perfil salvo; None para ids fora do formato gerado aqui."""
+    if not _VALID_PROFILE_ID.match(profile_id):
+        return None
+    return os.path.join(settings.PROFILING_DIR, f"{profile_id}.{extension}")
+
+
+def _save_profile(profile_id: str, stacks: Counter, metadata: Dict) -> None:
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    with open(profile_path(profile_id), "w") as output:
+        for stack, count in stacks.most_common():
+            output.write(f"{stack} {count}\n")
+    with open(profile_path(profile_id, "json"), "w") as output:
+        json.dump(metadata, output)
+    _prune_profiles()
+
+
+def _prune_profiles() -> None:
+    """Mantém só os PROFILING_MAX_FILES perfis mais recentes."""
+    profiles = sorted(name for name in os.listdir(settings.PROFILING_DIR) if name.endswith(".json"))
+    for name in profiles[:-settings.PROFILING_MAX_FILES or None]:
+        profile_id = name[:-len(".json")]
+        for extension in ("json", "folded"):
+            try:
+                os.remove(profile_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """Metadados dos perfis salvos, do mais recente para o mais antigo."""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(settings.PROFILING_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(settings.PROFILING_DIR, name)) as source:
+                profiles.append(json.load(source))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila uma requisição inteira quando um
+    administrador pede (X-Profile: 1 ou ?_profile=1) ou, por sorteio, uma
+    fração PROFILING_SAMPLE_RATE das requisições. O perfil fica em
+    PROFILING_DIR e o id volta no cabeçalho X-Profile-Id.
+
+    Só é instalado com PROFILING_ENABLED: desligado, não há custo algum.
+    A amostragem vê o processo inteiro, então requisições simultâneas no
+    mesmo worker também aparecem no perfil.
+    """
+
+    def __init__(self, app, session_factory=AsyncSessionLocal):
+        self.app = app
+        self.session_factory = session_factory
+
+    async def _reason(self, scope) -> Optional[str]:
+        request = Request(scope)
+        if request.headers.get(PROFILE_HEADER) == "1" or request.query_params.get(PROFILE_QUERY) == "1":
+            async with self.session_factory() as db:
+                user = await get_current_user_from_request(request, db)
+            return "admin" if user is not None and user.is_admin else None
+        if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reason = await self._reason(scope)
+        if reason is None or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        sampler = StackSampler(settings.PROFILING_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            duration = time.perf_counter() - started
+            _busy.release()
+            metadata = {
+                "id": profile_id,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_seconds": round(duration, 4),
+                "samples": sampler.samples,
+                "reason": reason,
+                "request_id": current_request_id(),
+            }
+            try:
+                await run_in_pool(LOCAL_POOL, _save_profile, profile_id, stacks, metadata)
+            except OSError:
+                logger.exception("Não foi possível salvar o perfil %s", profile_id)
@@ -0,0 +1,85 @@
+from collections import Counter
+from typing import Any, Optional
+import logging
+import re
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Limites do que vai para o log: consultas e parâmetros grandes são truncados
+_MAX_STATEMENT_LENGTH = 2000
+_MAX_PARAMETER_LENGTH = 200
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+# Colunas/parâmetros cujo valor nunca vai para o log (senhas, hashes, tokens)
+_SENSITIVE_NAME = re.compile(r"password|passwd|secret|token|api_?key|credential", re.IGNORECASE)
+_MASK = "'***'"
+
+
+def _format_value(value: Any, masked: bool) -> str:
+    return _MASK if masked else _truncate(repr(value), _MAX_PARAMETER_LENGTH)
+
+
+def format_parameters(parameters: Any, executemany: bool, statement: str = "") -> Optional[str]:
+    """
+    Parâmetros da consulta para o log, ou None com SLOW_QUERY_LOG_PARAMETERS
+    desligado. Parâmetros nomeados como credenciais são mascarados; os
+    posicionais não têm nome, então são todos mascarados quando a consulta
+    menciona uma coluna desse tipo.
+    """
+    if not settings.SLOW_QUERY_LOG_PARAMETERS:
+        return None
+    if executemany and parameters:
+        # Só o primeiro conjunto: um insert em lote pode ter milhares
+        first = format_parameters(parameters[0], False, statement)
+        return f"{len(parameters)} conjuntos, o primeiro: {first}"
+    if isinstance(parameters, dict):
+        values = ", ".join(
+            f"{key}={_format_value(value, bool(_SENSITIVE_NAME.search(str(key))))}"
+            for key, value in parameters.items()
+        )
+    else:
+        masked = bool(_SENSITIVE_NAME.search(statement))
+        values = ", ".join(_format_value(value, masked) for value in parameters or ())
+    return f"({values})"
+
+
+def log_slow_query(statement: str, parameters: Any, executemany: bool, elapsed: float) -> bool:
+    """Registra a consulta se passou de SLOW_QUERY_THRESHOLD segundos; True se registrou."""
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold <= 0 or elapsed < threshold:
+        return False
+    logger.warning(
+        "Consulta lenta: %.3fs", elapsed,
+        extra={
+            "duration_seconds": round(elapsed, 4),
+            "statement": _truncate(statement, _MAX_STATEMENT_LENGTH),
+            "parameters": format_parameters(parameters, executemany, statement),
+        }
+    )
+    return True
+
+
+def report_repeated_statements(statements: Counter, route: str) -> int:
+    """
+    Avisa das consultas que rodaram N_PLUS_ONE_THRESHOLD vezes ou mais numa
+    mesma requisição: o sinal de um N+1 (um relacionamento carregado linha a
+    linha, uma consulta dentro de um laço). Retorna quantas foram avisadas.
+    """
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if threshold <= 0:
+        return 0
+    reported = 0
+    for statement, count in statements.items():
+        if count >= threshold:
+            logger.warning(
+                "Possível N+1 em %s: a mesma consulta rodou %s vezes", route, count,
+                extra={"route": route, "count": count, "statement": _truncate(statement, _MAX_STATEMENT_LENGTH)}
+            )
+            reported += 1
+    return reported
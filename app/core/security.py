@@ -1,16 +1,23 @@
 from datetime import datetime, timedelta
 from typing import Any, Union, Optional
+import logging
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.db.session import get_db
 from app.models import User
-from app.core.hashing import verify_password, get_password_hash
+from app.core.hashing import (
+    verify_password, get_password_hash, check_password, hash_password, needs_rehash
+)
+from app.core.user_cache import CurrentUser, user_cache
 from app.schemas import User as UserSchema
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
 def create_access_token(*, subject: Union[str, int], expires_delta: Optional[timedelta] = None) -> str:
@@ -24,9 +31,56 @@ def create_access_token(*, subject: Union[str, int], expires_delta: Optional[tim
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_upload_token(
+    *,
+    user_id: int,
+    key: str,
+    original_filename: str,
+    content_type: str,
+    upload_id: Optional[str] = None
+) -> str:
+    """
+    Token que autoriza o usuário a concluir um upload direto ao bucket.
+    Amarra a chave do objeto ao usuário, então ninguém registra como seu
+    um arquivo enviado por outra pessoa.
+    """
+    expire = datetime.utcnow() + timedelta(minutes=settings.DIRECT_UPLOAD_TOKEN_EXPIRE_MINUTES)
+    to_encode = {
+        "exp": expire,
+        "typ": "upload",
+        "uid": user_id,
+        "key": key,
+        "filename": original_filename,
+        "content_type": content_type,
+        "upload_id": upload_id
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_upload_token(token: str) -> Optional[dict]:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("typ") != "upload":
+        return None
+    return payload
+
+async def authenticate_password(db: AsyncSession, user: User, password: str) -> bool:
+    """
+    Confere a senha no pool de hash. Se o hash foi gerado com outro custo
+    (PASSWORD_HASH_ROUNDS mudou), grava um novo hash aproveitando a senha
+    em texto que só está disponível no login.
+    """
+    if not await check_password(password, user.hashed_password):
+        return False
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password(password)
+        await db.commit()
+    return True
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> UserSchema:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,7 +95,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await load_current_user(db, email)
     if user is None:
         raise credentials_exception
         
@@ -53,7 +107,42 @@ async def get_current_user(
         
     return UserSchema.model_validate(user)
 
-async def get_current_user_from_request(request: Request, db: Session) -> Optional[User]:
+async def load_current_user(db: AsyncSession, email: str) -> Optional[CurrentUser]:
+    """
+    Resolve o usuário pelo subject do token, consultando o banco só quando
+    ele não está no cache.
+    """
+    user = await user_cache.get(email)
+    if user is not None:
+        return user
+    db_user = await db.scalar(select(User).where(User.email == email))
+    if db_user is None:
+        return None
+    user = CurrentUser.from_model(db_user)
+    await user_cache.set(email, user)
+    return user
+
+async def invalidate_cached_user(*emails: str) -> None:
+    """
+    Remove usuários do cache; deve ser chamada depois de qualquer commit
+    que altere ou remova um usuário.
+    """
+    await user_cache.invalidate(*emails)
+
+async def get_current_user_from_request(request: Request, db: AsyncSession) -> Optional[CurrentUser]:
+    """
+    Retorna o usuário autenticado pelo cookie ou pelo header Authorization.
+    O resultado fica em request.state, então chamadas repetidas na mesma
+    requisição (rota e middleware) não refazem o trabalho.
+    """
+    if getattr(request.state, "user_resolved", False):
+        return request.state.user
+    user = await _resolve_user_from_request(request, db)
+    request.state.user = user
+    request.state.user_resolved = True
+    return user
+
+async def _resolve_user_from_request(request: Request, db: AsyncSession) -> Optional[CurrentUser]:
     try:
         # Tenta pegar o token do cookie
         token = request.cookies.get("access_token")
@@ -81,7 +170,7 @@ async def get_current_user_from_request(request: Request, db: Session) -> Option
         except JWTError:
             return None
 
-        user = db.query(User).filter(User.email == email).first()
+        user = await load_current_user(db, email)
         if user is None:
             return None
             
@@ -90,5 +179,5 @@ async def get_current_user_from_request(request: Request, db: Session) -> Option
 
         return user
     except Exception as e:
-        print(f"Erro ao verificar usuário: {str(e)}")
+        logger.exception("Erro ao verificar usuário")
         return None 
\ No newline at end of file
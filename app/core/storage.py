@@ -1,11 +1,28 @@
-from typing import Optional
+from typing import AsyncIterator, Optional
 from fastapi import UploadFile, HTTPException, status
 from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.core.metrics import count_storage_bytes, storage_timer
+import hashlib
 import os
 from pathlib import Path
-import shutil
+import tempfile
+import time
 import uuid
 
+
+# Pool de threads usado para toda a E/S de disco da pasta de uploads
+LOCAL_POOL = "storage-local"
+
+
+class FileTooLargeError(Exception):
+    """Arquivo enviado excede o limite de tamanho configurado."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"Arquivo excede o limite de {max_size} bytes")
+
+
 def ensure_upload_folder():
     """Garante que a pasta de uploads existe."""
     upload_path = Path(settings.UPLOAD_FOLDER)
@@ -17,39 +34,194 @@ def get_upload_dir() -> Path:
     upload_dir.mkdir(parents=True, exist_ok=True)
     return upload_dir
 
-def save_upload_file(file: UploadFile) -> tuple[str, str]:
+def shard_storage_filename(filename: str) -> str:
     """
-    Salva o arquivo enviado e retorna uma tupla com (nome_original, nome_storage)
+    Retorna o caminho relativo do arquivo dentro da pasta de uploads,
+    espalhado em UPLOAD_SHARD_DEPTH níveis de dois caracteres hexadecimais
+    (ex.: "3f/a9/<nome>") para que nenhum diretório fique com arquivos demais.
+    """
+    depth = settings.UPLOAD_SHARD_DEPTH
+    if depth <= 0:
+        return filename
+    digest = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+    parts = [digest[i * 2:i * 2 + 2] for i in range(depth)]
+    return "/".join(parts + [filename])
+
+def _write_chunk(buffer, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    buffer.write(chunk)
+
+def _commit_temp_file(buffer, tmp_path: str, file_path: Path) -> None:
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, file_path)
+
+def _discard_temp_file(buffer, tmp_path: str) -> None:
+    buffer.close()
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+async def _upload_temp_file(storage, buffer, storage_filename: str) -> None:
+    """Envia o temporário completo ao bucket (em partes, conforme S3_MULTIPART_*)."""
+    if storage is None:
+        from app.services.storage_service import StorageService
+        storage = StorageService()
+    await run_in_pool(LOCAL_POOL, buffer.flush)
+    buffer.seek(0)
+    await storage.save_file(buffer, storage_filename)
+
+async def save_upload_file(
+    file: UploadFile,
+    max_size: Optional[int] = None,
+    storage=None
+) -> tuple[str, str, int]:
+    """
+    Salva o arquivo enviado em blocos e retorna uma tupla com
+    (nome_original, nome_storage, tamanho_em_bytes).
+
+    O conteúdo é lido em blocos de UPLOAD_CHUNK_SIZE e gravado em um arquivo
+    temporário na própria pasta de uploads; só depois de completo ele é
+    renomeado atomicamente para o nome definitivo. O limite de tamanho é
+    verificado à medida que os bytes chegam, e FileTooLargeError é lançado
+    sem deixar nada no storage.
+
+    Com STORAGE_TYPE=s3, o temporário completo é enviado ao bucket pelo
+    StorageService (storage, ou um criado aqui) e apagado em seguida: os
+    downloads, as exportações e a extração leem o arquivo de lá.
+
+    Com STORAGE_DEDUP ativo o nome definitivo é o SHA-256 do conteúdo,
+    calculado durante a cópia, e arquivos idênticos ocupam um único blob.
+    O chamador deve registrar a referência com crud.blob.acquire.
+
+    Toda a E/S de disco roda no pool "storage-local", fora do event loop.
     """
+    if max_size is None:
+        max_size = settings.MAX_UPLOAD_SIZE
+
+    # O parser multipart já conhece o tamanho: rejeita antes de copiar qualquer byte
+    if file.size is not None and file.size > max_size:
+        raise FileTooLargeError(max_size)
+
     original_filename = file.filename
-    # Gera um nome único para o arquivo
-    file_extension = os.path.splitext(original_filename)[1]
-    storage_filename = f"{os.urandom(16).hex()}{file_extension}"
-    
-    # Salva o arquivo
     upload_dir = get_upload_dir()
-    file_path = upload_dir / storage_filename
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    return original_filename, storage_filename
+
+    # O temporário fica no mesmo diretório para que o rename seja atômico
+    fd, tmp_path = await run_in_pool(
+        LOCAL_POOL, tempfile.mkstemp, dir=upload_dir, prefix=".upload-", suffix=".part"
+    )
+    buffer = os.fdopen(fd, "w+b")
+    file_size = 0
+    digest = hashlib.sha256()
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            file_size += len(chunk)
+            if file_size > max_size:
+                raise FileTooLargeError(max_size)
+            with storage_timer("local", "write"):
+                await run_in_pool(LOCAL_POOL, _write_chunk, buffer, digest, chunk)
+
+        if settings.STORAGE_DEDUP:
+            # Conteúdo idêntico sempre cai no mesmo nome; sobrescrever é inofensivo
+            filename = digest.hexdigest()
+        else:
+            # Gera um nome único para o arquivo
+            file_extension = os.path.splitext(original_filename)[1]
+            filename = f"{os.urandom(16).hex()}{file_extension}"
+        storage_filename = shard_storage_filename(filename)
+        if settings.STORAGE_TYPE == "s3":
+            await _upload_temp_file(storage, buffer, storage_filename)
+        else:
+            with storage_timer("local", "commit"):
+                await run_in_pool(
+                    LOCAL_POOL, _commit_temp_file, buffer, tmp_path, upload_dir / storage_filename
+                )
+    except BaseException:
+        # Síncrono de propósito: também precisa rodar quando a tarefa é cancelada
+        _discard_temp_file(buffer, tmp_path)
+        raise
+    if settings.STORAGE_TYPE == "s3":
+        await run_in_pool(LOCAL_POOL, _discard_temp_file, buffer, tmp_path)
+    else:
+        count_storage_bytes("local", "write", file_size)
+
+    return original_filename, storage_filename, file_size
 
 async def get_file_path(storage_filename: str) -> str:
     """
-    Retorna o caminho absoluto do arquivo no sistema de arquivos
+    Retorna o caminho absoluto do arquivo no sistema de arquivos.
+    O storage_filename já inclui os diretórios do sharding; nomes antigos,
+    ainda sem diretório, continuam na raiz da pasta de uploads.
     """
     upload_dir = get_upload_dir()
     file_path = upload_dir / storage_filename
-    if not file_path.exists():
+    if not await run_in_pool(LOCAL_POOL, file_path.exists):
         raise FileNotFoundError(f"Arquivo não encontrado: {storage_filename}")
     return str(file_path.absolute())
 
+async def iter_file_range(
+    file_path: str,
+    start: int,
+    end: int,
+    chunk_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Lê o intervalo fechado [start, end] de um arquivo local em blocos
+    """
+    chunk_size = chunk_size or settings.DOWNLOAD_CHUNK_SIZE
+    remaining = end - start + 1
+    f = await run_in_pool(LOCAL_POOL, open, file_path, "rb")
+    try:
+        await run_in_pool(LOCAL_POOL, f.seek, start)
+        while remaining > 0:
+            with storage_timer("local", "read"):
+                chunk = await run_in_pool(LOCAL_POOL, f.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            count_storage_bytes("local", "read", len(chunk))
+            yield chunk
+    finally:
+        f.close()
+
 async def delete_file(storage_filename: str) -> None:
     """
     Remove um arquivo do sistema de arquivos
     """
     upload_dir = get_upload_dir()
     file_path = upload_dir / storage_filename
-    if file_path.exists():
-        file_path.unlink() 
\ No newline at end of file
+    with storage_timer("local", "delete"):
+        await run_in_pool(LOCAL_POOL, file_path.unlink, missing_ok=True)
+
+def _delete_unless_recent(file_path: Path, grace: float) -> bool:
+    # Tira o arquivo do lugar antes de conferir a data: um upload que renomeie
+    # o seu para este nome depois disso grava um arquivo novo, que fica intacto
+    aside = file_path.with_name(f".deleting-{uuid.uuid4().hex}")
+    try:
+        os.rename(file_path, aside)
+    except FileNotFoundError:
+        return True
+    if time.time() - os.stat(aside).st_mtime < grace:
+        # O nome é o SHA-256: devolver por cima de um upload mais novo não muda o conteúdo
+        os.replace(aside, file_path)
+        return False
+    os.unlink(aside)
+    return True
+
+async def delete_file_unless_recent(storage_filename: str, grace: float) -> bool:
+    """
+    Remove um arquivo deduplicado, a menos que tenha sido gravado há menos de
+    grace segundos; retorna False quando o mantém. Um upload do mesmo
+    conteúdo renomeia o arquivo para o nome definitivo antes do commit que
+    cria a referência (crud.blob.acquire), então a ausência de referência
+    não basta para apagar um arquivo recente.
+    """
+    file_path = get_upload_dir() / storage_filename
+    with storage_timer("local", "delete"):
+        return await run_in_pool(LOCAL_POOL, _delete_unless_recent, file_path, grace)
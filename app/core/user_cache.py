@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+import json
+import threading
+import time
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Dados do usuário autenticado, desacoplados da sessão do banco.
+    Rotas que precisam alterar o usuário carregam o modelo pelo id.
+    """
+    id: int
+    email: str
+    full_name: str
+    is_active: bool
+    is_admin: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+    @classmethod
+    def from_model(cls, user) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            is_admin=user.is_admin,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+            last_login=user.last_login
+        )
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        for field in ("created_at", "updated_at", "last_login"):
+            if data[field] is not None:
+                data[field] = data[field].isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CurrentUser":
+        data = json.loads(raw)
+        for field in ("created_at", "updated_at", "last_login"):
+            if data[field] is not None:
+                data[field] = datetime.fromisoformat(data[field])
+        return cls(**data)
+
+
+class MemoryUserCache:
+    """Cache LRU com TTL, local a cada processo."""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, CurrentUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, subject: str) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return user
+
+    async def set(self, subject: str, user: CurrentUser) -> None:
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def invalidate(self, *subjects: str) -> None:
+        with self._lock:
+            for subject in subjects:
+                self._entries.pop(subject, None)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisUserCache:
+    """
+    Cache compartilhado entre os workers do Hypercorn: uma invalidação
+    feita em um processo vale para todos.
+    """
+
+    prefix = "guardadocs:user:"
+
+    def __init__(self, url: str, ttl: int):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requer o pacote 'redis'")
+        self.ttl = ttl
+        self.client = redis.from_url(url)
+
+    async def get(self, subject: str) -> Optional[CurrentUser]:
+        raw = await self.client.get(self.prefix + subject)
+        if raw is None:
+            return None
+        return CurrentUser.from_json(raw)
+
+    async def set(self, subject: str, user: CurrentUser) -> None:
+        await self.client.set(self.prefix + subject, user.to_json(), ex=self.ttl)
+
+    async def invalidate(self, *subjects: str) -> None:
+        if subjects:
+            await self.client.delete(*(self.prefix + subject for subject in subjects))
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+
+class NullUserCache:
+    """Desativa o cache (USER_CACHE_BACKEND=none)."""
+
+    async def get(self, subject: str) -> Optional[CurrentUser]:
+        return None
+
+    async def set(self, subject: str, user: CurrentUser) -> None:
+        pass
+
+    async def invalidate(self, *subjects: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+
+def create_user_cache():
+    if settings.USER_CACHE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requer REDIS_URL")
+        return RedisUserCache(settings.REDIS_URL, settings.USER_CACHE_TTL)
+    if settings.USER_CACHE_BACKEND == "none":
+        return NullUserCache()
+    return MemoryUserCache(settings.USER_CACHE_TTL, settings.USER_CACHE_MAX_ENTRIES)
+
+
+user_cache = create_user_cache()
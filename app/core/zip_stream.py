@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Callable, List, NamedTuple, Optional
+import struct
+import zlib
+
+from app.core.config import settings
+from app.core.executors import run_in_pool
+
+# Pool usado para comprimir (zlib libera o GIL enquanto comprime)
+COMPRESSION_POOL = "compression"
+
+# Campos de 32 bits do formato: acima disso o ZIP64 é obrigatório
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# Tipos que já vêm comprimidos: vão no modo stored, sem gastar CPU à toa
+COMPRESSED_TYPES = {
+    "application/zip", "application/gzip", "application/x-gzip", "application/x-7z-compressed",
+    "application/x-rar-compressed", "application/x-bzip2", "application/x-xz", "application/pdf",
+    "application/epub+zip", "application/java-archive",
+}
+COMPRESSED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".pdf", ".jpg", ".jpeg", ".png",
+    ".gif", ".webp", ".heic", ".mp3", ".mp4", ".m4a", ".mov", ".avi", ".mkv", ".ogg",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar",
+}
+
+# Mídia sem compressão própria, que vale a pena comprimir
+UNCOMPRESSED_MEDIA_TYPES = {"image/bmp", "image/svg+xml", "image/tiff", "audio/wav", "audio/x-wav"}
+
+STORED, DEFLATED = 0, 8
+# Bit 3: tamanhos e CRC no descritor depois dos dados; bit 11: nome em UTF-8
+FLAGS = 0x0008 | 0x0800
+VERSION_ZIP64, VERSION_DEFAULT = 45, 20
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    modified: datetime
+    # Abre o conteúdo do arquivo; só é chamada quando a entrada vai ser escrita
+    open: Callable[[], AsyncIterator[bytes]]
+    compress: bool = True
+    # Tamanho esperado: a partir de ZIP64_LIMIT a entrada já sai em ZIP64
+    size_hint: int = 0
+
+
+class _Written(NamedTuple):
+    name: bytes
+    method: int
+    dos_time: int
+    dos_date: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+    zip64: bool
+
+
+def should_compress(filename: str, content_type: Optional[str]) -> bool:
+    extension = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in COMPRESSED_TYPES or extension in COMPRESSED_EXTENSIONS:
+        return False
+    if content_type in UNCOMPRESSED_MEDIA_TYPES:
+        return True
+    return not content_type.startswith(("image/", "video/", "audio/"))
+
+
+def _dos_datetime(value: datetime):
+    value = max(value, datetime(1980, 1, 1))
+    dos_time = (value.hour << 11) | (value.minute << 5) | (value.second // 2)
+    dos_date = ((value.year - 1980) << 9) | (value.month << 5) | value.day
+    return dos_time, dos_date
+
+
+class _Compressor:
+    def __init__(self, compress: bool):
+        self._zlib = None
+        if compress:
+            # wbits negativo: deflate puro, sem o cabeçalho do zlib
+            self._zlib = zlib.compressobj(settings.EXPORT_COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+
+    async def feed(self, data: bytes) -> bytes:
+        if self._zlib is None:
+            return data
+        return await run_in_pool(COMPRESSION_POOL, self._zlib.compress, data)
+
+    def flush(self) -> bytes:
+        return self._zlib.flush() if self._zlib is not None else b""
+
+
+async def stream_zip(entries: AsyncIterable[ZipEntry]) -> AsyncIterator[bytes]:
+    """
+    Gera um arquivo ZIP à medida que é lido. Os dados de cada entrada são
+    lidos, comprimidos (ou não) e devolvidos em blocos; só os metadados de
+    cada entrada ficam em memória até o diretório central, no fim. O CRC e os
+    tamanhos vão num descritor depois dos dados, e o ZIP64 entra quando algum
+    tamanho, deslocamento ou o número de entradas passa dos limites de 32 bits.
+
+    Quem lê o gerador dita o ritmo: nada é lido do storage antes de o bloco
+    anterior ser consumido.
+    """
+    written: List[_Written] = []
+    offset = 0
+
+    async for entry in entries:
+        name = entry.name.encode("utf-8")
+        dos_time, dos_date = _dos_datetime(entry.modified)
+        method = DEFLATED if entry.compress else STORED
+        # Folga para o deflate de dados incompressíveis, que cresce um pouco
+        zip64 = entry.size_hint >= ZIP64_LIMIT - ZIP64_LIMIT // 16
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0) if zip64 else b""
+        header = struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50,
+            VERSION_ZIP64 if zip64 else VERSION_DEFAULT, FLAGS, method, dos_time, dos_date,
+            0, ZIP64_LIMIT if zip64 else 0, ZIP64_LIMIT if zip64 else 0, len(name), len(extra)
+        ) + name + extra
+        yield header
+
+        crc, size, compressed_size = 0, 0, 0
+        compressor = _Compressor(entry.compress)
+        async for chunk in entry.open():
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data = await compressor.feed(chunk)
+            compressed_size += len(data)
+            if data:
+                yield data
+        data = compressor.flush()
+        compressed_size += len(data)
+        if data:
+            yield data
+
+        if not zip64 and (size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT):
+            # O cabeçalho já foi enviado sem ZIP64: não há como corrigir a entrada
+            raise ValueError(f"{entry.name} excede 4 GiB sem ter sido anunciado como ZIP64")
+        if zip64:
+            descriptor = struct.pack("<IIQQ", 0x08074B50, crc, compressed_size, size)
+        else:
+            descriptor = struct.pack("<IIII", 0x08074B50, crc, compressed_size, size)
+        yield descriptor
+
+        written.append(_Written(
+            name, method, dos_time, dos_date, crc, compressed_size, size, offset, zip64
+        ))
+        offset += len(header) + compressed_size + len(descriptor)
+
+    central_directory = []
+    for item in written:
+        # Vão para o extra ZIP64 (nesta ordem) os campos que não cabem em 32 bits
+        size, compressed_size, entry_offset = (
+            ZIP64_LIMIT if item.zip64 or value >= ZIP64_LIMIT else value
+            for value in (item.size, item.compressed_size, item.offset)
+        )
+        zip64_fields = [
+            value for value, field in (
+                (item.size, size), (item.compressed_size, compressed_size), (item.offset, entry_offset)
+            )
+            if field == ZIP64_LIMIT
+        ]
+        extra = b""
+        if zip64_fields:
+            extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+        version = VERSION_ZIP64 if extra else VERSION_DEFAULT
+        central_directory.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, version, version,
+            FLAGS, item.method, item.dos_time, item.dos_date, item.crc,
+            compressed_size, size, len(item.name), len(extra), 0, 0, 0,
+            0o100644 << 16, entry_offset
+        ) + item.name + extra)
+    central_directory = b"".join(central_directory)
+    yield central_directory
+
+    cd_offset, cd_size, count = offset, len(central_directory), len(written)
+    if cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT or count >= ZIP64_COUNT_LIMIT:
+        zip64_end_offset = cd_offset + cd_size
+        yield struct.pack(
+            "<IQHHIIQQQQ", 0x06064B50, 44, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+            count, count, cd_size, cd_offset
+        )
+        yield struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        # Os campos de 32 bits ficam com o marcador: os valores estão no registro ZIP64
+        count, cd_size, cd_offset = 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF
+    yield struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0)
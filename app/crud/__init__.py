@@ -1,4 +1,7 @@
 from app.crud.crud_user import user
+from app.crud.crud_blob import blob
+from app.crud.crud_document import document
+from app.crud.crud_usage import usage
 
-# Exportando o objeto user para uso em outros módulos
-__all__ = ["user"] 
\ No newline at end of file
+# Exportando os objetos CRUD para uso em outros módulos
+__all__ = ["user", "blob", "document", "usage"] 
@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Iterable, List, Set
+from sqlalchemy import bindparam, delete, exists, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.blob import StorageBlob
+from app.models.document import Document
+
+class CRUDBlob:
+    async def acquire(self, db: AsyncSession, storage_filename: str, file_size: int) -> None:
+        """
+        Registra mais uma referência ao arquivo, criando o registro se for a primeira.
+        Não faz commit: deve participar da mesma transação que grava o documento.
+        """
+        for _ in range(2):
+            result = await db.execute(
+                update(StorageBlob)
+                .where(StorageBlob.storage_filename == storage_filename)
+                .values(ref_count=StorageBlob.ref_count + 1)
+            )
+            if result.rowcount:
+                return
+            try:
+                # Savepoint: outro upload do mesmo conteúdo pode criar o registro antes
+                async with db.begin_nested():
+                    db.add(StorageBlob(
+                        storage_filename=storage_filename,
+                        file_size=file_size,
+                        ref_count=1
+                    ))
+                return
+            except IntegrityError:
+                continue
+        raise RuntimeError(f"Não foi possível referenciar o arquivo {storage_filename}")
+
+    async def release(self, db: AsyncSession, storage_filename: str) -> bool:
+        """
+        Remove uma referência ao arquivo. Retorna True quando não sobra nenhuma
+        e o arquivo pode ser apagado depois do commit. Arquivos sem registro
+        (gravados fora do modo deduplicado) não são compartilhados.
+        """
+        result = await db.execute(
+            update(StorageBlob)
+            .where(StorageBlob.storage_filename == storage_filename)
+            .values(ref_count=StorageBlob.ref_count - 1)
+        )
+        if not result.rowcount:
+            return True
+        result = await db.execute(
+            delete(StorageBlob).where(
+                StorageBlob.storage_filename == storage_filename,
+                StorageBlob.ref_count <= 0
+            )
+        )
+        return bool(result.rowcount)
+
+    async def release_many(self, db: AsyncSession, storage_filenames: Iterable[str]) -> List[str]:
+        """
+        Versão de release para muitos documentos de uma vez (um nome por
+        documento, repetidos quando compartilham o arquivo), com um número
+        fixo de comandos. Retorna os arquivos que ficaram sem referência.
+        """
+        counts = Counter(storage_filenames)
+        if not counts:
+            return []
+        tracked = set(await db.scalars(
+            select(StorageBlob.storage_filename)
+            .where(StorageBlob.storage_filename.in_(list(counts)))
+        ))
+        if tracked:
+            await db.execute(
+                update(StorageBlob.__table__)
+                .where(StorageBlob.storage_filename == bindparam("name"))
+                .values(ref_count=StorageBlob.ref_count - bindparam("released")),
+                [{"name": name, "released": counts[name]} for name in tracked]
+            )
+            emptied = set(await db.scalars(
+                delete(StorageBlob)
+                .where(StorageBlob.storage_filename.in_(tracked), StorageBlob.ref_count <= 0)
+                .returning(StorageBlob.storage_filename)
+            ))
+        else:
+            emptied = set()
+        return [name for name in counts if name not in tracked or name in emptied]
+
+    async def referenced(self, db: AsyncSession, storage_filenames: Iterable[str]) -> Set[str]:
+        """Versão de is_referenced para vários arquivos: os que voltaram a ser usados."""
+        storage_filenames = list(storage_filenames)
+        if not storage_filenames:
+            return set()
+        blobs = await db.scalars(
+            select(StorageBlob.storage_filename)
+            .where(StorageBlob.storage_filename.in_(storage_filenames))
+        )
+        documents = await db.scalars(
+            select(Document.storage_filename)
+            .where(Document.storage_filename.in_(storage_filenames))
+            .distinct()
+        )
+        return set(blobs) | set(documents)
+
+    async def is_referenced(self, db: AsyncSession, storage_filename: str) -> bool:
+        """
+        Confere, já depois do commit, se algum upload concorrente voltou a usar o arquivo.
+        """
+        return await db.scalar(
+            select(
+                exists().where(StorageBlob.storage_filename == storage_filename)
+                | exists().where(Document.storage_filename == storage_filename)
+            )
+        )
+
+blob = CRUDBlob()
@@ -0,0 +1,91 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.document import Document
+from app.crud.read_models import DocumentListItem, columns_for
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class DocumentPage(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, document_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{document_id}".encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, document_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(document_id)
+    except ValueError as e:
+        raise InvalidCursor(f"Cursor inválido: {cursor}") from e
+
+
+class CRUDDocument:
+    async def list_by_user(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        *,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> DocumentPage:
+        """
+        Página de documentos do usuário como DocumentListItem, para as
+        listagens: só as colunas exibidas, sem montar entidades ORM.
+        """
+        query = select(*columns_for(DocumentListItem, Document))
+        rows = await self._fetch_page(db, query, user_id, limit, cursor)
+        return self._page([DocumentListItem(*row) for row in rows], limit)
+
+    async def list_entities_by_user(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        *,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> DocumentPage:
+        """Mesma página de list_by_user, com entidades Document completas."""
+        rows = await self._fetch_page(db, select(Document), user_id, limit, cursor)
+        return self._page(list(rows.scalars()), limit)
+
+    async def _fetch_page(self, db: AsyncSession, query, user_id: int, limit: int, cursor: Optional[str]):
+        """
+        Documentos do usuário, do mais recente para o mais antigo, paginados
+        por (created_at, id) sobre o índice ix_documents_user_created_id.
+        O custo de cada página não depende de quantas vieram antes dela.
+        Busca um item a mais para saber se existe próxima página.
+        """
+        query = query.where(Document.user_id == user_id)
+        if cursor:
+            created_at, document_id = decode_cursor(cursor)
+            query = query.where(or_(
+                Document.created_at < created_at,
+                and_(Document.created_at == created_at, Document.id < document_id)
+            ))
+        query = query.order_by(Document.created_at.desc(), Document.id.desc()).limit(limit + 1)
+        return await db.execute(query)
+
+    def _page(self, items: List[Any], limit: int) -> DocumentPage:
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+        return DocumentPage(items, next_cursor)
+
+    async def count_by_user(self, db: AsyncSession, user_id: int) -> int:
+        return await db.scalar(
+            select(func.count()).select_from(Document).where(Document.user_id == user_id)
+        )
+
+document = CRUDDocument()
@@ -0,0 +1,132 @@
+from datetime import datetime
+from typing import Iterable, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.document import Document
+from app.models.usage import UserUsage
+
+class StorageQuotaExceeded(Exception):
+    """O envio deixaria o usuário acima de STORAGE_QUOTA_BYTES."""
+
+    def __init__(self, quota: int):
+        self.quota = quota
+        super().__init__(f"Cota de armazenamento de {quota} bytes excedida")
+
+class CRUDUsage:
+    """
+    Contadores de uso por usuário (documentos e bytes), mantidos na mesma
+    transação que cria, troca ou apaga documentos, para que as telas leiam
+    o uso sem somar a tabela de documentos.
+    """
+
+    def _insert(self, db: AsyncSession):
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        return dialect.insert(UserUsage)
+
+    async def _ensure_rows(self, db: AsyncSession, user_ids: Iterable[int]) -> None:
+        rows = [
+            {"user_id": user_id, "document_count": 0, "bytes_used": 0, "updated_at": datetime.utcnow()}
+            for user_id in user_ids
+        ]
+        if rows:
+            await db.execute(self._insert(db).on_conflict_do_nothing(index_elements=["user_id"]), rows)
+
+    async def get(self, db: AsyncSession, user_id: int) -> Tuple[int, int]:
+        """(documentos, bytes) do usuário."""
+        row = (await db.execute(
+            select(UserUsage.document_count, UserUsage.bytes_used).where(UserUsage.user_id == user_id)
+        )).first()
+        return tuple(row) if row else (0, 0)
+
+    async def fits_quota(self, db: AsyncSession, user_id: int, incoming_bytes: int) -> bool:
+        """Checagem prévia, antes de gravar qualquer byte; a garantia é a de add."""
+        quota = settings.STORAGE_QUOTA_BYTES
+        if quota <= 0:
+            return True
+        _, bytes_used = await self.get(db, user_id)
+        return bytes_used + incoming_bytes <= quota
+
+    async def add(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        documents: int,
+        bytes_: int,
+        *,
+        enforce_quota: bool = False
+    ) -> None:
+        """
+        Soma documentos e bytes (negativos na exclusão) ao uso do usuário. Não
+        faz commit. Com enforce_quota, a soma só acontece se o resultado couber
+        na cota, numa única atualização condicional: dois envios simultâneos
+        não passam juntos do limite. Lança StorageQuotaExceeded caso contrário.
+        """
+        quota = settings.STORAGE_QUOTA_BYTES
+        if enforce_quota and quota > 0 and bytes_ > 0:
+            await self._ensure_rows(db, [user_id])
+            result = await db.execute(
+                update(UserUsage)
+                .where(UserUsage.user_id == user_id, UserUsage.bytes_used + bytes_ <= quota)
+                .values(
+                    document_count=UserUsage.document_count + documents,
+                    bytes_used=UserUsage.bytes_used + bytes_,
+                    updated_at=datetime.utcnow()
+                )
+            )
+            if not result.rowcount:
+                raise StorageQuotaExceeded(quota)
+            return
+        statement = self._insert(db).values(
+            user_id=user_id, document_count=documents, bytes_used=bytes_, updated_at=datetime.utcnow()
+        )
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "document_count": UserUsage.document_count + statement.excluded.document_count,
+                "bytes_used": UserUsage.bytes_used + statement.excluded.bytes_used,
+                "updated_at": statement.excluded.updated_at
+            }
+        ))
+
+    async def reconcile(self, db: AsyncSession, user_ids: Iterable[int]) -> int:
+        """
+        Recalcula os contadores dos usuários a partir dos documentos e corrige
+        os que divergem. Retorna quantos foram corrigidos. Não faz commit.
+
+        As linhas de uso são travadas antes da contagem: um envio concorrente
+        espera o commit e soma o seu documento ao valor já corrigido.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        await self._ensure_rows(db, user_ids)
+        usages = (await db.scalars(
+            select(UserUsage)
+            .where(UserUsage.user_id.in_(user_ids))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )).all()
+        actual = {
+            row.user_id: (row.documents, row.bytes_used)
+            for row in await db.execute(
+                select(
+                    Document.user_id,
+                    func.count().label("documents"),
+                    func.coalesce(func.sum(Document.file_size), 0).label("bytes_used")
+                )
+                .where(Document.user_id.in_(user_ids))
+                .group_by(Document.user_id)
+            )
+        }
+        fixed = 0
+        for usage in usages:
+            expected = actual.get(usage.user_id, (0, 0))
+            if (usage.document_count, usage.bytes_used) != expected:
+                usage.document_count, usage.bytes_used = expected
+                fixed += 1
+        await db.flush()
+        return fixed
+
+usage = CRUDUsage()
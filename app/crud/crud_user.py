@@ -1,25 +1,46 @@
 from typing import Optional, Dict, Any, Union, List
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.usage import UserUsage
 from app.models.user import User
+from app.crud.read_models import UserListItem, columns_for
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.hashing import get_password_hash
+from app.core.hashing import hash_password
 
 class CRUDUser:
-    def get(self, db: Session, id: int) -> Optional[User]:
-        return db.query(User).filter(User.id == id).first()
+    async def get(self, db: AsyncSession, id: int) -> Optional[User]:
+        return await db.get(User, id)
     
-    def get_by_email(self, db: Session, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+    async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        return await db.scalar(select(User).where(User.email == email))
     
-    def get_by_google_id(self, db: Session, google_id: str) -> Optional[User]:
-        return db.query(User).filter(User.google_id == google_id).first()
+    async def get_by_google_id(self, db: AsyncSession, google_id: str) -> Optional[User]:
+        return await db.scalar(select(User).where(User.google_id == google_id))
     
-    def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
     ) -> List[User]:
-        return db.query(User).offset(skip).limit(limit).all()
+        return (await db.scalars(select(User).offset(skip).limit(limit))).all()
     
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    async def list_for_admin(self, db: AsyncSession) -> List[UserListItem]:
+        """
+        Usuários do mais novo para o mais antigo, só com as colunas do painel.
+        Os que estão sendo excluídos (deleted_at) não aparecem.
+        """
+        result = await db.execute(
+            select(*columns_for(
+                UserListItem,
+                User,
+                document_count=func.coalesce(UserUsage.document_count, 0),
+                bytes_used=func.coalesce(UserUsage.bytes_used, 0)
+            ))
+            .outerjoin(UserUsage, UserUsage.user_id == User.id)
+            .where(User.deleted_at.is_(None))
+            .order_by(User.created_at.desc())
+        )
+        return [UserListItem(*row) for row in result]
+    
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
         db_obj = User(
             email=obj_in.email,
             full_name=obj_in.full_name,
@@ -28,15 +49,15 @@ class CRUDUser:
             google_id=obj_in.google_id,
         )
         if obj_in.password:
-            db_obj.hashed_password = get_password_hash(obj_in.password)
+            db_obj.hashed_password = await hash_password(obj_in.password)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
     
-    def update(
+    async def update(
         self,
-        db: Session,
+        db: AsyncSession,
         *,
         db_obj: User,
         obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -46,20 +67,20 @@ class CRUDUser:
         else:
             update_data = obj_in.dict(exclude_unset=True)
         if update_data.get("password"):
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await hash_password(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
         for field in update_data:
             setattr(db_obj, field, update_data[field])
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
     
-    def remove(self, db: Session, *, id: int) -> User:
-        obj = db.query(User).get(id)
-        db.delete(obj)
-        db.commit()
+    async def remove(self, db: AsyncSession, *, id: int) -> User:
+        obj = await db.get(User, id)
+        await db.delete(obj)
+        await db.commit()
         return obj
 
-user = CRUDUser() 
\ No newline at end of file
+user = CRUDUser()
@@ -0,0 +1,43 @@
+"""
+Modelos de leitura para listagens: dataclasses com __slots__ montadas a
+partir de um select() só com as colunas que as telas exibem. Não passam
+pelo identity map da sessão, então não podem ser alteradas e salvas.
+"""
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentListItem:
+    id: int
+    title: Optional[str]
+    description: Optional[str]
+    original_filename: str
+    file_size: int
+    content_type: str
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class UserListItem:
+    id: int
+    full_name: str
+    email: str
+    is_active: bool
+    is_admin: bool
+    created_at: datetime
+    # Vêm de user_usage (zero para quem ainda não tem linha lá)
+    document_count: int
+    bytes_used: int
+
+
+def columns_for(read_model, entity, **columns) -> Tuple:
+    """
+    Colunas do modelo ORM com os mesmos nomes dos campos do modelo de
+    leitura; columns fornece as que vêm de outra tabela ou de uma expressão.
+    """
+    return tuple(
+        columns[field.name] if field.name in columns else getattr(entity, field.name)
+        for field in fields(read_model)
+    )
@@ -1,6 +1,9 @@
 from app.db.base_class import Base
 from app.models.user import User
 from app.models.document import Document
+from app.models.blob import StorageBlob
+from app.models.extraction import DocumentExtraction
+from app.models.job import Job
 
 # Import all models here to ensure they are registered with SQLAlchemy
-__all__ = ["Base", "User", "Document"] 
\ No newline at end of file
+__all__ = ["Base", "User", "Document", "StorageBlob", "DocumentExtraction", "Job"] 
\ No newline at end of file
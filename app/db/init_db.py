@@ -1,13 +1,21 @@
+import os
+import subprocess
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
-from app.db.base import Base, User
+from app.db.base import User
 from app.core.hashing import get_password_hash
 
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 def init_db():
+    # O esquema vem das migrações, não do create_all: assim o banco fica
+    # registrado na revisão atual e o "alembic upgrade head" do deploy
+    # (Dockerfile) não tenta recriar tabelas que já existem
+    subprocess.run(["alembic", "upgrade", "head"], cwd=ROOT, check=True)
+
     engine = create_engine(settings.DATABASE_URL)
-    Base.metadata.create_all(bind=engine)
-    
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
     
@@ -25,4 +33,4 @@ def init_db():
         db.commit()
 
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    init_db() 
@@ -0,0 +1,43 @@
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.usage_service import usage_service
+import argparse
+import asyncio
+
+async def run_reconcile(batch_size: int, after_id: int = 0, schedule: bool = False):
+    try:
+        if schedule:
+            # Só agenda: o worker confere e passa a repetir a cada USAGE_RECONCILE_INTERVAL
+            async with AsyncSessionLocal() as db:
+                await usage_service.schedule(db, after_id=after_id)
+                await db.commit()
+            print("Conferência do uso agendada para o worker.")
+            return
+
+        last_id, checked, fixed = after_id, 0, 0
+        while True:
+            last_id, count, batch_fixed = await usage_service.reconcile_batch(last_id, batch_size)
+            checked += count
+            fixed += batch_fixed
+            if count:
+                print(f"Lote concluído: {count} usuários, {batch_fixed} corrigidos (último id {last_id})")
+            if count < batch_size:
+                break
+    finally:
+        await async_engine.dispose()
+
+    print(f"\nConferência concluída! {checked} usuários, {fixed} contadores corrigidos.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recalcula o uso (documentos e bytes) de cada usuário a partir dos documentos"
+    )
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--after-id", type=int, default=0, help="Começa depois deste id de usuário")
+    parser.add_argument("--schedule", action="store_true", help="Agenda o job no worker em vez de rodar aqui")
+    args = parser.parse_args()
+    from app.core.config import settings
+    asyncio.run(run_reconcile(
+        batch_size=args.batch_size or settings.USAGE_RECONCILE_BATCH_SIZE,
+        after_id=args.after_id,
+        schedule=args.schedule
+    ))
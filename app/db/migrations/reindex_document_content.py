@@ -0,0 +1,65 @@
+from collections import Counter
+from sqlalchemy import or_, select
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.document import Document
+from app.models.extraction import DocumentExtraction
+from app.services.extraction_service import extraction_service
+import argparse
+import asyncio
+
+BATCH_SIZE = 50
+
+async def pending_documents(last_id: int, batch_size: int, force: bool) -> list:
+    """
+    Próximo lote de documentos, em ordem de id. Sem force, só os que ainda
+    não foram extraídos ou tiveram o arquivo trocado desde a extração.
+    """
+    query = (
+        select(Document.id)
+        .outerjoin(DocumentExtraction, DocumentExtraction.document_id == Document.id)
+        .where(Document.id > last_id)
+    )
+    if not force:
+        query = query.where(or_(
+            DocumentExtraction.document_id.is_(None),
+            DocumentExtraction.storage_filename != Document.storage_filename
+        ))
+    async with AsyncSessionLocal() as db:
+        return list(await db.scalars(query.order_by(Document.id).limit(batch_size)))
+
+async def run_reindex(batch_size: int = BATCH_SIZE, force: bool = False, after_id: int = 0):
+    last_id = after_id
+    statuses = Counter()
+
+    try:
+        while True:
+            # Cada documento é gravado na sua própria transação: se o processo
+            # cair, basta rodar de novo e os já extraídos são pulados (com
+            # --force, use --after-id com o último id informado)
+            document_ids = await pending_documents(last_id, batch_size, force)
+            if not document_ids:
+                break
+
+            # O pool de extração limita quantos arquivos são lidos ao mesmo tempo
+            results = await asyncio.gather(
+                *(extraction_service.process_document(document_id) for document_id in document_ids)
+            )
+            statuses.update(status or "skipped" for status in results)
+
+            last_id = document_ids[-1]
+            print(f"Lote concluído: {len(document_ids)} documentos (último id {last_id})")
+    finally:
+        await async_engine.dispose()
+
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+    print(f"\nReindexação concluída! {sum(statuses.values())} documentos ({summary or 'nenhum pendente'}).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extrai o texto dos arquivos existentes e o grava no índice de busca"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="Reprocessa também os já extraídos")
+    parser.add_argument("--after-id", type=int, default=0, help="Começa depois deste id de documento")
+    args = parser.parse_args()
+    asyncio.run(run_reindex(batch_size=args.batch_size, force=args.force, after_id=args.after_id))
@@ -0,0 +1,80 @@
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+from app.core.storage import get_upload_dir, shard_storage_filename
+import argparse
+import os
+
+BATCH_SIZE = 500
+
+def move_file(upload_dir, old_name: str, new_name: str) -> bool:
+    """
+    Move o arquivo para o diretório do shard. É idempotente: se uma execução
+    anterior já moveu o arquivo mas não chegou a gravar o lote, nada é feito.
+    """
+    source = upload_dir / old_name
+    target = upload_dir / new_name
+    if source.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)
+        return True
+    return target.exists()
+
+def run_migration(batch_size: int = BATCH_SIZE):
+    engine = create_engine(settings.DATABASE_URL)
+    upload_dir = get_upload_dir()
+    last_id = 0
+    total = 0
+
+    while True:
+        # Cada lote é uma transação: os arquivos são movidos e todas as linhas
+        # do lote são reescritas de uma vez. Se o processo cair, basta rodar
+        # de novo: só os documentos ainda sem diretório são processados.
+        with engine.begin() as conn:
+            documents = conn.execute(
+                text(
+                    "SELECT id, storage_filename FROM documents "
+                    "WHERE id > :last_id AND storage_filename NOT LIKE '%/%' "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size}
+            ).fetchall()
+            if not documents:
+                break
+
+            document_updates = []
+            blob_updates = {}
+            for doc in documents:
+                new_filename = shard_storage_filename(doc.storage_filename)
+                if not move_file(upload_dir, doc.storage_filename, new_filename):
+                    print(f"Aviso: arquivo do documento {doc.id} não encontrado: {doc.storage_filename}")
+                document_updates.append({"id": doc.id, "new_filename": new_filename})
+                blob_updates[doc.storage_filename] = new_filename
+
+            conn.execute(
+                text("UPDATE documents SET storage_filename = :new_filename WHERE id = :id"),
+                document_updates
+            )
+            conn.execute(
+                text(
+                    "UPDATE storage_blobs SET storage_filename = :new_filename "
+                    "WHERE storage_filename = :old_filename"
+                ),
+                [
+                    {"old_filename": old, "new_filename": new}
+                    for old, new in blob_updates.items()
+                ]
+            )
+
+            last_id = documents[-1].id
+            total += len(documents)
+            print(f"Lote concluído: {len(documents)} documentos (último id {last_id}, total {total})")
+
+    print(f"\nMigração concluída com sucesso! {total} documentos movidos para o layout em shards.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move os arquivos da pasta de uploads para o layout em shards"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    run_migration(batch_size=args.batch_size)
@@ -1,14 +1,68 @@
+from typing import Any, AsyncIterator, Dict
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.pool import (
+    TimedAsyncQueuePool, TimedQueuePool, apply_sqlite_pragmas, engine_options, is_sqlite
+)
 
-engine = create_engine(settings.DATABASE_URL)
+# Drivers assíncronos usados pelas rotas para cada banco suportado
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "postgres": "asyncpg",
+}
+
+# Drivers que já são assíncronos (psycopg 3 serve aos dois modos)
+ASYNC_DRIVER_NAMES = {"aiosqlite", "asyncpg", "psycopg", "psycopg_async"}
+
+def make_async_url(database_url: str) -> str:
+    """
+    Converte a DATABASE_URL síncrona (sqlite://, postgresql://,
+    postgresql+psycopg2://, sqlite+pysqlite://) na URL do driver assíncrono
+    equivalente. URLs que já indicam um driver assíncrono são mantidas.
+    """
+    scheme, separator, rest = database_url.partition("://")
+    backend, _, driver = scheme.partition("+")
+    if backend not in ASYNC_DRIVERS or driver in ASYNC_DRIVER_NAMES:
+        return database_url
+    backend = "postgresql" if backend == "postgres" else backend
+    return f"{backend}+{ASYNC_DRIVERS[backend]}{separator}{rest}"
+
+# Engine síncrona: scripts de linha de comando, migrações e init_db
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrona: usada pelas rotas, para que as esperas pelo banco de
+# requisições concorrentes se sobreponham em vez de travar o event loop
+async_engine = create_async_engine(
+    make_async_url(settings.DATABASE_URL),
+    **engine_options(settings.DATABASE_URL, is_async=True)
+)
+if is_sqlite(settings.DATABASE_URL):
+    apply_sqlite_pragmas(engine)
+    apply_sqlite_pragmas(async_engine.sync_engine)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# expire_on_commit=False: objetos continuam legíveis depois do commit sem
+# disparar um carregamento implícito (que não é permitido em AsyncSession)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
+
+def get_db_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Ocupação e tempo de espera dos pools de conexão deste worker."""
+    stats = {}
+    for name, pool_engine in (("async", async_engine), ("sync", engine)):
+        pool = pool_engine.pool
+        if isinstance(pool, (TimedQueuePool, TimedAsyncQueuePool)):
+            stats[name] = pool.metrics.snapshot(pool)
+    return stats
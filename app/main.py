@@ -1,32 +1,72 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status, File, UploadFile, Form, Body
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response
+from fastapi import FastAPI, Request, Depends, HTTPException, status, File, UploadFile, Form, Body, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import asdict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Annotated
+from typing import Optional, Dict, Any, Annotated, List, Tuple
+import asyncio
+import logging
+import math
 import os
 import uuid
+from urllib.parse import quote
 from jose import JWTError, jwt
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.templating import _TemplateResponse
 from starlette.middleware.sessions import SessionMiddleware
 
-from app.db.session import get_db
-from app.core.security import create_access_token, get_current_user, get_current_user_from_request
-from app.core.hashing import get_password_hash, verify_password
+from app.db.session import get_db, get_db_pool_stats, AsyncSessionLocal
+from app.core.security import (
+    create_access_token, get_current_user, get_current_user_from_request,
+    create_upload_token, decode_upload_token, invalidate_cached_user,
+    authenticate_password
+)
+from app.core.user_cache import CurrentUser
+from app.core.hashing import hash_password
 from app.models import User as UserModel, Document
-from app.schemas import UserCreate, DocumentCreate, User as UserSchema
+from app.schemas import (
+    UserCreate, DocumentCreate, User as UserSchema,
+    DirectUploadRequest, DirectUploadComplete
+)
 from app.core.config import settings
-from app.core.storage import save_upload_file, delete_file, get_file_path
+from app.core.storage import (
+    save_upload_file, get_file_path, shard_storage_filename, FileTooLargeError
+)
+from app.core.batch_upload import TooManyFilesError, expand_uploads, save_upload_files
+from app.core.executors import get_pool_stats, shutdown_executors
+from app.core.log import RequestIdMiddleware, setup_logging, shutdown_logging
+from app.core.profiling import ProfilingMiddleware, list_profiles, profile_path
+from app.core.metrics import (
+    MetricsMiddleware, instrument_templates, monitor_event_loop_lag, render_metrics
+)
+from app.core.downloads import (
+    build_download_response, build_offload_response, content_disposition,
+    document_etag, document_last_modified
+)
+from app.services.storage_service import StorageService
+from app.services.search_service import search_service
+from app.services.job_queue import job_queue
+from app.services.user_deletion_service import user_deletion_service
+from app.services.export_service import export_service
+from app import crud
+from app.crud.crud_usage import StorageQuotaExceeded
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="GuardaDocs")
 
 # Configuração de templates e arquivos estáticos
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
+instrument_templates(templates.env)
+
+storage_service = StorageService()
 
 # Configuração do CORS
 app.add_middleware(
@@ -50,52 +90,112 @@ async def add_user_to_template(request: Request, call_next):
     try:
         response = await call_next(request)
         if isinstance(response, _TemplateResponse):
-            response.context["user"] = await get_current_user_from_request(request, next(get_db()))
+            # Normalmente a rota já resolveu o usuário (request.state) e não há consulta
+            async with AsyncSessionLocal() as db:
+                response.context["user"] = await get_current_user_from_request(request, db)
         return response
     except Exception as e:
-        print(f"Erro no middleware: {str(e)}")
+        logger.exception("Erro no middleware")
         return await call_next(request)
 
-# Dependência para o banco de dados
-def get_db_dependency():
-    db = next(get_db())
-    try:
-        yield db
-    finally:
-        db.close()
+# Perfil de requisições só quando habilitado: desligado, não custa nada
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Adicionados por último para serem os mais externos: o tempo medido inclui
+# os demais middlewares, e o id da requisição vale também para eles
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+# Mede o atraso do event loop enquanto o worker estiver de pé
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    if settings.METRICS_ENABLED:
+        app.state.loop_lag_monitor = asyncio.create_task(
+            monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL)
+        )
+
+# Encerra os pools de threads de E/S junto com a aplicação
+@app.on_event("shutdown")
+async def shutdown_io_pools():
+    monitor = getattr(app.state, "loop_lag_monitor", None)
+    if monitor is not None:
+        monitor.cancel()
+    shutdown_executors(wait=False)
+    shutdown_logging()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato texto do Prometheus, somadas entre os workers."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+async def enqueue_file_cleanup(db: AsyncSession, storage_filenames: list) -> None:
+    """
+    Agenda, na mesma transação que liberou os arquivos (crud.blob.release),
+    a remoção deles do storage pelo worker.
+    """
+    if storage_filenames:
+        await job_queue.enqueue(db, "delete_files", {"storage_filenames": storage_filenames})
+
+async def enqueue_extraction(db: AsyncSession, document: Document) -> None:
+    """Agenda a extração do texto do arquivo do documento para a busca."""
+    await job_queue.enqueue(
+        db,
+        "extract_content",
+        {"document_id": document.id},
+        idempotency_key=f"extract_content:{document.id}"
+    )
+
+async def ensure_quota(db: AsyncSession, user_id: int, incoming_bytes: Optional[int]) -> None:
+    """
+    Recusa o envio antes de gravar qualquer byte quando o tamanho já
+    conhecido não cabe na cota; crud.usage.add confere de novo no commit.
+    """
+    if incoming_bytes and not await crud.usage.fits_quota(db, user_id, incoming_bytes):
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Cota de armazenamento excedida"
+        )
 
 # Rotas da interface web
 @app.get("/", response_class=HTMLResponse)
 async def home(
     request: Request,
-    db: Annotated[Session, Depends(get_db_dependency)]
+    db: Annotated[AsyncSession, Depends(get_db)],
+    cursor: Optional[str] = None
 ):
-    print("Iniciando rota principal")
+    logger.debug("Iniciando rota principal")
     try:
         user = await get_current_user_from_request(request, db)
-        print(f"Usuário: {user}")
         if not user:
-            print("Usuário não autenticado, mostrando página inicial")
+            logger.debug("Usuário não autenticado, mostrando página inicial")
             return templates.TemplateResponse(
                 "index.html",
                 {"request": request, "user": None}
             )
         
         try:
-            print("Buscando documentos do usuário")
-            documents = db.query(Document).filter(Document.user_id == user.id).all()
-            print(f"Documentos encontrados: {len(documents)}")
+            logger.debug("Buscando documentos do usuário", extra={"user_id": user.id})
+            page = await crud.document.list_by_user(
+                db, user.id, limit=settings.DOCUMENTS_PAGE_SIZE, cursor=cursor
+            )
+            logger.debug("Documentos encontrados", extra={"user_id": user.id, "count": len(page.items)})
             return templates.TemplateResponse(
                 "home.html",
                 {
                     "request": request,
-                    "documents": documents,
+                    "documents": page.items,
+                    "cursor": cursor,
+                    "next_cursor": page.next_cursor,
                     "user": user,
                     "settings": settings
                 }
             )
         except Exception as e:
-            print(f"Erro ao carregar documentos: {str(e)}")
+            logger.exception("Erro ao carregar documentos")
             return templates.TemplateResponse(
                 "home.html",
                 {
@@ -107,7 +207,7 @@ async def home(
                 }
             )
     except Exception as e:
-        print(f"Erro na rota principal: {str(e)}")
+        logger.exception("Erro na rota principal")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -120,7 +220,7 @@ async def home(
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(
     request: Request,
-    db: Annotated[Session, Depends(get_db_dependency)]
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
     user = await get_current_user_from_request(request, db)
     if user:
@@ -130,13 +230,13 @@ async def login_page(
 @app.post("/login")
 async def login(
     request: Request,
-    db: Session = Depends(get_db_dependency),
+    db: AsyncSession = Depends(get_db),
     email: str = Form(...),
     password: str = Form(...)
 ):
     try:
-        user = db.query(UserModel).filter(UserModel.email == email).first()
-        if not user or not verify_password(password, user.hashed_password):
+        user = await db.scalar(select(UserModel).where(UserModel.email == email))
+        if not user or not await authenticate_password(db, user, password):
             return templates.TemplateResponse(
                 "login.html",
                 {"request": request, "error": "Email ou senha inválidos", "user": None}
@@ -162,7 +262,7 @@ async def login(
         )
         return response
     except Exception as e:
-        print(f"Erro no login: {str(e)}")
+        logger.exception("Erro no login")
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Erro ao fazer login", "user": None}
@@ -171,7 +271,7 @@ async def login(
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(
     request: Request,
-    db: Annotated[Session, Depends(get_db_dependency)]
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
     user = await get_current_user_from_request(request, db)
     if user:
@@ -181,14 +281,14 @@ async def register_page(
 @app.post("/register")
 async def register(
     request: Request,
-    db: Annotated[Session, Depends(get_db_dependency)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     full_name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...)
 ):
     try:
         # Verificar se o email já está registrado
-        if db.query(UserModel).filter(UserModel.email == email).first():
+        if await db.scalar(select(UserModel).where(UserModel.email == email)):
             return templates.TemplateResponse(
                 "register.html",
                 {"request": request, "error": "Email já registrado", "user": None}
@@ -198,7 +298,7 @@ async def register(
         user = UserModel(
             full_name=full_name,
             email=email,
-            hashed_password=get_password_hash(password),
+            hashed_password=await hash_password(password),
             is_active=True,
             is_admin=False,
             created_at=datetime.utcnow(),
@@ -207,11 +307,11 @@ async def register(
         
         try:
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         except Exception as db_error:
-            db.rollback()
-            print(f"Erro no banco de dados: {str(db_error)}")
+            await db.rollback()
+            logger.exception("Erro no banco de dados")
             return templates.TemplateResponse(
                 "register.html",
                 {"request": request, "error": "Erro ao criar conta no banco de dados", "user": None}
@@ -230,7 +330,7 @@ async def register(
         )
         return response
     except Exception as e:
-        print(f"Erro no registro: {str(e)}")
+        logger.exception("Erro no registro")
         return templates.TemplateResponse(
             "register.html",
             {"request": request, "error": "Erro ao criar conta", "user": None}
@@ -246,7 +346,8 @@ async def logout():
 @app.get("/documents", response_class=HTMLResponse)
 async def documents_page(
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None
 ):
     user = await get_current_user_from_request(request, db)
     if not user:
@@ -256,38 +357,102 @@ async def documents_page(
         )
     
     try:
-        documents = db.query(Document).filter(Document.user_id == user.id).all()
+        page = await crud.document.list_by_user(
+            db, user.id, limit=settings.DOCUMENTS_PAGE_SIZE, cursor=cursor
+        )
         return templates.TemplateResponse(
             "home.html",
-            {"request": request, "documents": documents, "user": user}
+            {
+                "request": request,
+                "documents": page.items,
+                "cursor": cursor,
+                "next_cursor": page.next_cursor,
+                "user": user
+            }
         )
     except Exception as e:
-        print(f"Erro ao carregar documentos: {str(e)}")
+        logger.exception("Erro ao carregar documentos")
         return templates.TemplateResponse(
             "error.html",
             {"request": request, "error": "Erro ao carregar documentos", "user": user}
         )
 
+@app.get("/documents/search", response_class=HTMLResponse)
+async def search_documents_page(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    q: str = "",
+    page: int = Query(1, ge=1)
+):
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": "Faça login para acessar seus documentos", "user": None}
+        )
+    
+    results = await search_service.search(
+        db, user.id, q, limit=settings.DOCUMENTS_PAGE_SIZE, page=page
+    )
+    return templates.TemplateResponse(
+        "home.html",
+        {
+            "request": request,
+            "documents": results.items,
+            "search_query": q,
+            "page": page,
+            "next_page": results.next_page,
+            "user": user,
+            "settings": settings
+        }
+    )
+
+@app.get("/api/v1/documents/search")
+async def search_documents(
+    request: Request,
+    q: str,
+    page: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Busca nos documentos do usuário por título, descrição e nome do arquivo,
+    ignorando acentos e aceitando prefixos, ordenada por relevância.
+    """
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    results = await search_service.search(
+        db, user.id, q, limit=settings.DOCUMENTS_PAGE_SIZE, page=page
+    )
+    return {"items": [asdict(item) for item in results.items], "next_page": results.next_page}
+
 @app.post("/api/v1/documents/")
 async def upload_document(
     request: Request,
     title: str = Form(...),
     description: str = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     user = await get_current_user_from_request(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Não autorizado")
     
-    # Verifica o tamanho do arquivo
-    content = await file.read()
-    if len(content) > settings.MAX_UPLOAD_SIZE:
+    await ensure_quota(db, user.id, file.size)
+    
+    # Salva o arquivo no storage, verificando o tamanho durante a cópia
+    try:
+        original_filename, storage_filename, file_size = await save_upload_file(
+            file, storage=storage_service
+        )
+    except FileTooLargeError:
         raise HTTPException(status_code=400, detail="Arquivo muito grande")
     
     try:
-        # Salva o arquivo localmente
-        original_filename, storage_filename = save_upload_file(file)
+        await crud.usage.add(db, user.id, 1, file_size, enforce_quota=True)
+        if settings.STORAGE_DEDUP:
+            await crud.blob.acquire(db, storage_filename, file_size)
         
         # Cria o documento no banco
         document = Document(
@@ -296,49 +461,413 @@ async def upload_document(
             title=title,
             description=description,
             content_type=file.content_type,
-            file_size=len(content),
+            file_size=file_size,
             user_id=user.id
         )
         db.add(document)
-        db.commit()
-        db.refresh(document)
+        await db.flush()
+        await search_service.index_document(db, document)
+        # O texto do arquivo é extraído e indexado pelo worker
+        await enqueue_extraction(db, document)
+        await db.commit()
+        await db.refresh(document)
         
         # Redireciona para a página de documentos
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
         
+    except StorageQuotaExceeded:
+        await db.rollback()
+        await storage_service.delete_unreferenced_files(db, [storage_filename])
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Cota de armazenamento excedida"
+        )
     except Exception as e:
-        # Se houver erro, tenta deletar o arquivo do storage
-        try:
-            delete_file(storage_filename)
-        except:
-            pass
+        # Se houver erro, remove o arquivo do storage se nenhum outro documento o usa
+        await db.rollback()
+        await storage_service.delete_unreferenced_files(db, [storage_filename])
         raise HTTPException(status_code=500, detail=str(e))
 
+async def mark_over_quota(db: AsyncSession, user_id: int, pending: list) -> list:
+    """
+    No envio em lote, os arquivos entram na ordem recebida enquanto couberem
+    na cota; os demais voltam com erro, sem serem gravados. Arquivos de
+    tamanho desconhecido passam aqui e são conferidos por charge_batch_usage.
+    """
+    if settings.STORAGE_QUOTA_BYTES <= 0:
+        return pending
+    _, bytes_used = await crud.usage.get(db, user_id)
+    available = settings.STORAGE_QUOTA_BYTES - bytes_used
+    checked = []
+    for upload in pending:
+        size = upload.file.size or 0
+        if upload.error is None and size > available:
+            upload = upload._replace(error="Cota de armazenamento excedida")
+        elif upload.error is None:
+            available -= size
+        checked.append(upload)
+    return checked
+
+async def charge_batch_usage(db: AsyncSession, user_id: int, stored: list) -> Tuple[list, list]:
+    """
+    Soma ao uso os arquivos gravados de um lote, um a um na ordem recebida,
+    e retorna (aceitos, acima da cota). Uma soma recusada não altera o uso:
+    o arquivo que estouraria a cota fica de fora e os seguintes ainda podem
+    entrar. Sem cota, tudo entra numa única atualização.
+    """
+    if settings.STORAGE_QUOTA_BYTES <= 0:
+        await crud.usage.add(db, user_id, len(stored), sum(upload.file_size for upload in stored))
+        return stored, []
+    accepted, rejected = [], []
+    for upload in stored:
+        try:
+            await crud.usage.add(db, user_id, 1, upload.file_size, enforce_quota=True)
+        except StorageQuotaExceeded:
+            rejected.append(upload)
+        else:
+            accepted.append(upload)
+    return accepted, rejected
+
+@app.post("/api/v1/documents/batch")
+async def upload_documents_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    description: str = Form(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Envio de vários arquivos numa única requisição; cada .zip/.tar enviado é
+    aberto e os arquivos de dentro dele viram documentos. Os arquivos são
+    gravados em paralelo (até BATCH_UPLOAD_CONCURRENCY por vez) e os
+    documentos inseridos num único INSERT. Retorna o resultado de cada
+    arquivo: um que falha não impede os outros.
+    """
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    try:
+        async with expand_uploads(files) as pending:
+            pending = await mark_over_quota(db, user.id, pending)
+            saved = await save_upload_files(pending, storage=storage_service)
+    except TooManyFilesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    stored = [upload for upload in saved if upload.error is None]
+    documents = []
+    over_quota = []
+    if stored:
+        try:
+            stored, over_quota = await charge_batch_usage(db, user.id, stored)
+            if settings.STORAGE_DEDUP:
+                for upload in stored:
+                    await crud.blob.acquire(db, upload.storage_filename, upload.file_size)
+            
+            if stored:
+                documents = list(await db.scalars(
+                    insert(Document).returning(Document, sort_by_parameter_order=True),
+                    [
+                        {
+                            "original_filename": upload.original_filename,
+                            "storage_filename": upload.storage_filename,
+                            "title": os.path.splitext(upload.original_filename)[0],
+                            "description": description,
+                            "content_type": upload.content_type,
+                            "file_size": upload.file_size,
+                            "user_id": user.id
+                        }
+                        for upload in stored
+                    ]
+                ))
+                await search_service.index_documents(db, documents)
+                # O texto dos arquivos é extraído e indexado pelo worker
+                for document in documents:
+                    await enqueue_extraction(db, document)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            await storage_service.delete_unreferenced_files(
+                db, [upload.storage_filename for upload in stored + over_quota]
+            )
+            raise HTTPException(status_code=500, detail=str(e))
+        if over_quota:
+            # Só os arquivos que ficaram de fora; um blob igual a um aceito é mantido
+            await storage_service.delete_unreferenced_files(
+                db, [upload.storage_filename for upload in over_quota]
+            )
+    
+    rejected = {id(upload) for upload in over_quota}
+    created = iter(documents)
+    results = []
+    for upload in saved:
+        if id(upload) in rejected:
+            results.append({
+                "filename": upload.original_filename,
+                "status": "error",
+                "error": "Cota de armazenamento excedida"
+            })
+        elif upload.error:
+            results.append({"filename": upload.original_filename, "status": "error", "error": upload.error})
+        else:
+            results.append({
+                "filename": upload.original_filename,
+                "status": "created",
+                "document_id": next(created).id,
+                "file_size": upload.file_size
+            })
+    return {"created": len(documents), "failed": len(saved) - len(documents), "results": results}
+
+@app.post("/api/v1/documents/direct-upload")
+async def create_direct_upload(
+    request: Request,
+    upload: DirectUploadRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Prepara um upload feito pelo navegador direto para o bucket S3, sem que
+    os bytes passem pela aplicação. Arquivos pequenos recebem um POST
+    pré-assinado; arquivos grandes recebem URLs pré-assinadas para cada
+    parte de um upload multipart.
+    """
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    if settings.STORAGE_TYPE != "s3":
+        raise HTTPException(status_code=400, detail="Upload direto disponível apenas com storage S3")
+    if upload.file_size <= 0:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    if upload.file_size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=400, detail="Arquivo muito grande")
+    await ensure_quota(db, user.id, upload.file_size)
+    
+    file_extension = os.path.splitext(upload.filename)[1]
+    key = shard_storage_filename(f"{os.urandom(16).hex()}{file_extension}")
+    
+    if upload.file_size < settings.S3_MULTIPART_THRESHOLD:
+        presigned_post = await storage_service.create_presigned_post(
+            key, upload.content_type, settings.MAX_UPLOAD_SIZE
+        )
+        return {
+            "upload_token": create_upload_token(
+                user_id=user.id,
+                key=key,
+                original_filename=upload.filename,
+                content_type=upload.content_type
+            ),
+            "multipart": False,
+            "url": presigned_post["url"],
+            "fields": presigned_post["fields"]
+        }
+    
+    upload_id = await storage_service.create_multipart_upload(key, upload.content_type)
+    part_size = settings.S3_MULTIPART_CHUNK_SIZE
+    parts = await storage_service.presign_upload_parts(
+        key, upload_id, math.ceil(upload.file_size / part_size)
+    )
+    return {
+        "upload_token": create_upload_token(
+            user_id=user.id,
+            key=key,
+            original_filename=upload.filename,
+            content_type=upload.content_type,
+            upload_id=upload_id
+        ),
+        "multipart": True,
+        "part_size": part_size,
+        "parts": parts
+    }
+
+@app.post("/api/v1/documents/direct-upload/complete")
+async def complete_direct_upload(
+    request: Request,
+    upload: DirectUploadComplete,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Conclui um upload direto: fecha o multipart, se houver, confere o objeto
+    no bucket e cria o documento.
+    """
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    if settings.STORAGE_TYPE != "s3":
+        raise HTTPException(status_code=400, detail="Upload direto disponível apenas com storage S3")
+    
+    ticket = decode_upload_token(upload.upload_token)
+    if not ticket or ticket["uid"] != user.id:
+        raise HTTPException(status_code=403, detail="Token de upload inválido")
+    key = ticket["key"]
+    
+    if ticket.get("upload_id"):
+        if not upload.parts:
+            raise HTTPException(status_code=400, detail="Partes do upload não informadas")
+        try:
+            await storage_service.complete_multipart_upload(
+                key,
+                ticket["upload_id"],
+                [(part.part_number, part.etag) for part in upload.parts]
+            )
+        except Exception as e:
+            await storage_service.abort_multipart_upload(key, ticket["upload_id"])
+            raise HTTPException(status_code=400, detail=f"Erro ao concluir upload: {str(e)}")
+    
+    file_size = await storage_service.get_object_size(key)
+    if file_size is None:
+        raise HTTPException(status_code=400, detail="Arquivo não encontrado no storage")
+    if file_size > settings.MAX_UPLOAD_SIZE:
+        await storage_service.delete_file(storage_service.resolve_path(key))
+        raise HTTPException(status_code=400, detail="Arquivo muito grande")
+    
+    # Repetir a conclusão do mesmo upload não cria documentos duplicados
+    document = await db.scalar(select(Document).where(Document.storage_filename == key))
+    if not document:
+        try:
+            await crud.usage.add(db, user.id, 1, file_size, enforce_quota=True)
+        except StorageQuotaExceeded:
+            await db.rollback()
+            await storage_service.delete_file(storage_service.resolve_path(key))
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Cota de armazenamento excedida"
+            )
+        document = Document(
+            original_filename=ticket["filename"],
+            storage_filename=key,
+            title=upload.title,
+            description=upload.description,
+            content_type=ticket["content_type"],
+            file_size=file_size,
+            user_id=user.id
+        )
+        db.add(document)
+        await db.flush()
+        await search_service.index_document(db, document)
+        await enqueue_extraction(db, document)
+        await db.commit()
+        await db.refresh(document)
+    
+    return {"id": document.id, "message": "Documento criado com sucesso"}
+
+async def document_download_response(request: Request, document: Document) -> Response:
+    """
+    Serve o arquivo do documento com suporte a Range e GET condicional,
+    tanto para o storage local quanto para o S3. Conforme
+    LOCAL_DOWNLOAD_DELIVERY/S3_DOWNLOAD_DELIVERY, a transferência é entregue
+    ao nginx ou a uma URL pré-assinada depois da checagem de permissão.
+    """
+    etag = document_etag(document)
+    last_modified = document_last_modified(document)
+    media_type = document.content_type or "application/octet-stream"
+    file_size = document.file_size
+    
+    if settings.STORAGE_TYPE == "s3":
+        if settings.S3_DOWNLOAD_DELIVERY == "presigned":
+            url = await storage_service.create_presigned_get(
+                document.storage_filename,
+                content_disposition(document.original_filename),
+                media_type
+            )
+            return RedirectResponse(url=url, status_code=status.HTTP_302_FOUND)
+        # O corpo só é lido depois que o status já foi enviado: um objeto
+        # ausente precisa virar 404 aqui, antes de montar a resposta
+        info = await storage_service.head_object(document.storage_filename)
+        if info is None:
+            raise FileNotFoundError(document.storage_filename)
+        file_size = info.size
+        etag = info.etag or etag
+        file_path = storage_service.resolve_path(document.storage_filename)
+    else:
+        file_path = await get_file_path(document.storage_filename)
+        if settings.LOCAL_DOWNLOAD_DELIVERY in ("x-accel", "x-sendfile"):
+            if settings.LOCAL_DOWNLOAD_DELIVERY == "x-accel":
+                redirect_header = "x-accel-redirect"
+                redirect_target = settings.X_ACCEL_REDIRECT_PREFIX + quote(document.storage_filename)
+            else:
+                redirect_header = "x-sendfile"
+                redirect_target = file_path
+            return build_offload_response(
+                request,
+                etag=etag,
+                last_modified=last_modified,
+                filename=document.original_filename,
+                media_type=media_type,
+                redirect_header=redirect_header,
+                redirect_target=redirect_target
+            )
+
+    def open_range(start: int, end: int):
+        return storage_service.iter_file_range(file_path, start, end)
+
+    return build_download_response(
+        request,
+        open_range=open_range,
+        file_size=file_size,
+        etag=etag,
+        last_modified=last_modified,
+        filename=document.original_filename,
+        media_type=media_type
+    )
+
+async def export_response(
+    db: AsyncSession, user_id: int, document_ids: Optional[List[int]], filename: str
+) -> StreamingResponse:
+    """
+    ZIP com os documentos escolhidos (ou todos) do usuário, gerado enquanto é
+    enviado. X-Accel-Buffering desliga o buffer do nginx, para que a leitura
+    do storage acompanhe o ritmo do cliente.
+    """
+    if document_ids is not None and len(document_ids) > settings.EXPORT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Selecione no máximo {settings.EXPORT_MAX_DOCUMENTS} documentos"
+        )
+    query = select(Document.id).where(Document.user_id == user_id)
+    if document_ids is not None:
+        query = query.where(Document.id.in_(document_ids))
+    if await db.scalar(query.limit(1)) is None:
+        raise HTTPException(status_code=404, detail="Nenhum documento encontrado")
+    
+    return StreamingResponse(
+        export_service.stream(user_id, document_ids),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": content_disposition(filename),
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.get("/api/v1/documents/export")
+async def export_documents(
+    request: Request,
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Baixa os documentos do usuário (os de ids, ou todos) num único ZIP."""
+    user = await get_current_user_from_request(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    return await export_response(db, user.id, ids, "documentos.zip")
+
 @app.get("/api/v1/documents/{document_id}/download")
 async def download_document(
     request: Request,
     document_id: int,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     user = await get_current_user_from_request(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Não autorizado")
     
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document).where(
         Document.id == document_id,
         Document.user_id == user.id
-    ).first()
+    ))
     
     if not document:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
     try:
-        file_path = await get_file_path(document.storage_filename)
-        return FileResponse(
-            path=file_path,
-            filename=document.original_filename,
-            media_type=document.content_type
-        )
+        return await document_download_response(request, document)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado no servidor")
     except Exception as e:
@@ -348,27 +877,31 @@ async def download_document(
 async def delete_document(
     request: Request,
     document_id: int,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     user = await get_current_user_from_request(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Não autorizado")
     
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document).where(
         Document.id == document_id,
         Document.user_id == user.id
-    ).first()
+    ))
     
     if not document:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
     try:
-        # Deleta o arquivo do storage
-        await delete_file(document.storage_filename)
-        
-        # Deleta o documento do banco
-        db.delete(document)
-        db.commit()
+        # Libera a referência ao arquivo e deleta o documento do banco
+        storage_filename = document.storage_filename
+        orphaned = await crud.blob.release(db, storage_filename)
+        await search_service.remove_documents(db, [document.id])
+        await crud.usage.add(db, document.user_id, -1, -document.file_size)
+        await db.delete(document)
+        # Deleta o arquivo do storage (pelo worker) se era a última referência
+        if orphaned:
+            await enqueue_file_cleanup(db, [storage_filename])
+        await db.commit()
         
         return {"message": "Documento deletado com sucesso"}
     except Exception as e:
@@ -379,9 +912,9 @@ async def delete_document(
 async def get_user(
     user_id: int,
     current_user: UserSchema = Depends(get_current_user),
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    user = await db.scalar(select(UserModel).where(UserModel.id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return UserSchema.model_validate(user)
@@ -389,20 +922,20 @@ async def get_user(
 @app.post("/api/v1/users/", response_model=dict)
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = db.query(UserModel).filter(UserModel.email == user_data.email).first()
+    db_user = await db.scalar(select(UserModel).where(UserModel.email == user_data.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email já registrado")
     
     user = UserModel(
         email=user_data.email,
         full_name=user_data.full_name,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=await hash_password(user_data.password)
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return {"id": user.id, "message": "Usuário criado com sucesso"}
 
@@ -410,9 +943,9 @@ async def create_user(
 @app.post("/api/v1/auth/register", response_model=UserSchema)
 async def api_register(
     user_data: UserCreate,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = db.query(UserModel).filter(UserModel.email == user_data.email).first()
+    db_user = await db.scalar(select(UserModel).where(UserModel.email == user_data.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -422,21 +955,21 @@ async def api_register(
     user = UserModel(
         email=user_data.email,
         full_name=user_data.full_name,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=await hash_password(user_data.password)
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return UserSchema.model_validate(user)
 
 @app.post("/api/v1/auth/login")
 async def api_login(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(UserModel).filter(UserModel.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(UserModel).where(UserModel.email == form_data.username))
+    if not user or not await authenticate_password(db, user, form_data.password):
         return RedirectResponse(
             url="/login?error=Invalid credentials",
             status_code=303
@@ -459,7 +992,7 @@ async def api_login(
 @app.get("/api/v1/auth/me", response_model=UserSchema)
 async def read_users_me(
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     current_user = await get_current_user_from_request(request, db)
     if current_user is None:
@@ -472,8 +1005,8 @@ async def read_users_me(
 # Função auxiliar para verificar se o usuário é admin
 async def get_current_admin(
     request: Request,
-    db: Session = Depends(get_db_dependency)
-) -> UserModel:
+    db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
     current_user = await get_current_user_from_request(request, db)
     if not current_user:
         raise HTTPException(
@@ -491,14 +1024,14 @@ async def get_current_admin(
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_panel(
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Verifica se o usuário é admin
         current_user = await get_current_admin(request, db)
         
         # Busca todos os usuários ordenados por data de criação
-        users = db.query(UserModel).order_by(UserModel.created_at.desc()).all()
+        users = await crud.user.list_for_admin(db)
         
         # Prepara o contexto com todas as informações necessárias
         context = {
@@ -509,7 +1042,7 @@ async def admin_panel(
             "success": request.query_params.get("success")
         }
         
-        print(f"Carregando painel administrativo com {len(users)} usuários")
+        logger.debug("Carregando painel administrativo", extra={"users": len(users)})
         return templates.TemplateResponse("admin.html", context)
         
     except HTTPException as he:
@@ -528,7 +1061,7 @@ async def admin_panel(
             )
         raise he
     except Exception as e:
-        print(f"Erro ao carregar painel administrativo: {str(e)}")
+        logger.exception("Erro ao carregar painel administrativo")
         return templates.TemplateResponse(
             "admin.html",
             {
@@ -543,19 +1076,24 @@ async def admin_panel(
 async def get_user_documents(
     user_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None
 ):
     try:
         # Verifica se o usuário é admin
         current_user = await get_current_admin(request, db)
         
         # Busca o usuário alvo
-        target_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        target_user = await db.scalar(select(UserModel).where(
+            UserModel.id == user_id, UserModel.deleted_at.is_(None)
+        ))
         if not target_user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
-        # Busca os documentos do usuário
-        documents = db.query(Document).filter(Document.user_id == user_id).all()
+        # Busca uma página dos documentos do usuário
+        page = await crud.document.list_by_user(
+            db, user_id, limit=settings.DOCUMENTS_PAGE_SIZE, cursor=cursor
+        )
         
         return templates.TemplateResponse(
             "admin_user_documents.html",
@@ -563,7 +1101,10 @@ async def get_user_documents(
                 "request": request,
                 "user": current_user,
                 "target_user": target_user,
-                "documents": documents
+                "documents": page.items,
+                "document_count": await crud.document.count_by_user(db, user_id),
+                "cursor": cursor,
+                "next_cursor": page.next_cursor
             }
         )
     except HTTPException as he:
@@ -580,7 +1121,7 @@ async def get_user_documents(
             )
         raise he
     except Exception as e:
-        print(f"Erro ao carregar documentos do usuário: {str(e)}")
+        logger.exception("Erro ao carregar documentos do usuário")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -590,17 +1131,29 @@ async def get_user_documents(
             }
         )
 
+@app.get("/admin/users/{user_id}/documents/export")
+async def admin_export_user_documents(
+    user_id: int,
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Baixa os documentos de um usuário (os de ids, ou todos) num único ZIP."""
+    return await export_response(db, user_id, ids, f"documentos-usuario-{user_id}.zip")
+
 @app.post("/admin/users/{user_id}/toggle-status")
 async def toggle_user_status(
     user_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Verifica se o usuário é admin
         await get_current_admin(request, db)
         
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        user = await db.scalar(select(UserModel).where(
+            UserModel.id == user_id, UserModel.deleted_at.is_(None)
+        ))
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
@@ -611,14 +1164,15 @@ async def toggle_user_status(
             )
         
         user.is_active = not user.is_active
-        db.commit()
+        await db.commit()
+        await invalidate_cached_user(user.email)
         
         status = "ativado" if user.is_active else "desativado"
         return {"message": f"Usuário {status} com sucesso"}
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Erro ao alterar status do usuário: {str(e)}")
+        logger.exception("Erro ao alterar status do usuário")
         raise HTTPException(
             status_code=500,
             detail="Erro ao alterar status do usuário"
@@ -628,13 +1182,15 @@ async def toggle_user_status(
 async def delete_user(
     user_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Verifica se o usuário é admin
         await get_current_admin(request, db)
         
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        user = await db.scalar(select(UserModel).where(
+            UserModel.id == user_id, UserModel.deleted_at.is_(None)
+        ))
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
@@ -644,84 +1200,144 @@ async def delete_user(
                 detail="Não é possível excluir um usuário administrador"
             )
         
-        # Deletar documentos do usuário
-        documents = db.query(Document).filter(Document.user_id == user.id).all()
-        for doc in documents:
-            try:
-                await delete_file(doc.storage_filename)
-            except Exception as e:
-                print(f"Erro ao deletar arquivo {doc.storage_filename}: {str(e)}")
-            db.delete(doc)
-        
-        db.delete(user)
-        db.commit()
-        return {"message": "Usuário e seus documentos foram excluídos com sucesso"}
+        # O usuário é desativado agora; documentos, arquivos e a conta são
+        # apagados em lotes pelo worker (job purge_user)
+        await user_deletion_service.request_deletion(db, user)
+        await db.commit()
+        await invalidate_cached_user(user.email)
+        return {
+            "message": "Usuário desativado; seus documentos estão sendo excluídos",
+            "progress_url": f"/admin/users/{user.id}/deletion"
+        }
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Erro ao excluir usuário: {str(e)}")
+        logger.exception("Erro ao excluir usuário")
         raise HTTPException(
             status_code=500,
             detail="Erro ao excluir usuário"
         )
 
+@app.get("/admin/users/{user_id}/deletion")
+async def user_deletion_progress(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Andamento da exclusão de um usuário: documentos que ainda faltam apagar."""
+    user = await db.get(UserModel, user_id)
+    if user is not None and user.deleted_at is None:
+        raise HTTPException(status_code=404, detail="Exclusão não solicitada para este usuário")
+    remaining = await user_deletion_service.remaining_documents(db, user_id)
+    return {
+        "user_id": user_id,
+        "requested_at": user.deleted_at.isoformat() if user else None,
+        "documents_remaining": remaining,
+        "done": user is None
+    }
+
+@app.get("/admin/pools")
+async def admin_pool_stats(
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Ocupação dos pools de threads (hash de senhas, storage) e de conexões e a fila de jobs."""
+    return {
+        "threads": get_pool_stats(),
+        "database": get_db_pool_stats(),
+        "jobs": await job_queue.stats()
+    }
+
+@app.get("/admin/profiles")
+async def admin_list_profiles(
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Perfis de requisições salvos, do mais recente para o mais antigo."""
+    return {"enabled": settings.PROFILING_ENABLED, "profiles": list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def admin_download_profile(
+    profile_id: str,
+    current_user: CurrentUser = Depends(get_current_admin)
+):
+    """Pilhas no formato "folded", para flamegraph.pl, speedscope ou inferno."""
+    path = profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
 @app.get("/admin/documents/{document_id}/download")
 async def admin_download_document(
     document_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     # Verifica se o usuário é admin
     await get_current_admin(request, db)
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.scalar(select(Document).where(Document.id == document_id))
     if not document:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
-    return RedirectResponse(url=document.storage_filename)
+    try:
+        return await document_download_response(request, document)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado no servidor")
 
 @app.delete("/admin/documents/{document_id}")
 async def admin_delete_document(
     document_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     # Verifica se o usuário é admin
     await get_current_admin(request, db)
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.scalar(select(Document).where(Document.id == document_id))
     if not document:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
-    await delete_file(document.storage_filename)
-    db.delete(document)
-    db.commit()
+    storage_filename = document.storage_filename
+    orphaned = await crud.blob.release(db, storage_filename)
+    await search_service.remove_documents(db, [document.id])
+    await crud.usage.add(db, document.user_id, -1, -document.file_size)
+    await db.delete(document)
+    if orphaned:
+        await enqueue_file_cleanup(db, [storage_filename])
+    await db.commit()
     return {"message": "Documento excluído com sucesso"}
 
 @app.get("/profile", response_class=HTMLResponse)
 async def profile_page(
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None
 ):
     try:
         user = await get_current_user_from_request(request, db)
         if not user:
             return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
         
-        # Busca os documentos do usuário
-        documents = db.query(Document).filter(Document.user_id == user.id).all()
+        # Busca uma página dos documentos do usuário
+        page = await crud.document.list_by_user(
+            db, user.id, limit=settings.DOCUMENTS_PAGE_SIZE, cursor=cursor
+        )
+        document_count, bytes_used = await crud.usage.get(db, user.id)
         
         return templates.TemplateResponse(
             "profile.html",
             {
                 "request": request,
                 "user": user,
-                "documents": documents,
+                "documents": page.items,
+                "document_count": document_count,
+                "bytes_used": bytes_used,
+                "cursor": cursor,
+                "next_cursor": page.next_cursor,
                 "settings": settings
             }
         )
     except Exception as e:
-        print(f"Erro ao carregar perfil: {str(e)}")
+        logger.exception("Erro ao carregar perfil")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -734,7 +1350,7 @@ async def profile_page(
 @app.get("/users/edit", response_class=HTMLResponse)
 async def edit_user_page(
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         user = await get_current_user_from_request(request, db)
@@ -750,7 +1366,7 @@ async def edit_user_page(
             }
         )
     except Exception as e:
-        print(f"Erro ao carregar página de edição: {str(e)}")
+        logger.exception("Erro ao carregar página de edição")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -763,7 +1379,7 @@ async def edit_user_page(
 @app.post("/users/edit")
 async def edit_user(
     request: Request,
-    db: Session = Depends(get_db_dependency),
+    db: AsyncSession = Depends(get_db),
     full_name: str = Form(...),
     email: str = Form(...),
     new_password: str = Form(None)
@@ -774,10 +1390,10 @@ async def edit_user(
             return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
         
         # Verifica se o email já está em uso por outro usuário
-        existing_user = db.query(UserModel).filter(
+        existing_user = await db.scalar(select(UserModel).where(
             UserModel.email == email,
             UserModel.id != user.id
-        ).first()
+        ))
         if existing_user:
             return templates.TemplateResponse(
                 "edit_user.html",
@@ -789,19 +1405,21 @@ async def edit_user(
             )
         
         # Atualiza os dados do usuário
-        user.full_name = full_name
-        user.email = email
+        db_user = await db.scalar(select(UserModel).where(UserModel.id == user.id))
+        db_user.full_name = full_name
+        db_user.email = email
         if new_password:
-            user.hashed_password = get_password_hash(new_password)
+            db_user.hashed_password = await hash_password(new_password)
         
-        db.commit()
+        await db.commit()
+        await invalidate_cached_user(user.email, email)
         
         return RedirectResponse(
             url="/users/edit?success=Perfil atualizado com sucesso",
             status_code=status.HTTP_302_FOUND
         )
     except Exception as e:
-        print(f"Erro ao atualizar usuário: {str(e)}")
+        logger.exception("Erro ao atualizar usuário")
         return templates.TemplateResponse(
             "edit_user.html",
             {
@@ -815,17 +1433,17 @@ async def edit_user(
 async def edit_document_page(
     document_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         user = await get_current_user_from_request(request, db)
         if not user:
             return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
         
-        document = db.query(Document).filter(
+        document = await db.scalar(select(Document).where(
             Document.id == document_id,
             Document.user_id == user.id
-        ).first()
+        ))
         
         if not document:
             return templates.TemplateResponse(
@@ -847,7 +1465,7 @@ async def edit_document_page(
             }
         )
     except Exception as e:
-        print(f"Erro ao carregar página de edição do documento: {str(e)}")
+        logger.exception("Erro ao carregar página de edição do documento")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -861,20 +1479,23 @@ async def edit_document_page(
 async def edit_document(
     document_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency),
+    db: AsyncSession = Depends(get_db),
     title: str = Form(...),
     description: str = Form(None),
     file: UploadFile = File(None)
 ):
+    user = document = None
+    # Arquivo novo já gravado no storage e ainda não referenciado por um commit
+    saved_filename = None
     try:
         user = await get_current_user_from_request(request, db)
         if not user:
             return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
         
-        document = db.query(Document).filter(
+        document = await db.scalar(select(Document).where(
             Document.id == document_id,
             Document.user_id == user.id
-        ).first()
+        ))
         
         if not document:
             raise HTTPException(status_code=404, detail="Documento não encontrado")
@@ -884,10 +1505,25 @@ async def edit_document(
         document.description = description
         
         # Se um novo arquivo foi enviado
+        orphaned = []
         if file and file.filename:
-            # Verifica o tamanho do arquivo
-            content = await file.read()
-            if len(content) > settings.MAX_UPLOAD_SIZE:
+            quota_error = {
+                "request": request,
+                "user": user,
+                "document": document,
+                "error": "Cota de armazenamento excedida"
+            }
+            if file.size is not None and not await crud.usage.fits_quota(
+                db, user.id, file.size - document.file_size
+            ):
+                return templates.TemplateResponse("edit_document.html", quota_error)
+            
+            # Salva o novo arquivo antes de remover o antigo
+            try:
+                original_filename, storage_filename, file_size = await save_upload_file(
+                    file, storage=storage_service
+                )
+            except FileTooLargeError:
                 return templates.TemplateResponse(
                     "edit_document.html",
                     {
@@ -898,27 +1534,51 @@ async def edit_document(
                     }
                 )
             
-            # Remove o arquivo antigo
+            saved_filename = storage_filename
             try:
-                await delete_file(document.storage_filename)
-            except Exception as e:
-                print(f"Erro ao deletar arquivo antigo: {str(e)}")
+                await crud.usage.add(
+                    db, user.id, 0, file_size - document.file_size, enforce_quota=True
+                )
+            except StorageQuotaExceeded:
+                # O título e a descrição podem já ter ido ao banco (autoflush):
+                # desfaz tudo antes de descartar o arquivo novo
+                await db.rollback()
+                await storage_service.delete_unreferenced_files(db, [storage_filename])
+                await db.refresh(document)
+                return templates.TemplateResponse("edit_document.html", quota_error)
+            
+            if settings.STORAGE_DEDUP:
+                await crud.blob.acquire(db, storage_filename, file_size)
+            
+            # Libera o arquivo antigo; ele só é apagado depois do commit
+            if await crud.blob.release(db, document.storage_filename):
+                orphaned.append(document.storage_filename)
             
-            # Salva o novo arquivo
-            original_filename, storage_filename = save_upload_file(file)
             document.original_filename = original_filename
             document.storage_filename = storage_filename
             document.content_type = file.content_type
-            document.file_size = len(content)
+            document.file_size = file_size
+            
+            # O conteúdo do arquivo antigo sai do índice; o novo é extraído pelo worker
+            await search_service.index_content(db, document, [])
+            await enqueue_extraction(db, document)
         
-        db.commit()
+        await search_service.index_document(db, document)
+        await enqueue_file_cleanup(db, orphaned)
+        await db.commit()
+        saved_filename = None
         
         return RedirectResponse(
             url=f"/documents/{document_id}/edit?success=Documento atualizado com sucesso",
             status_code=status.HTTP_302_FOUND
         )
     except Exception as e:
-        print(f"Erro ao atualizar documento: {str(e)}")
+        logger.exception("Erro ao atualizar documento")
+        await db.rollback()
+        if saved_filename:
+            await storage_service.delete_unreferenced_files(db, [saved_filename])
+        if document is not None:
+            await db.refresh(document)
         return templates.TemplateResponse(
             "edit_document.html",
             {
@@ -933,14 +1593,16 @@ async def edit_document(
 async def admin_edit_user_page(
     user_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Verifica se o usuário é admin
         current_user = await get_current_admin(request, db)
         
         # Busca o usuário a ser editado
-        target_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        target_user = await db.scalar(select(UserModel).where(
+            UserModel.id == user_id, UserModel.deleted_at.is_(None)
+        ))
         if not target_user:
             return templates.TemplateResponse(
                 "error.html",
@@ -961,7 +1623,7 @@ async def admin_edit_user_page(
             }
         )
     except Exception as e:
-        print(f"Erro ao carregar página de edição: {str(e)}")
+        logger.exception("Erro ao carregar página de edição")
         return templates.TemplateResponse(
             "error.html",
             {
@@ -975,7 +1637,7 @@ async def admin_edit_user_page(
 async def admin_edit_user(
     user_id: int,
     request: Request,
-    db: Session = Depends(get_db_dependency),
+    db: AsyncSession = Depends(get_db),
     full_name: str = Form(...),
     email: str = Form(...),
     new_password: str = Form(None),
@@ -986,15 +1648,17 @@ async def admin_edit_user(
         current_user = await get_current_admin(request, db)
         
         # Busca o usuário a ser editado
-        target_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        target_user = await db.scalar(select(UserModel).where(
+            UserModel.id == user_id, UserModel.deleted_at.is_(None)
+        ))
         if not target_user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
         # Verifica se o email já está em uso por outro usuário
-        existing_user = db.query(UserModel).filter(
+        existing_user = await db.scalar(select(UserModel).where(
             UserModel.email == email,
             UserModel.id != user_id
-        ).first()
+        ))
         if existing_user:
             return templates.TemplateResponse(
                 "admin_edit_user.html",
@@ -1007,20 +1671,22 @@ async def admin_edit_user(
             )
         
         # Atualiza os dados do usuário
+        old_email = target_user.email
         target_user.full_name = full_name
         target_user.email = email
         if new_password:
-            target_user.hashed_password = get_password_hash(new_password)
+            target_user.hashed_password = await hash_password(new_password)
         target_user.is_admin = is_admin
         
-        db.commit()
+        await db.commit()
+        await invalidate_cached_user(old_email, email)
         
         return RedirectResponse(
             url=f"/users/{user_id}/edit?success=Usuário atualizado com sucesso",
             status_code=status.HTTP_302_FOUND
         )
     except Exception as e:
-        print(f"Erro ao atualizar usuário: {str(e)}")
+        logger.exception("Erro ao atualizar usuário")
         return templates.TemplateResponse(
             "admin_edit_user.html",
             {
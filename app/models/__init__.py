@@ -1,5 +1,10 @@
 from .base import Base
 from .user import User
 from .document import Document
+from .blob import StorageBlob
+from .extraction import DocumentExtraction
+from .job import Job
+from .usage import UserUsage
+from . import search
 
-__all__ = ["Base", "User", "Document"] 
\ No newline at end of file
+__all__ = ["Base", "User", "Document", "StorageBlob", "DocumentExtraction", "Job", "UserUsage"] 
\ No newline at end of file
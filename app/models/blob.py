@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db.base_class import Base
+
+class StorageBlob(Base):
+    __tablename__ = "storage_blobs"
+
+    storage_filename = Column(String, primary_key=True)  # Nome do arquivo no storage (digest SHA-256)
+    file_size = Column(Integer, nullable=False)  # Tamanho em bytes
+    ref_count = Column(Integer, nullable=False, default=0)  # Documentos que apontam para o arquivo
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
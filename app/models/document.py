@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -10,11 +10,16 @@ class Document(Base):
     title = Column(String, nullable=True)  # Nome do documento (opcional)
     description = Column(String, nullable=True)  # Descrição do documento (opcional)
     original_filename = Column(String, nullable=False)  # Nome original do arquivo
-    storage_filename = Column(String, nullable=False, unique=True)  # Nome do arquivo no storage
+    storage_filename = Column(String, nullable=False, index=True)  # Nome do arquivo no storage (compartilhado quando há deduplicação)
     file_size = Column(Integer, nullable=False)  # Tamanho em bytes
     content_type = Column(String, nullable=False)  # Tipo MIME
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    user = relationship("User", back_populates="documents") 
\ No newline at end of file
+    user = relationship("User", back_populates="documents")
+
+    __table_args__ = (
+        # Listagem paginada por usuário, do mais recente para o mais antigo
+        Index("ix_documents_user_created_id", "user_id", "created_at", "id"),
+    ) 
\ No newline at end of file
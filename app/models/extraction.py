@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from app.db.base_class import Base
+
+class DocumentExtraction(Base):
+    __tablename__ = "document_extractions"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    storage_filename = Column(String, nullable=False)  # Arquivo de onde o texto foi extraído
+    status = Column(String, nullable=False)  # indexed, empty, unsupported, too_large, timeout ou failed
+    chunk_count = Column(Integer, nullable=False, default=0)  # Trechos gravados no índice de conteúdo
+    char_count = Column(Integer, nullable=False, default=0)  # Caracteres extraídos (após o limite)
+    error = Column(String, nullable=True)  # Motivo da falha, quando houver
+    extracted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,34 @@
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, text
+from app.db.base_class import Base
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # Nome do handler registrado (app.services.jobs)
+    payload = Column(JSON, nullable=False, default=dict)  # Argumentos do handler
+    idempotency_key = Column(String, nullable=True)  # Evita jobs repetidos esperando na fila
+    status = Column(String, nullable=False, default="queued")  # queued, retry, running, done ou dead; outbox: a repassar ao Redis
+    attempts = Column(Integer, nullable=False, default=0)  # Execuções iniciadas
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Não executa antes disso
+    locked_until = Column(DateTime, nullable=True)  # Fim do prazo do worker que pegou o job
+    locked_by = Column(String, nullable=True)  # Worker que está executando
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Busca dos próximos jobs a executar
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        # No máximo um job por chave esperando na fila; depois que ele começa,
+        # a mesma chave pode ser enfileirada de novo
+        Index(
+            "ux_jobs_queued_idempotency_key",
+            "idempotency_key",
+            unique=True,
+            sqlite_where=text("status = 'queued'"),
+            postgresql_where=text("status = 'queued'")
+        ),
+    )
@@ -0,0 +1,69 @@
+from sqlalchemy import DDL, event
+from app.models.document import Document
+
+# Índice de busca textual dos documentos. Não é um modelo ORM: no SQLite é
+# uma tabela virtual FTS5 e no Postgres uma tabela com tsvector e índice
+# GIN, mantida por app.services.search_service.
+SEARCH_TABLE = "document_search"
+
+# Índice do texto extraído dos arquivos, em trechos (app.services.extraction_service)
+CONTENT_TABLE = "document_content"
+
+# No SQLite o rowid de cada trecho é document_id * CHUNK_ROWID_STRIDE + número
+# do trecho: os trechos de um documento formam um intervalo de rowids, que o
+# FTS5 apaga e agrupa sem precisar de outra tabela
+CHUNK_ROWID_STRIDE = 1 << 16
+
+SQLITE_SEARCH_DDL = [
+    # rowid = documents.id; owner ("u<user_id>") restringe a busca ao dono
+    # dentro do próprio índice; remove_diacritics ignora acentos; detail=column
+    # dispensa as posições dos termos (não há busca por frase) e encolhe o índice
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description, original_filename, owner,
+        tokenize = 'unicode61 remove_diacritics 2', detail = column
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {CONTENT_TABLE} USING fts5(
+        content, owner,
+        tokenize = 'unicode61 remove_diacritics 2', detail = column
+    )
+    """,
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+        document_id INTEGER PRIMARY KEY REFERENCES documents (id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        search_vector TSVECTOR NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_vector ON {SEARCH_TABLE} USING GIN (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_user_id ON {SEARCH_TABLE} (user_id)",
+    f"""
+    CREATE TABLE IF NOT EXISTS {CONTENT_TABLE} (
+        document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+        chunk_index INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        search_vector TSVECTOR NOT NULL,
+        PRIMARY KEY (document_id, chunk_index)
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_{CONTENT_TABLE}_vector ON {CONTENT_TABLE} USING GIN (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_{CONTENT_TABLE}_user_id ON {CONTENT_TABLE} (user_id)",
+]
+
+# create_all (init_db, testes) cria o índice junto com a tabela documents
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Document.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Document.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for table in (CONTENT_TABLE, SEARCH_TABLE):
+    event.listen(
+        Document.__table__,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {table}").execute_if(dialect=("sqlite", "postgresql"))
+    )
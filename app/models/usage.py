@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer
+from app.db.base_class import Base
+
+class UserUsage(Base):
+    __tablename__ = "user_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)  # Documentos do usuário
+    bytes_used = Column(BigInteger, nullable=False, default=0)  # Soma de Document.file_size
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
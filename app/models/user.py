@@ -17,6 +17,7 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     last_login = Column(DateTime, nullable=True)  # Último login do usuário
+    deleted_at = Column(DateTime, nullable=True)  # Exclusão pedida; documentos são apagados pelo worker
     
     documents = relationship("Document", back_populates="user", cascade="all, delete-orphan")
 
@@ -1,11 +1,15 @@
 from app.schemas.token import Token, TokenPayload
 from app.schemas.user import UserBase, UserCreate, UserUpdate, User, UserInDB
-from app.schemas.document import DocumentBase, DocumentCreate, Document, DocumentInDB
+from app.schemas.document import (
+    DocumentBase, DocumentCreate, Document, DocumentInDB,
+    DirectUploadRequest, DirectUploadPart, DirectUploadComplete
+)
 
 __all__ = [
     "Token", "TokenPayload",
     "UserBase", "UserCreate", "UserUpdate", "User", "UserInDB",
-    "DocumentBase", "DocumentCreate", "Document", "DocumentInDB"
+    "DocumentBase", "DocumentCreate", "Document", "DocumentInDB",
+    "DirectUploadRequest", "DirectUploadPart", "DirectUploadComplete"
 ]
 
 
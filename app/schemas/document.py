@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -28,4 +28,19 @@ class Document(DocumentInDBBase):
     pass
 
 class DocumentInDB(DocumentInDBBase):
-    pass 
\ No newline at end of file
+    pass
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    file_size: int
+
+class DirectUploadPart(BaseModel):
+    part_number: int
+    etag: str
+
+class DirectUploadComplete(BaseModel):
+    upload_token: str
+    title: str
+    description: Optional[str] = None
+    parts: List[DirectUploadPart] = []
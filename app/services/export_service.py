@@ -0,0 +1,139 @@
+import functools
+import logging
+import posixpath
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.storage import get_file_path
+from app.core.zip_stream import ZipEntry, should_compress, stream_zip
+from app.db.session import AsyncSessionLocal
+from app.models.document import Document
+
+logger = logging.getLogger(__name__)
+
+# Documentos lidos do banco por vez; a conexão não fica presa durante o envio
+EXPORT_PAGE_SIZE = 200
+
+MISSING_FILES_NAME = "ARQUIVOS_AUSENTES.txt"
+
+
+async def _prefetched(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if first:
+        yield first
+    async for chunk in rest:
+        yield chunk
+
+
+async def _single(content: bytes) -> AsyncIterator[bytes]:
+    yield content
+
+
+def unique_name(filename: str, used: Set[str]) -> str:
+    """Nome do arquivo dentro do ZIP: sem diretórios e sem repetir ("nome (2).pdf")."""
+    name = posixpath.basename((filename or "").replace("\\", "/")).lstrip(".") or "documento"
+    stem, extension = posixpath.splitext(name)
+    candidate, counter = name, 1
+    while candidate.lower() in used:
+        counter += 1
+        candidate = f"{stem} ({counter}){extension}"
+    used.add(candidate.lower())
+    return candidate
+
+
+class ExportService:
+    """
+    Exportação dos documentos de um usuário num ZIP gerado durante o envio,
+    sem montar o arquivo em memória ou em disco. Os documentos são lidos do
+    banco em páginas e os arquivos do storage um de cada vez.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._storage = None
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from app.services.storage_service import StorageService
+            self._storage = StorageService()
+        return self._storage
+
+    async def _pages(self, user_id: int, document_ids: Optional[Sequence[int]]) -> AsyncIterator[List]:
+        last_id = 0
+        while True:
+            query = (
+                select(
+                    Document.id, Document.original_filename, Document.storage_filename,
+                    Document.content_type, Document.file_size, Document.created_at, Document.updated_at
+                )
+                .where(Document.user_id == user_id, Document.id > last_id)
+                .order_by(Document.id)
+                .limit(EXPORT_PAGE_SIZE)
+            )
+            if document_ids is not None:
+                query = query.where(Document.id.in_(document_ids))
+            async with self.session_factory() as db:
+                rows = (await db.execute(query)).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+
+    async def _read(self, storage_filename: str, file_size: int) -> AsyncIterator[bytes]:
+        if settings.STORAGE_TYPE == "s3":
+            file_path = self.storage.resolve_path(storage_filename)
+        else:
+            file_path = await get_file_path(storage_filename)
+        if file_size <= 0:
+            return
+        async for chunk in self.storage.iter_file_range(file_path, 0, file_size - 1):
+            yield chunk
+
+    async def entries(
+        self, user_id: int, document_ids: Optional[Sequence[int]] = None
+    ) -> AsyncIterator[ZipEntry]:
+        """
+        Uma entrada por documento. O primeiro bloco de cada arquivo é lido
+        antes de a entrada começar: arquivos que sumiram do storage ficam de
+        fora e são listados em ARQUIVOS_AUSENTES.txt, no fim do ZIP.
+        """
+        used: Set[str] = {MISSING_FILES_NAME.lower()}
+        missing: List[str] = []
+        async for rows in self._pages(user_id, document_ids):
+            for row in rows:
+                source = self._read(row.storage_filename, row.file_size)
+                try:
+                    first = await source.__anext__()
+                except StopAsyncIteration:
+                    first = b""
+                except Exception as e:
+                    logger.warning(
+                        "Exportação: arquivo do documento %s indisponível: %s", row.id, e,
+                        extra={"document_id": row.id}
+                    )
+                    missing.append(f"{row.original_filename} (documento {row.id})")
+                    await source.aclose()
+                    continue
+                yield ZipEntry(
+                    name=unique_name(row.original_filename, used),
+                    modified=row.updated_at or row.created_at,
+                    open=functools.partial(_prefetched, first, source),
+                    compress=should_compress(row.original_filename, row.content_type),
+                    size_hint=row.file_size
+                )
+        if missing:
+            yield ZipEntry(
+                name=MISSING_FILES_NAME,
+                modified=datetime.utcnow(),
+                open=functools.partial(_single, "\n".join(missing).encode("utf-8") + b"\n")
+            )
+
+    def stream(self, user_id: int, document_ids: Optional[Sequence[int]] = None) -> AsyncIterator[bytes]:
+        return stream_zip(self.entries(user_id, document_ids))
+
+
+export_service = ExportService()
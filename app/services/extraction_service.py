@@ -0,0 +1,397 @@
+import codecs
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+from xml.etree import ElementTree
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.db.session import AsyncSessionLocal
+from app.models.document import Document
+from app.models.extraction import DocumentExtraction
+from app.services.search_service import search_service
+
+logger = logging.getLogger(__name__)
+
+# A extração lê arquivos inteiros e gasta CPU: roda em pool próprio, com
+# EXTRACTION_MAX_WORKERS threads, para não competir com os pools de storage.
+# Cada thread acompanha um processo filho, que é morto ao estourar o prazo.
+EXTRACTION_POOL = "extraction"
+
+# forkserver: os filhos não herdam as threads nem as conexões do worker, e
+# este módulo é importado uma vez só, no servidor, em vez de em cada filho
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _mp_context = multiprocessing.get_context("forkserver")
+    _mp_context.set_forkserver_preload([__name__])
+else:
+    _mp_context = multiprocessing.get_context("spawn")
+
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".tsv", ".json", ".xml", ".html", ".htm", ".log"}
+
+# Partes de cada formato de escritório (zip de XML) que contêm o texto
+OFFICE_PARTS = {
+    ".docx": re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml"),
+    ".xlsx": re.compile(r"xl/sharedStrings\.xml"),
+    ".pptx": re.compile(r"ppt/slides/slide\d+\.xml"),
+    ".odt": re.compile(r"content\.xml"),
+    ".ods": re.compile(r"content\.xml"),
+    ".odp": re.compile(r"content\.xml"),
+}
+
+# Elementos de parágrafo (nome sem namespace): w:p, a:p, text:p, text:h e
+# as strings compartilhadas do Excel (si)
+PARAGRAPH_TAGS = {"p", "h", "si"}
+
+TEXT_BLOCK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"\s+")
+
+
+class ExtractionError(Exception):
+    """Falha ao extrair o texto; status é o valor gravado em DocumentExtraction."""
+    status = "failed"
+
+
+class UnsupportedFormat(ExtractionError):
+    status = "unsupported"
+
+
+class ContentTooLarge(ExtractionError):
+    status = "too_large"
+
+
+class ExtractionTimeout(ExtractionError):
+    status = "timeout"
+
+
+class ExtractionResult(NamedTuple):
+    status: str
+    chunks: List[str]
+    char_count: int
+    error: Optional[str] = None
+
+
+def iter_plain_text(path: str) -> Iterator[str]:
+    """Lê o arquivo em blocos: UTF-8 e, se não for, Windows-1252."""
+    with open(path, "rb") as file:
+        block = file.read(TEXT_BLOCK_SIZE)
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(block)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "cp1252"
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        while block:
+            yield decoder.decode(block)
+            block = file.read(TEXT_BLOCK_SIZE)
+        yield decoder.decode(b"", final=True)
+
+
+def iter_pdf_text(path: str) -> Iterator[str]:
+    """Texto de cada página do PDF, uma por vez."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat("Extração de PDF requer o pacote 'pypdf'")
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise UnsupportedFormat("PDF protegido por senha")
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def iter_office_text(path: str, parts: "re.Pattern[str]") -> Iterator[str]:
+    """
+    Texto dos documentos do Office e do LibreOffice, parágrafo a parágrafo,
+    lendo o XML de dentro do zip sem carregar a árvore inteira.
+    """
+    with zipfile.ZipFile(path) as archive:
+        members = [info for info in archive.infolist() if parts.fullmatch(info.filename)]
+        # slide2.xml antes de slide10.xml
+        members.sort(key=lambda info: [
+            int(part) if part.isdigit() else part for part in re.split(r"(\d+)", info.filename)
+        ])
+        for info in members:
+            # O tamanho descompactado também conta: protege contra zip bombs
+            if info.file_size > settings.EXTRACTION_MAX_FILE_SIZE:
+                raise ContentTooLarge(f"{info.filename} tem {info.file_size} bytes descompactado")
+            with archive.open(info) as xml_file:
+                for _, element in ElementTree.iterparse(xml_file, events=("end",)):
+                    if element.tag.rsplit("}", 1)[-1] in PARAGRAPH_TAGS:
+                        yield "".join(element.itertext()) + "\n"
+                        element.clear()
+
+
+def reader_for(filename: str, content_type: Optional[str]) -> Optional[Callable[[str], Iterator[str]]]:
+    """Escolhe o leitor pela extensão do nome original e, na falta dela, pelo tipo MIME."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".pdf" or content_type == "application/pdf":
+        return iter_pdf_text
+    if extension in OFFICE_PARTS:
+        parts = OFFICE_PARTS[extension]
+        return lambda path: iter_office_text(path, parts)
+    if extension in TEXT_EXTENSIONS or (content_type or "").startswith("text/"):
+        return iter_plain_text
+    return None
+
+
+def chunk_text(pieces: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """
+    Junta os pedaços de texto e os devolve em trechos de até chunk_size
+    caracteres, cortados em espaços e com os espaços normalizados.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer = WHITESPACE.sub(" ", buffer + piece)
+        while len(buffer) > chunk_size:
+            cut = buffer.rfind(" ", 1, chunk_size + 1)
+            if cut == -1:
+                cut = chunk_size
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            buffer = buffer[cut:].lstrip()
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+
+def _until(deadline: float, pieces: Iterable[str]) -> Iterator[str]:
+    for piece in pieces:
+        if time.monotonic() > deadline:
+            raise ExtractionTimeout(f"Extração excedeu {settings.EXTRACTION_TIMEOUT}s")
+        yield piece
+
+
+def iter_chunks(pieces: Iterable[str], *, chunk_size: int, max_chars: int) -> Iterator[str]:
+    """Trechos do texto lido, parando em max_chars caracteres."""
+    char_count = 0
+    for chunk in chunk_text(pieces, chunk_size):
+        chunk = chunk[:max_chars - char_count]
+        yield chunk
+        char_count += len(chunk)
+        if char_count >= max_chars:
+            break
+
+
+def extract_chunks(
+    path: str,
+    reader: Callable[[str], Iterator[str]],
+    *,
+    chunk_size: int,
+    max_chars: int,
+    timeout: float
+) -> ExtractionResult:
+    """
+    Extrai o texto do arquivo em trechos, no próprio processo. O prazo é
+    verificado entre páginas/parágrafos; o texto obtido até ele estourar é
+    mantido. Para um prazo garantido, use extract_in_subprocess.
+    """
+    deadline = time.monotonic() + timeout
+    chunks: List[str] = []
+    try:
+        pieces = _until(deadline, reader(path))
+        for chunk in iter_chunks(pieces, chunk_size=chunk_size, max_chars=max_chars):
+            chunks.append(chunk)
+    except ExtractionTimeout as e:
+        return ExtractionResult(e.status, chunks, sum(map(len, chunks)), str(e))
+    except ExtractionError as e:
+        return ExtractionResult(e.status, [], 0, str(e))
+    except Exception as e:
+        return ExtractionResult("failed", [], 0, f"{type(e).__name__}: {e}")
+    return ExtractionResult("indexed" if chunks else "empty", chunks, sum(map(len, chunks)))
+
+
+def _extraction_process(
+    conn,
+    path: str,
+    original_filename: str,
+    content_type: Optional[str],
+    s3_key: Optional[str],
+    chunk_size: int,
+    max_chars: int
+) -> None:
+    """
+    Corpo do processo filho: envia cada trecho (str) assim que sai do leitor
+    e termina com (status, erro), ou (None, None) se tudo correu bem.
+    """
+    try:
+        if s3_key is not None:
+            from app.services.storage_service import StorageService
+            storage = StorageService()
+            storage.s3_client.download_file(storage.bucket_name, s3_key, path)
+        reader = reader_for(original_filename, content_type)
+        for chunk in iter_chunks(reader(path), chunk_size=chunk_size, max_chars=max_chars):
+            conn.send(chunk)
+        conn.send((None, None))
+    except ExtractionError as e:
+        conn.send((e.status, str(e)))
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def extract_in_subprocess(
+    path: str,
+    original_filename: str,
+    content_type: Optional[str],
+    *,
+    chunk_size: int,
+    max_chars: int,
+    timeout: float,
+    s3_key: Optional[str] = None
+) -> ExtractionResult:
+    """
+    Extrai o texto em um processo filho, morto quando o prazo vence, mesmo
+    que o leitor esteja preso em uma única página ou no download do S3 (com
+    s3_key, o objeto é baixado para path pelo filho). Os trechos recebidos
+    até o prazo são mantidos.
+    """
+    deadline = time.monotonic() + timeout
+    receiver, sender = _mp_context.Pipe(duplex=False)
+    process = _mp_context.Process(
+        target=_extraction_process,
+        args=(sender, path, original_filename, content_type, s3_key, chunk_size, max_chars),
+        daemon=True
+    )
+    process.start()
+    sender.close()
+    chunks: List[str] = []
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                process.kill()
+                return ExtractionResult(
+                    "timeout", chunks, sum(map(len, chunks)), f"Extração excedeu {timeout}s"
+                )
+            try:
+                message = receiver.recv()
+            except EOFError:
+                process.join()
+                return ExtractionResult(
+                    "failed", [], 0, f"Processo de extração terminou com código {process.exitcode}"
+                )
+            if isinstance(message, str):
+                chunks.append(message)
+                continue
+            status, error = message
+            if status is not None:
+                return ExtractionResult(status, [], 0, error)
+            return ExtractionResult("indexed" if chunks else "empty", chunks, sum(map(len, chunks)))
+    finally:
+        receiver.close()
+        process.join()
+
+
+class ExtractionService:
+    """
+    Extrai o texto dos arquivos enviados e o grava no índice de conteúdo da
+    busca. Roda no worker (job extract_content) e no reindex;
+    a conexão com o banco só é usada antes e depois da extração.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._storage = None
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from app.services.storage_service import StorageService
+            self._storage = StorageService()
+        return self._storage
+
+    @contextmanager
+    def _local_path(self, storage_filename: str) -> Iterator[str]:
+        """
+        Caminho local do arquivo; no S3, um temporário vazio, que o processo
+        de extração preenche e que é apagado depois.
+        """
+        if settings.STORAGE_TYPE != "s3":
+            yield str(Path(settings.UPLOAD_FOLDER) / storage_filename)
+            return
+        suffix = os.path.splitext(storage_filename)[1]
+        with tempfile.TemporaryDirectory(prefix="guardadocs-extraction-") as tmp_dir:
+            yield os.path.join(tmp_dir, "arquivo" + suffix)
+
+    def extract(
+        self,
+        storage_filename: str,
+        original_filename: str,
+        content_type: Optional[str],
+        file_size: int
+    ) -> ExtractionResult:
+        """Bloqueante: chamada dentro do pool de extração."""
+        if file_size > settings.EXTRACTION_MAX_FILE_SIZE:
+            return ExtractionResult(
+                "too_large", [], 0, f"Arquivo excede {settings.EXTRACTION_MAX_FILE_SIZE} bytes"
+            )
+        if reader_for(original_filename, content_type) is None:
+            return ExtractionResult("unsupported", [], 0)
+        with self._local_path(storage_filename) as path:
+            return extract_in_subprocess(
+                path,
+                original_filename,
+                content_type,
+                chunk_size=settings.EXTRACTION_CHUNK_SIZE,
+                max_chars=settings.EXTRACTION_MAX_CHARS,
+                timeout=settings.EXTRACTION_TIMEOUT,
+                s3_key=storage_filename if settings.STORAGE_TYPE == "s3" else None
+            )
+
+    async def process_document(self, document_id: int) -> Optional[str]:
+        """
+        Extrai e indexa o texto do arquivo atual do documento. Retorna o status
+        gravado, ou None se o documento foi excluído ou teve o arquivo trocado
+        durante a extração (a troca agenda outra extração).
+        """
+        async with self.session_factory() as db:
+            document = await db.get(Document, document_id)
+            if document is None:
+                return None
+            storage_filename = document.storage_filename
+            args = (storage_filename, document.original_filename, document.content_type, document.file_size)
+
+        try:
+            result = await run_in_pool(EXTRACTION_POOL, self.extract, *args)
+        except Exception as e:
+            result = ExtractionResult("failed", [], 0, f"{type(e).__name__}: {e}")
+        if result.error:
+            logger.warning(
+                "Extração do documento %s: %s (%s)", document_id, result.status, result.error,
+                extra={"document_id": document_id}
+            )
+
+        async with self.session_factory() as db:
+            document = await db.scalar(
+                select(Document).where(Document.id == document_id).with_for_update()
+            )
+            if document is None or document.storage_filename != storage_filename:
+                return None
+            await search_service.index_content(db, document, result.chunks)
+            await db.merge(DocumentExtraction(
+                document_id=document_id,
+                storage_filename=storage_filename,
+                status=result.status,
+                chunk_count=len(result.chunks),
+                char_count=result.char_count,
+                error=result.error[:500] if result.error else None,
+                extracted_at=datetime.utcnow()
+            ))
+            await db.commit()
+        return result.status
+
+
+extraction_service = ExtractionService()
@@ -0,0 +1,445 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Handlers por tipo de job, registrados com @job_handler (app.services.jobs)
+HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff exponencial com jitter: JOB_RETRY_BACKOFF * 2^(tentativa - 1), limitado."""
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DatabaseJobQueue:
+    """
+    Fila guardada na tabela jobs. enqueue participa da transação de quem o
+    chama: o job só existe se o commit das alterações que o motivaram
+    acontecer. Um job pego por um worker volta a ficar disponível quando o
+    prazo de visibilidade (JOB_VISIBILITY_TIMEOUT) vence sem conclusão.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        kind: str,
+        payload: Dict[str, Any],
+        *,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> None:
+        """
+        Adiciona o job à transação atual, sem commit. Com idempotency_key, não
+        faz nada se já houver um job com a mesma chave esperando na fila.
+        """
+        job = Job(
+            kind=kind,
+            payload=payload,
+            idempotency_key=idempotency_key,
+            status="queued",
+            attempts=0,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        if idempotency_key is None:
+            db.add(job)
+            return
+        try:
+            # Savepoint: a chave repetida não desfaz o resto da transação
+            async with db.begin_nested():
+                db.add(job)
+        except IntegrityError:
+            pass
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status.in_(("queued", "retry")), Job.run_at <= now),
+            and_(Job.status == "running", Job.locked_until < now)
+        )
+
+    async def claim(self, worker_id: str, limit: int) -> List[ClaimedJob]:
+        """Reserva até limit jobs prontos para este worker."""
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            # SKIP LOCKED (Postgres): workers concorrentes pegam jobs diferentes.
+            # O UPDATE repete o filtro, o que basta no SQLite (um escritor por vez).
+            job_ids = (await db.scalars(
+                select(Job.id)
+                .where(self._claimable(now))
+                .order_by(Job.run_at, Job.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not job_ids:
+                return []
+            result = await db.execute(
+                update(Job)
+                .where(Job.id.in_(job_ids), self._claimable(now))
+                .values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+                )
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = [ClaimedJob(*row) for row in result.all()]
+            await db.commit()
+        return claimed
+
+    async def complete(self, job: ClaimedJob, worker_id: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.locked_by == worker_id)
+                .values(status="done", finished_at=datetime.utcnow(), locked_until=None, last_error=None)
+            )
+            await db.commit()
+
+    async def fail(self, job: ClaimedJob, worker_id: str, error: str, retry: bool = True) -> None:
+        """Agenda uma nova tentativa com backoff ou, esgotadas as tentativas, encerra o job."""
+        now = datetime.utcnow()
+        if retry and job.attempts < job.max_attempts:
+            values = dict(status="retry", run_at=now + timedelta(seconds=retry_delay(job.attempts)))
+        else:
+            values = dict(status="dead", finished_at=now)
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.locked_by == worker_id)
+                .values(locked_until=None, last_error=error[:1000], **values)
+            )
+            await db.commit()
+
+    async def stats(self) -> Dict[str, int]:
+        """Quantidade de jobs por status."""
+        async with self.session_factory() as db:
+            rows = await db.execute(select(Job.status, func.count()).group_by(Job.status))
+            return {status: count for status, count in rows}
+
+    async def purge_finished(self) -> int:
+        """Apaga os jobs concluídos há mais de JOB_RETENTION_DAYS; os mortos ficam para análise."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(Job).where(Job.status == "done", Job.finished_at < cutoff)
+            )
+            await db.commit()
+            return result.rowcount
+
+
+class RedisJobQueue:
+    """
+    Fila no Redis (JOB_QUEUE_BACKEND=redis), para não disputar o banco com as
+    requisições. Os jobs ficam em um sorted set cujo score é o horário em que
+    podem ser pegos; ao pegar um job o worker move o score para o fim do
+    prazo de visibilidade.
+
+    enqueue grava o job na tabela jobs com status "outbox", na transação de
+    quem o chama, e o worker o repassa ao Redis antes de buscar jobs: um
+    commit sem o Redis disponível (ou um processo que cai logo depois dele)
+    não perde o job.
+    """
+
+    prefix = "guardadocs:jobs:"
+
+    # KEYS: ready, prefixo dos jobs, prefixo das chaves, sequência, prefixo do outbox
+    # ARGV: kind, payload, idempotency_key, run_at, max_attempts, id no outbox, retenção
+    ENQUEUE_SCRIPT = """
+    if redis.call('SET', KEYS[5] .. ARGV[6], 1, 'NX', 'EX', ARGV[7]) == false then return 0 end
+    if ARGV[3] ~= '' and redis.call('EXISTS', KEYS[3] .. ARGV[3]) == 1 then return 0 end
+    local id = redis.call('INCR', KEYS[4])
+    redis.call('HSET', KEYS[2] .. id, 'kind', ARGV[1], 'payload', ARGV[2], 'idempotency_key', ARGV[3],
+        'attempts', 0, 'max_attempts', ARGV[5], 'status', 'queued')
+    if ARGV[3] ~= '' then redis.call('SET', KEYS[3] .. ARGV[3], id) end
+    redis.call('ZADD', KEYS[1], ARGV[4], id)
+    return id
+    """
+
+    # KEYS: ready, prefixo dos jobs, prefixo das chaves
+    # ARGV: agora, limite, fim do prazo de visibilidade, worker
+    CLAIM_SCRIPT = """
+    local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    local claimed = {}
+    for _, id in ipairs(ids) do
+        local job = KEYS[2] .. id
+        redis.call('ZADD', KEYS[1], ARGV[3], id)
+        redis.call('HINCRBY', job, 'attempts', 1)
+        redis.call('HSET', job, 'status', 'running', 'locked_by', ARGV[4])
+        local key = redis.call('HGET', job, 'idempotency_key')
+        if key and key ~= '' and redis.call('GET', KEYS[3] .. key) == id then
+            redis.call('DEL', KEYS[3] .. key)
+        end
+        table.insert(claimed, {id, unpack(redis.call('HMGET', job, 'kind', 'payload', 'attempts', 'max_attempts'))})
+    end
+    return claimed
+    """
+
+    # Só o worker que pegou o job o encerra: se o prazo de visibilidade venceu
+    # e outro worker já o pegou, a conclusão atrasada é ignorada
+    # KEYS: ready, job
+    # ARGV: worker, id, agora, retenção
+    COMPLETE_SCRIPT = """
+    if redis.call('HGET', KEYS[2], 'locked_by') ~= ARGV[1] then return 0 end
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('HSET', KEYS[2], 'status', 'done', 'finished_at', ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    return 1
+    """
+
+    # KEYS: ready, job, mortos
+    # ARGV: worker, id, status ("retry" ou "dead"), próxima tentativa, erro
+    FAIL_SCRIPT = """
+    if redis.call('HGET', KEYS[2], 'locked_by') ~= ARGV[1] then return 0 end
+    redis.call('HSET', KEYS[2], 'status', ARGV[3], 'last_error', ARGV[5])
+    if ARGV[3] == 'retry' then
+        redis.call('ZADD', KEYS[1], ARGV[4], ARGV[2])
+    else
+        redis.call('ZREM', KEYS[1], ARGV[2])
+        redis.call('SADD', KEYS[3], ARGV[2])
+    end
+    return 1
+    """
+
+    # Jobs repassados do outbox ao Redis por consulta
+    OUTBOX_BATCH_SIZE = 100
+
+    def __init__(self, url: str, session_factory: async_sessionmaker = AsyncSessionLocal):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("JOB_QUEUE_BACKEND=redis requer o pacote 'redis'")
+        self.client = redis.from_url(url, decode_responses=True)
+        self.session_factory = session_factory
+        self._enqueue = self.client.register_script(self.ENQUEUE_SCRIPT)
+        self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+        self._complete = self.client.register_script(self.COMPLETE_SCRIPT)
+        self._fail = self.client.register_script(self.FAIL_SCRIPT)
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        kind: str,
+        payload: Dict[str, Any],
+        *,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> None:
+        """
+        Adiciona o job ao outbox na transação atual, sem commit. A chave de
+        idempotência é conferida no Redis, quando o job é repassado.
+        """
+        db.add(Job(
+            kind=kind,
+            payload=payload,
+            idempotency_key=idempotency_key,
+            status="outbox",
+            attempts=0,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        ))
+
+    async def forward_outbox(self) -> int:
+        """
+        Envia ao Redis os jobs do outbox e os remove da tabela. A marca do id
+        no Redis faz com que um lote reenviado (falha antes do commit) não
+        duplique jobs.
+        """
+        async with self.session_factory() as db:
+            jobs = (await db.scalars(
+                select(Job)
+                .where(Job.status == "outbox")
+                .order_by(Job.id)
+                .limit(self.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not jobs:
+                return 0
+            for job in jobs:
+                run_at = job.run_at.replace(tzinfo=timezone.utc).timestamp()
+                await self._enqueue(
+                    keys=[self.prefix + "ready", self.prefix + "job:", self.prefix + "key:",
+                          self.prefix + "seq", self.prefix + "outbox:"],
+                    args=[job.kind, json.dumps(job.payload), job.idempotency_key or "", run_at,
+                          job.max_attempts, job.id, settings.JOB_RETENTION_DAYS * 24 * 3600]
+                )
+            await db.execute(delete(Job).where(Job.id.in_([job.id for job in jobs])))
+            await db.commit()
+        return len(jobs)
+
+    async def claim(self, worker_id: str, limit: int) -> List[ClaimedJob]:
+        while await self.forward_outbox() == self.OUTBOX_BATCH_SIZE:
+            pass
+        now = time.time()
+        rows = await self._claim(
+            keys=[self.prefix + "ready", self.prefix + "job:", self.prefix + "key:"],
+            args=[now, limit, now + settings.JOB_VISIBILITY_TIMEOUT, worker_id]
+        )
+        return [
+            ClaimedJob(int(job_id), kind, json.loads(payload), int(attempts), int(max_attempts))
+            for job_id, kind, payload, attempts, max_attempts in rows
+        ]
+
+    async def complete(self, job: ClaimedJob, worker_id: str) -> None:
+        await self._complete(
+            keys=[self.prefix + "ready", f"{self.prefix}job:{job.id}"],
+            args=[worker_id, job.id, time.time(), settings.JOB_RETENTION_DAYS * 24 * 3600]
+        )
+
+    async def fail(self, job: ClaimedJob, worker_id: str, error: str, retry: bool = True) -> None:
+        if retry and job.attempts < job.max_attempts:
+            status, run_at = "retry", time.time() + retry_delay(job.attempts)
+        else:
+            status, run_at = "dead", 0
+        await self._fail(
+            keys=[self.prefix + "ready", f"{self.prefix}job:{job.id}", self.prefix + "dead"],
+            args=[worker_id, job.id, status, run_at, error[:1000]]
+        )
+
+    async def stats(self) -> Dict[str, int]:
+        async with self.session_factory() as db:
+            outbox = await db.scalar(select(func.count()).where(Job.status == "outbox"))
+        return {
+            "outbox": outbox,
+            "pending": await self.client.zcard(self.prefix + "ready"),
+            "dead": await self.client.scard(self.prefix + "dead"),
+        }
+
+    async def purge_finished(self) -> int:
+        # Jobs concluídos expiram sozinhos (EXPIRE em complete)
+        return 0
+
+
+class JobWorker:
+    """
+    Executa os jobs da fila, até JOB_WORKER_CONCURRENCY ao mesmo tempo.
+    Cada execução tem o prazo de visibilidade como limite de tempo, para
+    que o job não rode em dois workers ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        queue,
+        handlers: Optional[Dict[str, JobHandler]] = None,
+        *,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        worker_id: Optional[str] = None
+    ):
+        self.queue = queue
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.worker_id = worker_id or default_worker_id()
+        self._running: Set[asyncio.Task] = set()
+
+    async def _execute(self, job: ClaimedJob) -> None:
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await self.queue.fail(job, self.worker_id, f"Tipo de job desconhecido: {job.kind}", retry=False)
+            return
+        try:
+            await asyncio.wait_for(handler(job.payload), timeout=settings.JOB_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(
+                "Job %s (%s) falhou na tentativa %s: %s", job.id, job.kind, job.attempts, error,
+                extra={"job_id": job.id, "job_kind": job.kind}
+            )
+            await self.queue.fail(job, self.worker_id, error)
+        else:
+            await self.queue.complete(job, self.worker_id)
+
+    async def _start_ready(self) -> int:
+        free = self.concurrency - len(self._running)
+        if free <= 0:
+            return 0
+        jobs = await self.queue.claim(self.worker_id, free)
+        for job in jobs:
+            task = asyncio.create_task(self._execute(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        return len(jobs)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Processa a fila até stop ser sinalizado; os jobs em andamento terminam antes de sair."""
+        last_purge = 0.0
+        while not stop.is_set():
+            if time.monotonic() - last_purge > 3600:
+                await self.queue.purge_finished()
+                last_purge = time.monotonic()
+            try:
+                started = await self._start_ready()
+            except Exception as e:
+                logger.exception("Erro ao buscar jobs")
+                started = 0
+            if len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+            elif not started:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def run_until_empty(self) -> None:
+        """Processa os jobs prontos até a fila esvaziar (worker.py --burst e testes)."""
+        while await self._start_ready() or self._running:
+            if self._running:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+
+
+def create_job_queue():
+    if settings.JOB_QUEUE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("JOB_QUEUE_BACKEND=redis requer REDIS_URL")
+        return RedisJobQueue(settings.REDIS_URL)
+    return DatabaseJobQueue()
+
+
+job_queue = create_job_queue()
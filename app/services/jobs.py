@@ -0,0 +1,41 @@
+from typing import Any, Dict
+
+from app.db.session import AsyncSessionLocal
+from app.services.extraction_service import extraction_service
+from app.services.job_queue import job_handler
+from app.services.storage_service import StorageService
+from app.services.user_deletion_service import user_deletion_service
+from app.services.usage_service import usage_service
+
+# Trabalho feito pelo worker.py depois das requisições. Os handlers podem
+# rodar mais de uma vez para o mesmo job (nova tentativa, prazo de
+# visibilidade vencido) e por isso precisam ser idempotentes.
+
+storage_service = StorageService()
+
+
+@job_handler("extract_content")
+async def extract_content(payload: Dict[str, Any]) -> None:
+    """Extrai e indexa o texto do arquivo atual do documento."""
+    await extraction_service.process_document(payload["document_id"])
+
+
+@job_handler("delete_files")
+async def delete_files(payload: Dict[str, Any]) -> None:
+    """Apaga do storage os arquivos que nenhum documento referencia mais."""
+    async with AsyncSessionLocal() as db:
+        failed = await storage_service.delete_unreferenced_files(db, payload["storage_filenames"])
+    if failed:
+        raise RuntimeError(f"Não foi possível apagar {len(failed)} arquivo(s): {', '.join(failed)}")
+
+
+@job_handler("purge_user")
+async def purge_user(payload: Dict[str, Any]) -> None:
+    """Apaga em lotes os documentos e a conta de um usuário marcado para exclusão."""
+    await user_deletion_service.purge_user(payload["user_id"])
+
+
+@job_handler("reconcile_usage")
+async def reconcile_usage(payload: Dict[str, Any]) -> None:
+    """Confere os contadores de uso por usuário e agenda a próxima conferência."""
+    await usage_service.run_job(payload.get("after_id", 0))
@@ -0,0 +1,259 @@
+import re
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+from sqlalchemy import bindparam, delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud.read_models import DocumentListItem, columns_for
+from app.models.document import Document
+from app.models.extraction import DocumentExtraction
+from app.models.search import CHUNK_ROWID_STRIDE, CONTENT_TABLE, SEARCH_TABLE
+
+# Termos considerados por busca; o resto da consulta é ignorado
+MAX_QUERY_TERMS = 8
+
+# Peso de cada coluna na ordenação: título > descrição > nome do arquivo
+TITLE_WEIGHT, DESCRIPTION_WEIGHT, FILENAME_WEIGHT = 10.0, 5.0, 2.0
+
+RESULT_COLUMNS = (
+    "d.id, d.title, d.description, d.original_filename, "
+    "d.file_size, d.content_type, d.created_at"
+)
+
+
+class SearchPage(NamedTuple):
+    items: List[DocumentListItem]
+    next_page: Optional[int]
+
+
+def query_terms(query: str) -> List[str]:
+    """Palavras da consulta, sem operadores: a sintaxe do índice nunca vem do usuário."""
+    return re.findall(r"[^\W_]+", query.lower())[:MAX_QUERY_TERMS]
+
+
+class SearchService:
+    """
+    Busca textual em título, descrição e nome do arquivo dos documentos e no
+    texto extraído dos arquivos. Usa FTS5 no SQLite e tsvector/GIN no
+    Postgres. As atualizações do índice não fazem commit: participam da
+    transação que altera o documento.
+    """
+
+    def _dialect(self, db: AsyncSession) -> str:
+        return db.get_bind().dialect.name
+
+    async def index_document(self, db: AsyncSession, document: Document) -> None:
+        """Insere ou atualiza o documento no índice (o id já deve existir: use flush)."""
+        await self.index_documents(db, [document])
+
+    async def index_documents(self, db: AsyncSession, documents: Sequence[Document]) -> None:
+        """Versão de index_document para vários documentos, numa chamada executemany."""
+        if not documents:
+            return
+        params = [
+            {
+                "id": document.id,
+                "user_id": document.user_id,
+                "title": document.title or "",
+                "description": document.description or "",
+                "filename": document.original_filename or "",
+                "owner": f"u{document.user_id}",
+                "config": settings.SEARCH_PG_CONFIG,
+            }
+            for document in documents
+        ]
+        if self._dialect(db) == "postgresql":
+            await db.execute(text(f"""
+                INSERT INTO {SEARCH_TABLE} (document_id, user_id, search_vector)
+                VALUES (:id, :user_id,
+                    setweight(to_tsvector(CAST(:config AS regconfig), unaccent(:title)), 'A') ||
+                    setweight(to_tsvector(CAST(:config AS regconfig), unaccent(:description)), 'B') ||
+                    setweight(to_tsvector(CAST(:config AS regconfig), unaccent(
+                        regexp_replace(:filename, '[^[:alnum:]]+', ' ', 'g')
+                    )), 'C'))
+                ON CONFLICT (document_id) DO UPDATE
+                SET user_id = EXCLUDED.user_id, search_vector = EXCLUDED.search_vector
+            """), params)
+            return
+        await db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), params)
+        await db.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, original_filename, owner)
+            VALUES (:id, :title, :description, :filename, :owner)
+        """), params)
+
+    async def index_content(
+        self, db: AsyncSession, document: Document, chunks: Sequence[str]
+    ) -> None:
+        """Substitui os trechos de texto extraído do documento no índice."""
+        chunks = chunks[:CHUNK_ROWID_STRIDE]
+        await self._remove_content(db, document.id)
+        if not chunks:
+            return
+        if self._dialect(db) == "postgresql":
+            await db.execute(text(f"""
+                INSERT INTO {CONTENT_TABLE} (document_id, chunk_index, user_id, search_vector)
+                VALUES (:id, :chunk_index, :user_id,
+                    to_tsvector(CAST(:config AS regconfig), unaccent(:content)))
+            """), [
+                {
+                    "id": document.id,
+                    "chunk_index": index,
+                    "user_id": document.user_id,
+                    "content": chunk,
+                    "config": settings.SEARCH_PG_CONFIG
+                }
+                for index, chunk in enumerate(chunks)
+            ])
+            return
+        await db.execute(text(f"""
+            INSERT INTO {CONTENT_TABLE} (rowid, content, owner) VALUES (:rowid, :content, :owner)
+        """), [
+            {
+                "rowid": document.id * CHUNK_ROWID_STRIDE + index,
+                "content": chunk,
+                "owner": f"u{document.user_id}"
+            }
+            for index, chunk in enumerate(chunks)
+        ])
+
+    async def _remove_content(self, db: AsyncSession, document_id: int) -> None:
+        if self._dialect(db) == "postgresql":
+            await db.execute(
+                text(f"DELETE FROM {CONTENT_TABLE} WHERE document_id = :id"), {"id": document_id}
+            )
+        else:
+            await db.execute(
+                text(f"DELETE FROM {CONTENT_TABLE} WHERE rowid BETWEEN :first AND :last"),
+                {
+                    "first": document_id * CHUNK_ROWID_STRIDE,
+                    "last": (document_id + 1) * CHUNK_ROWID_STRIDE - 1
+                }
+            )
+
+    async def remove_documents(self, db: AsyncSession, document_ids: Iterable[int]) -> None:
+        """
+        Tira os documentos do índice, com o conteúdo extraído e o estado da
+        extração. O número de comandos não depende de quantos documentos são.
+        """
+        document_ids = list(document_ids)
+        if not document_ids:
+            return
+        ids = bindparam("ids", expanding=True)
+        if self._dialect(db) == "postgresql":
+            await db.execute(
+                text(f"DELETE FROM {SEARCH_TABLE} WHERE document_id IN :ids").bindparams(ids),
+                {"ids": document_ids}
+            )
+            await db.execute(
+                text(f"DELETE FROM {CONTENT_TABLE} WHERE document_id IN :ids").bindparams(ids),
+                {"ids": document_ids}
+            )
+        else:
+            await db.execute(
+                text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids").bindparams(ids),
+                {"ids": document_ids}
+            )
+            # Uma faixa de rowid por documento, numa única chamada executemany
+            await db.execute(
+                text(f"DELETE FROM {CONTENT_TABLE} WHERE rowid BETWEEN :first AND :last"),
+                [
+                    {
+                        "first": document_id * CHUNK_ROWID_STRIDE,
+                        "last": (document_id + 1) * CHUNK_ROWID_STRIDE - 1
+                    }
+                    for document_id in document_ids
+                ]
+            )
+        await db.execute(
+            delete(DocumentExtraction).where(DocumentExtraction.document_id.in_(document_ids))
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        *,
+        limit: int,
+        page: int = 1
+    ) -> SearchPage:
+        """
+        Documentos do usuário que contêm todos os termos (como prefixo), do
+        mais relevante para o menos relevante. Os que casam pelos metadados
+        vêm antes dos que casam só pelo conteúdo (todos os termos em um trecho).
+        """
+        terms = query_terms(query)
+        if not terms:
+            return SearchPage([], None)
+        params = {"user_id": user_id, "limit": limit + 1, "offset": (max(page, 1) - 1) * limit}
+
+        if self._dialect(db) == "postgresql":
+            params.update(
+                tsquery=" & ".join(f"{term}:*" for term in terms),
+                config=settings.SEARCH_PG_CONFIG
+            )
+            statement = text(f"""
+                WITH query AS (
+                    SELECT to_tsquery(CAST(:config AS regconfig), unaccent(:tsquery)) AS q
+                ),
+                hits AS (
+                    SELECT s.document_id AS id, 0 AS tier, ts_rank_cd(s.search_vector, query.q) AS score
+                    FROM {SEARCH_TABLE} s, query
+                    WHERE s.user_id = :user_id AND s.search_vector @@ query.q
+                    UNION ALL
+                    SELECT c.document_id, 1, ts_rank_cd(c.search_vector, query.q)
+                    FROM {CONTENT_TABLE} c, query
+                    WHERE c.user_id = :user_id AND c.search_vector @@ query.q
+                )
+                SELECT {RESULT_COLUMNS}
+                FROM (
+                    SELECT id,
+                        max(CASE WHEN tier = 0 THEN score END) AS metadata_score,
+                        max(CASE WHEN tier = 1 THEN score END) AS content_score
+                    FROM hits GROUP BY id
+                ) h
+                JOIN documents d ON d.id = h.id
+                ORDER BY h.metadata_score DESC NULLS LAST, h.content_score DESC, d.id DESC
+                LIMIT :limit OFFSET :offset
+            """)
+        else:
+            # Termos restritos às colunas de texto; owner filtra dentro do FTS5
+            matched = " AND ".join(f'"{term}"*' for term in terms)
+            params.update(
+                match=f"owner : u{user_id} AND {{title description original_filename}} : ({matched})",
+                content_match=f"owner : u{user_id} AND content : ({matched})",
+                stride=CHUNK_ROWID_STRIDE
+            )
+            # bm25 é negativo: quanto menor, mais relevante
+            statement = text(f"""
+                WITH hits AS (
+                    SELECT rowid AS id, 0 AS tier,
+                        bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}, {FILENAME_WEIGHT}, 0.0) AS score
+                    FROM {SEARCH_TABLE}
+                    WHERE {SEARCH_TABLE} MATCH :match
+                    UNION ALL
+                    SELECT rowid / :stride, 1, bm25({CONTENT_TABLE}, 1.0, 0.0)
+                    FROM {CONTENT_TABLE}
+                    WHERE {CONTENT_TABLE} MATCH :content_match
+                )
+                SELECT {RESULT_COLUMNS}
+                FROM (
+                    SELECT id,
+                        min(CASE WHEN tier = 0 THEN score END) AS metadata_score,
+                        min(CASE WHEN tier = 1 THEN score END) AS content_score
+                    FROM hits GROUP BY id
+                ) h
+                JOIN documents d ON d.id = h.id
+                WHERE d.user_id = :user_id
+                ORDER BY h.metadata_score IS NULL, h.metadata_score, h.content_score, d.id DESC
+                LIMIT :limit OFFSET :offset
+            """)
+
+        # Colunas tipadas: created_at volta como datetime também no SQLite
+        statement = statement.columns(*columns_for(DocumentListItem, Document))
+        rows = (await db.execute(statement, params)).all()
+        items = [DocumentListItem(*row) for row in rows[:limit]]
+        next_page = max(page, 1) + 1 if len(rows) > limit else None
+        return SearchPage(items, next_page)
+
+
+search_service = SearchService()
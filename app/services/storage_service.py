@@ -1,10 +1,41 @@
+import asyncio
+import logging
 import os
-from typing import BinaryIO, Optional
+import shutil
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from app.core.config import settings
+from app.core.executors import run_in_pool
+from app.core.metrics import count_storage_bytes, storage_timer
+from app.core.storage import (
+    LOCAL_POOL, delete_file as delete_local_file, delete_file_unless_recent,
+    iter_file_range as iter_local_file_range
+)
+from app.services.job_queue import job_queue
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# boto3 é bloqueante: as chamadas ao S3 rodam no seu próprio pool de threads,
+# separado do pool de disco, com o tamanho definido no Settings
+S3_POOL = "storage-s3"
+
+# Máximo de chaves aceito pelo DeleteObjects do S3; também é o tamanho dos
+# lotes em que a remoção local confere as referências
+DELETE_BATCH_SIZE = 1000
+
+# Respostas do HEAD que significam "objeto inexistente"; as demais são erros
+S3_NOT_FOUND_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+class ObjectInfo(NamedTuple):
+    """Tamanho e ETag de um objeto, lidos com HEAD."""
+    size: int
+    etag: Optional[str]
+
 class StorageService:
     def __init__(self):
         if settings.STORAGE_TYPE == "s3":
@@ -12,34 +43,183 @@ class StorageService:
                 "s3",
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                # Uma conexão por thread do pool, para que nenhuma fique esperando
+                config=Config(max_pool_connections=settings.STORAGE_S3_MAX_WORKERS)
             )
             self.bucket_name = settings.AWS_BUCKET_NAME
+            # Arquivos grandes são enviados em partes paralelas
+            self.transfer_config = TransferConfig(
+                multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+                multipart_chunksize=settings.S3_MULTIPART_CHUNK_SIZE,
+                max_concurrency=settings.S3_MULTIPART_CONCURRENCY
+            )
         else:
             self.upload_folder = Path(settings.UPLOAD_FOLDER)
             self.upload_folder.mkdir(parents=True, exist_ok=True)
 
+    def resolve_path(self, filename: str) -> str:
+        if settings.STORAGE_TYPE == "s3":
+            return f"s3://{self.bucket_name}/{filename}"
+        return str(self.upload_folder / filename)
+
     async def save_file(self, file: BinaryIO, filename: str) -> str:
         if settings.STORAGE_TYPE == "s3":
             return await self._save_to_s3(file, filename)
         return await self._save_to_local(file, filename)
 
     async def _save_to_s3(self, file: BinaryIO, filename: str) -> str:
+        # Medido antes do envio: o upload_fileobj fecha o arquivo ao terminar
+        start = file.tell()
+        size = file.seek(0, os.SEEK_END) - start
+        file.seek(start)
         try:
-            self.s3_client.upload_fileobj(
-                file,
-                self.bucket_name,
-                filename
-            )
+            with storage_timer("s3", "write"):
+                await run_in_pool(
+                    S3_POOL,
+                    self.s3_client.upload_fileobj,
+                    file,
+                    self.bucket_name,
+                    filename,
+                    Config=self.transfer_config
+                )
+            count_storage_bytes("s3", "write", size)
             return f"s3://{self.bucket_name}/{filename}"
         except ClientError as e:
             raise Exception(f"Failed to upload file to S3: {str(e)}")
 
+    async def create_presigned_post(
+        self, key: str, content_type: str, max_size: int
+    ) -> Dict[str, Any]:
+        """
+        Gera um POST pré-assinado para o navegador enviar o arquivo direto ao
+        bucket. O S3 recusa arquivos maiores que max_size ou de outro tipo.
+        """
+        return await run_in_pool(
+            S3_POOL,
+            self.s3_client.generate_presigned_post,
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size]
+            ],
+            ExpiresIn=settings.S3_PRESIGNED_EXPIRES
+        )
+
+    async def create_multipart_upload(self, key: str, content_type: str) -> str:
+        response = await run_in_pool(
+            S3_POOL,
+            self.s3_client.create_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=key,
+            ContentType=content_type
+        )
+        return response["UploadId"]
+
+    async def presign_upload_parts(
+        self, key: str, upload_id: str, part_count: int
+    ) -> List[Dict[str, Any]]:
+        def presign() -> List[Dict[str, Any]]:
+            return [
+                {
+                    "part_number": part_number,
+                    "url": self.s3_client.generate_presigned_url(
+                        "upload_part",
+                        Params={
+                            "Bucket": self.bucket_name,
+                            "Key": key,
+                            "UploadId": upload_id,
+                            "PartNumber": part_number
+                        },
+                        ExpiresIn=settings.S3_PRESIGNED_EXPIRES
+                    )
+                }
+                for part_number in range(1, part_count + 1)
+            ]
+        return await run_in_pool(S3_POOL, presign)
+
+    async def complete_multipart_upload(
+        self, key: str, upload_id: str, parts: List[Tuple[int, str]]
+    ) -> None:
+        await run_in_pool(
+            S3_POOL,
+            self.s3_client.complete_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part_number, "ETag": etag}
+                    for part_number, etag in sorted(parts)
+                ]
+            }
+        )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        try:
+            await run_in_pool(
+                S3_POOL,
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id
+            )
+        except ClientError:
+            pass
+
+    async def head_object(self, key: str) -> Optional[ObjectInfo]:
+        """
+        HEAD do objeto: None se não existe. Outros erros do S3 (permissão,
+        limite de requisições) são propagados.
+        """
+        try:
+            with storage_timer("s3", "head"):
+                response = await run_in_pool(
+                    S3_POOL, self.s3_client.head_object, Bucket=self.bucket_name, Key=key
+                )
+        except ClientError as e:
+            if str(e.response.get("Error", {}).get("Code")) in S3_NOT_FOUND_CODES:
+                return None
+            raise
+        return ObjectInfo(response["ContentLength"], response.get("ETag"))
+
+    async def get_object_size(self, key: str) -> Optional[int]:
+        try:
+            info = await self.head_object(key)
+        except ClientError:
+            return None
+        return info.size if info else None
+
+    async def create_presigned_get(
+        self, key: str, content_disposition: str, content_type: str
+    ) -> str:
+        """
+        URL GET de curta duração; o S3 cuida de Range e da transferência.
+        """
+        return await run_in_pool(
+            S3_POOL,
+            self.s3_client.generate_presigned_url,
+            "get_object",
+            Params={
+                "Bucket": self.bucket_name,
+                "Key": key,
+                "ResponseContentDisposition": content_disposition,
+                "ResponseContentType": content_type
+            },
+            ExpiresIn=settings.S3_PRESIGNED_GET_EXPIRES
+        )
+
+    def _write_local(self, file: BinaryIO, file_path: Path) -> None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file, buffer, settings.UPLOAD_CHUNK_SIZE)
+
     async def _save_to_local(self, file: BinaryIO, filename: str) -> str:
         file_path = self.upload_folder / filename
-        with open(file_path, "wb") as buffer:
-            content = file.read()
-            buffer.write(content)
+        await run_in_pool(LOCAL_POOL, self._write_local, file, file_path)
         return str(file_path)
 
     async def get_file(self, file_path: str) -> Optional[BinaryIO]:
@@ -47,39 +227,144 @@ class StorageService:
             return await self._get_from_s3(file_path)
         return await self._get_from_local(file_path)
 
-    async def _get_from_s3(self, file_path: str) -> Optional[BinaryIO]:
+    async def _get_from_s3(
+        self, file_path: str, byte_range: Optional[Tuple[int, int]] = None
+    ) -> Optional[BinaryIO]:
         try:
             bucket, key = file_path.replace("s3://", "").split("/", 1)
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            params = {"Bucket": bucket, "Key": key}
+            if byte_range is not None:
+                params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+            with storage_timer("s3", "open"):
+                response = await run_in_pool(S3_POOL, self.s3_client.get_object, **params)
             return response["Body"]
         except ClientError:
             return None
 
-    async def _get_from_local(self, file_path: str) -> Optional[BinaryIO]:
+    async def iter_file_range(
+        self, file_path: str, start: int, end: int
+    ) -> AsyncIterator[bytes]:
+        if settings.STORAGE_TYPE != "s3":
+            async for chunk in iter_local_file_range(file_path, start, end):
+                yield chunk
+            return
+        body = await self._get_from_s3(file_path, (start, end))
+        if body is None:
+            raise FileNotFoundError(file_path)
+        try:
+            while True:
+                # A leitura do corpo também é E/S de rede bloqueante
+                with storage_timer("s3", "read"):
+                    chunk = await run_in_pool(S3_POOL, body.read, settings.DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                count_storage_bytes("s3", "read", len(chunk))
+                yield chunk
+        finally:
+            body.close()
+
+    def _open_local(self, file_path: str) -> Optional[BinaryIO]:
         path = Path(file_path)
         if not path.exists():
             return None
         return open(path, "rb")
 
+    async def _get_from_local(self, file_path: str) -> Optional[BinaryIO]:
+        return await run_in_pool(LOCAL_POOL, self._open_local, file_path)
+
     async def delete_file(self, file_path: str) -> bool:
         if settings.STORAGE_TYPE == "s3":
-            return await this._delete_from_s3(file_path)
-        return await this._delete_from_local(file_path)
+            return await self._delete_from_s3(file_path)
+        return await self._delete_from_local(file_path)
 
     async def _delete_from_s3(self, file_path: str) -> bool:
         try:
             bucket, key = file_path.replace("s3://", "").split("/", 1)
-            self.s3_client.delete_object(Bucket=bucket, Key=key)
+            await run_in_pool(S3_POOL, self.s3_client.delete_object, Bucket=bucket, Key=key)
             return True
         except ClientError:
             return False
 
+    async def delete_unreferenced_files(self, db, storage_filenames: List[str]) -> List[str]:
+        """
+        Apaga do storage os arquivos liberados por crud.blob.release. Deve ser
+        chamada depois do commit; arquivos que voltaram a ser usados por um
+        upload concorrente são mantidos. Retorna os que não puderam ser apagados.
+
+        Com STORAGE_DEDUP, arquivos gravados há menos de
+        STORAGE_DEDUP_DELETE_GRACE segundos podem ser de um upload ainda sem
+        commit: ficam para um novo delete_files agendado para depois do prazo.
+
+        As referências são conferidas em lotes e as remoções correm em paralelo,
+        limitadas pelo pool do backend: no S3, um DeleteObjects por lote.
+        """
+        from app import crud
+
+        storage_filenames = list(dict.fromkeys(storage_filenames))
+        batches = []
+        for start in range(0, len(storage_filenames), DELETE_BATCH_SIZE):
+            batch = storage_filenames[start:start + DELETE_BATCH_SIZE]
+            try:
+                in_use = await crud.blob.referenced(db, batch)
+            except Exception as e:
+                logger.exception("Erro ao conferir referências de %s arquivo(s)", len(batch))
+                return storage_filenames
+            batches.append([name for name in batch if name not in in_use])
+
+        if settings.STORAGE_TYPE == "s3":
+            results = await asyncio.gather(*(self._delete_s3_batch(batch) for batch in batches if batch))
+            return [name for failed in results for name in failed]
+
+        names = [name for batch in batches for name in batch]
+        grace = settings.STORAGE_DEDUP_DELETE_GRACE
+        if settings.STORAGE_DEDUP and grace > 0:
+            deletions = (delete_file_unless_recent(name, grace) for name in names)
+        else:
+            deletions = (delete_local_file(name) for name in names)
+        results = await asyncio.gather(*deletions, return_exceptions=True)
+        failed, deferred = [], []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error("Erro ao deletar arquivo %s: %s", name, result)
+                failed.append(name)
+            elif result is False:
+                deferred.append(name)
+        if deferred:
+            try:
+                await job_queue.enqueue(db, "delete_files", {"storage_filenames": deferred}, delay=grace)
+                await db.commit()
+            except Exception:
+                logger.exception("Erro ao reagendar a remoção de %s arquivo(s)", len(deferred))
+                failed.extend(deferred)
+        return failed
+
+    async def _delete_s3_batch(self, keys: List[str]) -> List[str]:
+        """Apaga até DELETE_BATCH_SIZE objetos numa chamada; retorna as chaves que falharam."""
+        try:
+            with storage_timer("s3", "delete"):
+                response = await run_in_pool(
+                    S3_POOL,
+                    self.s3_client.delete_objects,
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+                )
+        except ClientError as e:
+            logger.error("Erro ao deletar %s arquivo(s) do S3: %s", len(keys), e)
+            return keys
+        errors = response.get("Errors", [])
+        for error in errors:
+            logger.error("Erro ao deletar arquivo %s: %s", error["Key"], error.get("Message"))
+        return [error["Key"] for error in errors]
+
+    def _unlink_local(self, file_path: str) -> bool:
+        path = Path(file_path)
+        if path.exists():
+            path.unlink()
+            return True
+        return False
+
     async def _delete_from_local(self, file_path: str) -> bool:
         try:
-            path = Path(file_path)
-            if path.exists():
-                path.unlink()
-                return True
-            return False
+            return await run_in_pool(LOCAL_POOL, self._unlink_local, file_path)
         except Exception:
-            return False 
\ No newline at end of file
+            return False
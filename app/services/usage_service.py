@@ -0,0 +1,102 @@
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import crud
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.services.job_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class ReconcileResult(NamedTuple):
+    # Último id de usuário conferido (continuação de onde parou)
+    last_id: int
+    checked: int
+    fixed: int
+    done: bool
+
+
+class UsageService:
+    """
+    Conferência periódica dos contadores de uso (user_usage) contra a tabela
+    de documentos. Os contadores são mantidos junto de cada alteração, mas
+    uma falha fora da transação (ou um ajuste manual no banco) os faria
+    divergir para sempre; o job reconcile_usage corrige essa deriva.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal, queue=job_queue):
+        self.session_factory = session_factory
+        self.queue = queue
+
+    async def schedule(self, db: AsyncSession, *, after_id: int = 0, delay: float = 0) -> None:
+        """Agenda (sem commit) a conferência a partir do usuário seguinte a after_id."""
+        await self.queue.enqueue(
+            db, "reconcile_usage", {"after_id": after_id},
+            idempotency_key=f"reconcile_usage:{after_id}", delay=delay
+        )
+
+    async def reconcile_batch(self, after_id: int, batch_size: int):
+        """Confere um lote de usuários em ordem de id; retorna (último id, lidos, corrigidos)."""
+        async with self.session_factory() as db:
+            user_ids = list(await db.scalars(
+                select(User.id).where(User.id > after_id).order_by(User.id).limit(batch_size)
+            ))
+            if not user_ids:
+                return after_id, 0, 0
+            fixed = await crud.usage.reconcile(db, user_ids)
+            await db.commit()
+        return user_ids[-1], len(user_ids), fixed
+
+    async def reconcile(
+        self,
+        *,
+        after_id: int = 0,
+        batch_size: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> ReconcileResult:
+        """
+        Confere os usuários depois de after_id, lote a lote, até acabarem ou
+        até time_budget segundos (sem limite quando None).
+        """
+        batch_size = batch_size or settings.USAGE_RECONCILE_BATCH_SIZE
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        last_id, checked, fixed = after_id, 0, 0
+        while True:
+            last_id, count, batch_fixed = await self.reconcile_batch(last_id, batch_size)
+            checked += count
+            fixed += batch_fixed
+            if count < batch_size:
+                return ReconcileResult(last_id, checked, fixed, True)
+            if deadline is not None and time.monotonic() > deadline:
+                return ReconcileResult(last_id, checked, fixed, False)
+
+    async def run_job(self, after_id: int) -> ReconcileResult:
+        """
+        Execução pelo worker: para antes do prazo de visibilidade e agenda a
+        continuação; ao terminar a volta completa, agenda a próxima para daqui
+        a USAGE_RECONCILE_INTERVAL segundos.
+        """
+        result = await self.reconcile(
+            after_id=after_id, time_budget=settings.JOB_VISIBILITY_TIMEOUT / 2
+        )
+        if result.fixed:
+            logger.warning(
+                "Uso por usuário: %s contador(es) corrigido(s) até o id %s", result.fixed, result.last_id
+            )
+        async with self.session_factory() as db:
+            if result.done:
+                if settings.USAGE_RECONCILE_INTERVAL > 0:
+                    await self.schedule(db, delay=settings.USAGE_RECONCILE_INTERVAL)
+            else:
+                await self.schedule(db, after_id=result.last_id)
+            await db.commit()
+        return result
+
+
+usage_service = UsageService()
@@ -0,0 +1,133 @@
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import crud
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.document import Document
+from app.models.usage import UserUsage
+from app.models.user import User
+from app.services.job_queue import job_queue
+from app.services.search_service import search_service
+
+logger = logging.getLogger(__name__)
+
+
+class UserDeletionService:
+    """
+    Exclusão de usuários em duas etapas. A requisição só marca o usuário
+    (deleted_at) e agenda o job purge_user; o worker apaga os documentos em
+    lotes de USER_PURGE_BATCH_SIZE, cada um na sua transação, e por fim o
+    usuário. Se o worker cair no meio, o job volta para a fila e continua dos
+    documentos que faltam.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal, queue=None):
+        self.session_factory = session_factory
+        self.queue = queue or job_queue
+
+    async def request_deletion(self, db: AsyncSession, user: User) -> None:
+        """Desativa o usuário e agenda a remoção dos dados. Não faz commit."""
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(deleted_at=datetime.utcnow(), is_active=False)
+        )
+        await self._enqueue_purge(db, user.id)
+
+    async def _enqueue_purge(self, db: AsyncSession, user_id: int) -> None:
+        await self.queue.enqueue(
+            db, "purge_user", {"user_id": user_id}, idempotency_key=f"purge_user:{user_id}"
+        )
+
+    async def remaining_documents(self, db: AsyncSession, user_id: int) -> int:
+        return await db.scalar(
+            select(func.count()).select_from(Document).where(Document.user_id == user_id)
+        )
+
+    async def purge_batch(self, user_id: int, batch_size: int) -> int:
+        """
+        Apaga um lote de documentos do usuário e agenda a remoção dos arquivos
+        que ficaram sem referência. Sem documentos, apaga o usuário. Retorna
+        quantos documentos foram apagados.
+        """
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(Document.id, Document.storage_filename, Document.file_size)
+                .where(Document.user_id == user_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                # Sem depender do ON DELETE CASCADE, que o SQLite não aplica por padrão
+                await db.execute(delete(UserUsage).where(UserUsage.user_id == user_id))
+                await db.execute(
+                    delete(User).where(User.id == user_id, User.deleted_at.is_not(None))
+                )
+                await db.commit()
+                return 0
+
+            document_ids = [row.id for row in rows]
+            orphaned = await crud.blob.release_many(db, [row.storage_filename for row in rows])
+            await search_service.remove_documents(db, document_ids)
+            await crud.usage.add(db, user_id, -len(rows), -sum(row.file_size for row in rows))
+            await db.execute(
+                delete(Document)
+                .where(Document.id.in_(document_ids))
+                .execution_options(synchronize_session=False)
+            )
+            if orphaned:
+                await self.queue.enqueue(db, "delete_files", {"storage_filenames": orphaned})
+            await db.commit()
+            return len(document_ids)
+
+    async def purge_user(
+        self,
+        user_id: int,
+        *,
+        batch_size: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> bool:
+        """
+        Apaga os documentos e o usuário marcado para exclusão. Para antes de
+        o job estourar o prazo de visibilidade e agenda a continuação; retorna
+        True quando terminou.
+        """
+        batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+        if time_budget is None:
+            time_budget = settings.JOB_VISIBILITY_TIMEOUT / 2
+        deadline = time.monotonic() + time_budget
+
+        async with self.session_factory() as db:
+            user = await db.get(User, user_id)
+            if user is None or user.deleted_at is None:
+                return True
+            remaining = await self.remaining_documents(db, user_id)
+
+        removed = 0
+        while True:
+            count = await self.purge_batch(user_id, batch_size)
+            if not count:
+                logger.info(
+                    "Exclusão do usuário %s concluída: %s documentos apagados", user_id, removed,
+                    extra={"user_id": user_id}
+                )
+                return True
+            removed += count
+            logger.info(
+                "Exclusão do usuário %s: %s/%s documentos apagados", user_id, removed, remaining,
+                extra={"user_id": user_id}
+            )
+            if time.monotonic() > deadline:
+                async with self.session_factory() as db:
+                    await self._enqueue_purge(db, user_id)
+                    await db.commit()
+                return False
+
+
+user_deletion_service = UserDeletionService()
@@ -0,0 +1,89 @@
+"""
+Funções compartilhadas pelos scripts de benchmarks/.
+
+Importar este módulo coloca a raiz do projeto no sys.path e define um
+SECRET_KEY de teste, o que precisa acontecer antes de importar app.*.
+"""
+import os
+import sys
+import tempfile
+from typing import Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+
+def temp_dir() -> str:
+    return tempfile.mkdtemp(prefix="guardadocs-bench-")
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Percentil pelo posto mais próximo; sorted_values já ordenado."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50/p99/máximo em milissegundos a partir de latências em segundos."""
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        "p50_ms": percentile(values, 0.50),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else 0.0,
+    }
+
+
+# Pico de memória (RSS) por processo, lido do /proc (Linux)
+
+def _status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(pid: int) -> List[int]:
+    """O processo e todos os descendentes (workers do Hypercorn, por exemplo)."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # O nome do processo (2º campo) pode ter espaços: o ppid vem depois do ")"
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def reset_peak_rss(pids: Sequence[int]) -> bool:
+    """Zera o pico (VmHWM) dos processos; False se o kernel não permitir."""
+    reset = True
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+        except OSError:
+            reset = False
+    return reset
+
+
+def peak_rss_mb(pids: Sequence[int]) -> float:
+    """Soma dos picos de RSS dos processos desde o último reset_peak_rss."""
+    return sum(_status_kb(pid, "VmHWM") for pid in pids) / 1024
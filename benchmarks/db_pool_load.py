@@ -0,0 +1,117 @@
+"""
+Teste de carga do banco com vários processos gravando ao mesmo tempo.
+
+Simula os workers do Hypercorn: cada processo abre sua própria engine
+assíncrona e roda várias tarefas concorrentes que leem e gravam no mesmo
+arquivo SQLite. Compara a engine com as opções padrão da biblioteca com a
+engine configurada pelo Settings (pool, WAL, busy_timeout, synchronous).
+
+Uso:
+    python benchmarks/db_pool_load.py --workers 4 --tasks 8 --seconds 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import common  # raiz do projeto no sys.path e SECRET_KEY de teste
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.pool import apply_sqlite_pragmas, engine_options
+from app.db.session import make_async_url
+
+
+def build_engine(database_url: str, tuned: bool):
+    if not tuned:
+        return create_async_engine(make_async_url(database_url))
+    engine = create_async_engine(
+        make_async_url(database_url), **engine_options(database_url, is_async=True)
+    )
+    apply_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+async def run_worker(database_url: str, tuned: bool, tasks: int, seconds: float) -> dict:
+    engine = build_engine(database_url, tuned)
+    deadline = time.perf_counter() + seconds
+    counters = {"ops": 0, "locked": 0}
+
+    async def task(task_id: int) -> None:
+        while time.perf_counter() < deadline:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        text("INSERT INTO bench (worker, payload) VALUES (:w, :p)"),
+                        {"w": os.getpid(), "p": "x" * 256}
+                    )
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT count(*) FROM bench WHERE worker = :w"), {"w": os.getpid()})
+                counters["ops"] += 1
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                counters["locked"] += 1
+
+    await asyncio.gather(*(task(i) for i in range(tasks)))
+    await engine.dispose()
+    return counters
+
+
+def worker_main(database_url: str, tuned: bool, tasks: int, seconds: float, queue) -> None:
+    queue.put(asyncio.run(run_worker(database_url, tuned, tasks, seconds)))
+
+
+def run_mode(tuned: bool, workers: int, tasks: int, seconds: float) -> dict:
+    directory = common.temp_dir()
+    database_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+    async def setup():
+        engine = build_engine(database_url, tuned)
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE bench (id INTEGER PRIMARY KEY, worker INTEGER, payload TEXT)"
+            ))
+        await engine.dispose()
+    asyncio.run(setup())
+
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(database_url, tuned, tasks, seconds, queue))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    ops = sum(result["ops"] for result in results)
+    return {
+        "ops": ops,
+        "ops_per_s": ops / seconds,
+        "locked": sum(result["locked"] for result in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.workers} processos x {args.tasks} tarefas, {args.seconds:g}s por modo")
+    for name, tuned in (("padrão", False), ("ajustado", True)):
+        result = run_mode(tuned, args.workers, args.tasks, args.seconds)
+        print(
+            f"{name:>8}: {result['ops_per_s']:.0f} ops/s ({result['ops']} gravações+leituras) | "
+            f"'database is locked': {result['locked']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compara a carga da lista de usuários do painel administrativo: entidades
+ORM completas (select(User) + .all(), como antes) contra o select só com
+as colunas exibidas, montado em UserListItem (crud.user.list_for_admin).
+
+Mede linhas por segundo e o pico de memória alocada durante a consulta.
+
+Uso:
+    python benchmarks/list_projection.py --users 20000 --repeat 3
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import common  # raiz do projeto no sys.path e SECRET_KEY de teste
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud
+from app.db.base import Base, User
+
+
+def seed(database_path: str, users: int) -> None:
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(engine)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": f"usuario{i}@example.com",
+                "full_name": f"Usuário {i}",
+                "hashed_password": "$2b$12$" + "x" * 53,
+                "is_active": True,
+                "is_admin": False,
+                "created_at": base + timedelta(seconds=i),
+                "updated_at": base + timedelta(seconds=i),
+            }
+            for i in range(users)
+        ])
+    engine.dispose()
+
+
+async def load_entities(db):
+    return (await db.scalars(select(User).order_by(User.created_at.desc()))).all()
+
+
+async def load_read_models(db):
+    return await crud.user.list_for_admin(db)
+
+
+async def measure(session_factory, loader, repeat: int) -> dict:
+    best = None
+    peak = 0
+    for _ in range(repeat):
+        # Sessão nova a cada rodada, como em uma requisição
+        async with session_factory() as db:
+            tracemalloc.start()
+            started = time.perf_counter()
+            rows = await loader(db)
+            elapsed = time.perf_counter() - started
+            _, run_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        best = elapsed if best is None else min(best, elapsed)
+        peak = max(peak, run_peak)
+    return {"rows": len(rows), "rows_per_s": len(rows) / best, "seconds": best, "peak_mb": peak / 1024 / 1024}
+
+
+async def run(database_path: str, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    for name, loader in (("ORM .all()", load_entities), ("projeção", load_read_models)):
+        result = await measure(session_factory, loader, repeat)
+        print(
+            f"{name:>11}: {result['rows']} linhas em {result['seconds']:.3f}s "
+            f"({result['rows_per_s']:,.0f} linhas/s) | pico de memória {result['peak_mb']:.1f} MB"
+        )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    database_path = os.path.join(common.temp_dir(), "bench.db")
+    seed(database_path, args.users)
+    asyncio.run(run(database_path, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
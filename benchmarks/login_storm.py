@@ -0,0 +1,95 @@
+"""
+Mede a latência do event loop durante uma rajada de logins.
+
+Compara a verificação de senha feita direto na coroutine (como as rotas
+faziam) com a verificação no pool "password-hash". Um ticker acorda a cada
+10 ms e registra o atraso; com bcrypt bloqueando o loop, o atraso cresce
+com o número de logins simultâneos.
+
+Uso:
+    python benchmarks/login_storm.py --logins 32 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import common  # raiz do projeto no sys.path e SECRET_KEY de teste
+
+from app.core.config import settings
+from app.core.executors import get_pool_stats, shutdown_executors
+from app.core.hashing import check_password, get_password_hash, verify_password
+
+TICK = 0.01
+
+
+async def ticker(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def inline_login(password: str, hashed: str) -> bool:
+    return verify_password(password, hashed)
+
+
+async def run_storm(login, logins: int, hashed: str) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    peak_queue = 0
+
+    async def watch_queue():
+        nonlocal peak_queue
+        while not stop.is_set():
+            stats = get_pool_stats().get("password-hash")
+            if stats:
+                peak_queue = max(peak_queue, stats["queued"])
+            await asyncio.sleep(TICK)
+
+    watch_task = asyncio.create_task(watch_queue())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login("senha-correta", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(tick_task, watch_task)
+
+    assert all(results)
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_p99_ms": common.percentile(lags_ms, 0.99),
+        "lag_max_ms": lags_ms[-1],
+        "peak_queue": peak_queue,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=settings.PASSWORD_HASH_ROUNDS)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_MAX_WORKERS)
+    args = parser.parse_args()
+
+    settings.PASSWORD_HASH_ROUNDS = args.rounds
+    settings.PASSWORD_HASH_MAX_WORKERS = args.workers
+    hashed = get_password_hash("senha-correta")
+
+    print(f"{args.logins} logins, bcrypt rounds={args.rounds}, pool={args.workers} threads")
+    for name, login in (("inline", inline_login), ("pool", check_password)):
+        result = asyncio.run(run_storm(login, args.logins, hashed))
+        print(
+            f"{name:>6}: total {result['elapsed_s']:.2f}s | "
+            f"atraso do loop p50 {result['lag_p50_ms']:.1f}ms "
+            f"p99 {result['lag_p99_ms']:.1f}ms max {result['lag_max_ms']:.1f}ms | "
+            f"fila máx {result['peak_queue']}"
+        )
+    shutdown_executors()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Mede a latência da busca textual (search_service.search) sobre um índice
+FTS5 com muitos documentos, para consultas com termos frequentes, raros e
+prefixos curtos. Os documentos são distribuídos entre vários usuários,
+como em produção: cada busca percorre apenas os do usuário.
+
+Uso:
+    python benchmarks/search_latency.py --documents 1000000 --users 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import common  # raiz do projeto no sys.path e SECRET_KEY de teste
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base, Document, User
+from app.models.search import SEARCH_TABLE
+from app.services.search_service import search_service
+
+WORDS = (
+    "relatório contrato nota fiscal manutenção aluguel imóvel seguro apólice "
+    "escritura matrícula certidão declaração imposto renda recibo pagamento "
+    "comprovante residência extrato bancário laudo técnico orçamento projeto"
+).split()
+
+# Vocabulário de cauda longa: poucas palavras muito comuns (acima) e muitas raras
+RARE_WORDS = [f"termo{i}" for i in range(50000)]
+
+QUERIES = ["nota", "relat", "certidão imóvel", "laudo tecnico orçamento", "termo123", "termo12", "xyz"]
+
+
+def seed(database_path: str, documents: int, users: int, batch: int = 20000) -> None:
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"u{i}@example.com", "full_name": f"U {i}", "hashed_password": "x"}
+            for i in range(users)
+        ])
+        for start in range(0, documents, batch):
+            rows = []
+            for i in range(start, min(start + batch, documents)):
+                title = f"{rng.choice(WORDS)} {rng.choice(RARE_WORDS)} {i}"
+                rows.append({
+                    "id": i + 1,
+                    "title": title,
+                    "description": " ".join(rng.sample(WORDS, 2) + rng.sample(RARE_WORDS, 4)),
+                    "original_filename": title.replace(" ", "_") + ".pdf",
+                    "storage_filename": f"{i}.pdf",
+                    "file_size": 1,
+                    "content_type": "application/pdf",
+                    "user_id": rng.randint(1, users),
+                })
+            conn.execute(insert(Document), rows)
+        # Carga inicial em massa, como na migração
+        conn.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, original_filename, owner)
+            SELECT id, title, coalesce(description, ''), original_filename, 'u' || user_id FROM documents
+        """))
+    engine.dispose()
+
+
+async def run(database_path: str, users: int, repeat: int, limit: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(7)
+    async with session_factory() as db:
+        for query in QUERIES:
+            timings = []
+            hits = 0
+            for _ in range(repeat):
+                user_id = rng.randint(1, users)
+                started = time.perf_counter()
+                page = await search_service.search(db, user_id, query, limit=limit)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += len(page.items)
+            timings.sort()
+            print(
+                f"{query!r:>28}: mediana {statistics.median(timings):6.2f} ms | "
+                f"p95 {common.percentile(timings, 0.95):6.2f} ms | "
+                f"{hits / repeat:.1f} resultados/busca"
+            )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    database_path = os.path.join(common.temp_dir(), "bench.db")
+    started = time.perf_counter()
+    seed(database_path, args.documents, args.users)
+    print(f"{args.documents} documentos indexados em {time.perf_counter() - started:.1f}s")
+    asyncio.run(run(database_path, args.users, args.repeat, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""
+Suíte de desempenho dos endpoints principais: login, página inicial,
+listagem de documentos (10, mil e 100 mil por usuário), upload e download
+de arquivos de 1 KB a 500 MB e painel administrativo.
+
+Roda contra a aplicação ASGI no próprio processo (httpx) ou por um socket
+de verdade, com o Hypercorn em outro processo. Para cada cenário informa
+vazão, latência p50/p99 e pico de RSS (no modo hypercorn, só do servidor).
+O resultado pode ser guardado como baseline, e o comando check roda a
+suíte de novo e aponta as regressões em relação a ela.
+
+Uso:
+    python benchmarks/suite.py run --transport inprocess
+    python benchmarks/suite.py run --transport hypercorn --workers 4 --save-baseline
+    python benchmarks/suite.py check --transport hypercorn
+    python benchmarks/suite.py run --profile full --only upload,download
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import common
+
+KB, MB = 1024, 1024 * 1024
+
+PROFILES = {
+    # Rodada rápida, para antes de um commit
+    "quick": {"listing": (10, 1000, 100000), "files": (KB, MB, 10 * MB), "requests": 200, "concurrency": 8},
+    # Rodada completa, com os arquivos grandes
+    "full": {"listing": (10, 1000, 100000), "files": (KB, MB, 100 * MB, 500 * MB), "requests": 1000, "concurrency": 16},
+}
+SCENARIO_GROUPS = ("login", "home", "listing", "upload", "download", "admin")
+
+BASELINE_DIR = os.path.join(common.ROOT, "benchmarks", "baselines")
+PASSWORD = "benchmark-senha"
+
+# Diferenças abaixo disso são ruído, mesmo que passem da tolerância relativa
+LATENCY_FLOOR_MS = 1.0
+RSS_FLOOR_MB = 16.0
+
+
+class Scenario(NamedTuple):
+    name: str
+    requests: int
+    concurrency: int
+    # Faz a requisição de número i e devolve o status HTTP
+    send: Callable[["httpx.AsyncClient", int], Awaitable[int]]
+    expected: Tuple[int, ...]
+    bytes_per_request: int = 0
+
+
+def size_label(size: int) -> str:
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+def configure_environment(directory: str, max_file_size: int, hash_rounds: Optional[int]) -> None:
+    """Settings da aplicação testada; precisa acontecer antes do primeiro import de app.*."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        "UPLOAD_FOLDER": os.path.join(directory, "uploads"),
+        "MAX_UPLOAD_SIZE": str(max_file_size + MB),
+        "STORAGE_TYPE": "local",
+        "LOCAL_DOWNLOAD_DELIVERY": "app",
+        "LOG_LEVEL": "WARNING",
+    })
+    if hash_rounds:
+        os.environ["PASSWORD_HASH_ROUNDS"] = str(hash_rounds)
+
+
+def write_random_file(path: str, size: int) -> None:
+    """Conteúdo aleatório: nem a compressão nem a deduplicação encurtam o trabalho."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as output:
+        remaining = size
+        while remaining:
+            chunk = os.urandom(min(MB, remaining))
+            output.write(chunk)
+            remaining -= len(chunk)
+
+
+def seed(groups: List[str], listing_sizes, file_sizes, admin_users: int) -> Dict:
+    """Cria o banco e os arquivos; retorna e-mails e ids usados pelos cenários."""
+    from sqlalchemy import insert
+
+    from app.core.config import settings
+    from app.core.hashing import get_password_hash
+    from app.core.storage import shard_storage_filename
+    from app.db.base import Base, Document, User
+    from app.db.session import engine
+
+    Base.metadata.create_all(engine)
+    hashed = get_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    context = {"admin": "admin@bench.local", "user": "usuario@bench.local", "listing": {}, "files": {}}
+
+    def add_user(conn, email: str, is_admin: bool = False) -> int:
+        return conn.execute(insert(User).values(
+            email=email, full_name=email.split("@")[0], hashed_password=hashed,
+            is_active=True, is_admin=is_admin, created_at=now, updated_at=now
+        )).inserted_primary_key[0]
+
+    def document_rows(user_id: int, count: int, prefix: str, size: int = 1) -> List[dict]:
+        return [
+            {
+                "title": f"{prefix} {i}", "description": "Documento de benchmark",
+                "original_filename": f"{prefix}-{i}.pdf", "storage_filename": f"{prefix}-{i}.pdf",
+                "file_size": size, "content_type": "application/pdf", "user_id": user_id,
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(count)
+        ]
+
+    with engine.begin() as conn:
+        add_user(conn, context["admin"], is_admin=True)
+        user_id = add_user(conn, context["user"])
+        conn.execute(insert(Document), document_rows(user_id, 10, "inicial"))
+
+        if "listing" in groups:
+            for count in listing_sizes:
+                email = f"lista{count}@bench.local"
+                owner = add_user(conn, email)
+                for start in range(0, count, 20000):
+                    conn.execute(insert(Document), document_rows(
+                        owner, min(20000, count - start), f"lista{count}-{start}"
+                    ))
+                context["listing"][count] = email
+
+        if "admin" in groups:
+            conn.execute(insert(User), [
+                {
+                    "email": f"extra{i}@bench.local", "full_name": f"Extra {i}", "hashed_password": hashed,
+                    "is_active": True, "is_admin": False, "created_at": now, "updated_at": now,
+                }
+                for i in range(admin_users)
+            ])
+
+        if "upload" in groups or "download" in groups:
+            for size in file_sizes:
+                storage_filename = shard_storage_filename(f"bench-{size_label(size)}.bin")
+                path = os.path.join(settings.UPLOAD_FOLDER, storage_filename)
+                write_random_file(path, size)
+                document_id = conn.execute(insert(Document).values(
+                    title=f"Arquivo {size_label(size)}", original_filename=f"arquivo-{size_label(size)}.bin",
+                    storage_filename=storage_filename, file_size=size,
+                    content_type="application/octet-stream", user_id=user_id,
+                    created_at=now, updated_at=now
+                )).inserted_primary_key[0]
+                context["files"][size] = (document_id, path)
+    engine.dispose()
+    return context
+
+
+def build_scenarios(groups: List[str], profile: Dict, context: Dict) -> List[Scenario]:
+    from app.core.security import create_access_token
+
+    base, concurrency = profile["requests"], profile["concurrency"]
+    user_auth = {"Authorization": f"Bearer {create_access_token(subject=context['user'])}"}
+    admin_auth = {"Authorization": f"Bearer {create_access_token(subject=context['admin'])}"}
+    scenarios = []
+
+    if "login" in groups:
+        async def login(client, i):
+            response = await client.post("/login", data={"email": context["user"], "password": PASSWORD})
+            return response.status_code
+        # Cada login custa um bcrypt inteiro
+        scenarios.append(Scenario("login", max(10, base // 10), concurrency, login, (302,)))
+
+    if "home" in groups:
+        async def home(client, i):
+            return (await client.get("/", headers=user_auth)).status_code
+        scenarios.append(Scenario("home", base, concurrency, home, (200,)))
+
+    if "listing" in groups:
+        for count, email in context["listing"].items():
+            headers = {"Authorization": f"Bearer {create_access_token(subject=email)}"}
+
+            async def listing(client, i, headers=headers):
+                return (await client.get("/documents", headers=headers)).status_code
+            scenarios.append(Scenario(f"listing-{count}", base, concurrency, listing, (200,)))
+
+    for size, (document_id, path) in context["files"].items():
+        # Poucas repetições e pouca concorrência para os arquivos grandes
+        requests = max(3, min(base, (256 * MB) // size))
+        file_concurrency = concurrency if size < 100 * MB else min(concurrency, 2)
+
+        if "upload" in groups:
+            async def upload(client, i, size=size, path=path):
+                with open(path, "rb") as content:
+                    response = await client.post(
+                        "/api/v1/documents/",
+                        headers=user_auth,
+                        data={"title": f"Upload {i}"},
+                        files={"file": (f"upload-{size_label(size)}.bin", content, "application/octet-stream")},
+                    )
+                return response.status_code
+            scenarios.append(Scenario(
+                f"upload-{size_label(size)}", requests, file_concurrency, upload, (303,), size
+            ))
+
+        if "download" in groups:
+            async def download(client, i, document_id=document_id):
+                url = f"/api/v1/documents/{document_id}/download"
+                async with client.stream("GET", url, headers=user_auth) as response:
+                    async for _ in response.aiter_raw():
+                        pass
+                return response.status_code
+            scenarios.append(Scenario(
+                f"download-{size_label(size)}", requests, file_concurrency, download, (200,), size
+            ))
+
+    if "admin" in groups:
+        async def admin(client, i):
+            return (await client.get("/admin", headers=admin_auth)).status_code
+        scenarios.append(Scenario("admin", max(10, base // 4), concurrency, admin, (200,)))
+
+    return scenarios
+
+
+async def run_scenario(client, scenario: Scenario, pids: Callable[[], List[int]]) -> Dict:
+    import httpx
+
+    # Aquecimento fora da medição: compilação dos templates, conexões, caches
+    if scenario.bytes_per_request < 100 * MB:
+        for i in range(2):
+            await scenario.send(client, -1 - i)
+
+    rss_reset = common.reset_peak_rss(pids())
+    latencies: List[float] = []
+    errors = 0
+    numbers = iter(range(scenario.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in numbers:
+            started = time.perf_counter()
+            try:
+                status = await scenario.send(client, i)
+            except httpx.HTTPError:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status not in scenario.expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": scenario.requests,
+        "concurrency": scenario.concurrency,
+        "errors": errors,
+        "throughput_rps": scenario.requests / elapsed,
+        **common.latency_summary(latencies),
+        "peak_rss_mb": common.peak_rss_mb(pids()),
+        # Sem o reset, o pico é o do processo inteiro, não só o do cenário
+        "peak_rss_reset": rss_reset,
+    }
+    if scenario.bytes_per_request:
+        result["mb_per_s"] = scenario.bytes_per_request * scenario.requests / elapsed / MB
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(client, server: subprocess.Popen, timeout: float = 60) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"O Hypercorn terminou com código {server.returncode}")
+        try:
+            await client.get("/metrics")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("O Hypercorn não respondeu a tempo")
+
+
+async def run_suite(args, profile: Dict, context: Dict, directory: str) -> Dict[str, Dict]:
+    import httpx
+
+    scenarios = build_scenarios(args.groups, profile, context)
+    results = {}
+    timeout = httpx.Timeout(None)
+
+    if args.transport == "inprocess":
+        from app.main import app
+        client = httpx.AsyncClient(
+            # Exceção não tratada vira 500 e conta como erro, como num servidor de verdade
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://bench", timeout=timeout
+        )
+        server, pids = None, lambda: [os.getpid()]
+    else:
+        port = free_port()
+        log = open(os.path.join(directory, "hypercorn.log"), "wb")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "hypercorn", "app.main:app",
+             "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers)],
+            cwd=common.ROOT, stdout=log, stderr=subprocess.STDOUT
+        )
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=timeout,
+            limits=httpx.Limits(max_connections=profile["concurrency"])
+        )
+        pids = lambda: common.process_tree(server.pid)  # noqa: E731
+
+    try:
+        if server is not None:
+            await wait_until_ready(client, server)
+        for scenario in scenarios:
+            results[scenario.name] = await run_scenario(client, scenario, pids)
+            print_row(scenario.name, results[scenario.name])
+    finally:
+        await client.aclose()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        else:
+            from app.db.session import async_engine
+            await async_engine.dispose()
+    return results
+
+
+def print_header() -> None:
+    print(f"{'cenário':<16} {'req':>6} {'erros':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'RSS MB':>8} {'MB/s':>8}")
+
+
+def print_row(name: str, result: Dict) -> None:
+    mb_per_s = f"{result['mb_per_s']:8.1f}" if "mb_per_s" in result else f"{'':>8}"
+    print(
+        f"{name:<16} {result['requests']:>6} {result['errors']:>6} {result['throughput_rps']:>9.1f} "
+        f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_rss_mb']:>8.1f} {mb_per_s}"
+    )
+
+
+def baseline_path(transport: str, profile: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{transport}-{profile}.json")
+
+
+def compare(baseline: Dict, results: Dict, tolerance: float, rss_tolerance: float) -> List[str]:
+    """Regressões de cada cenário em relação à baseline, uma mensagem por métrica."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if result["errors"] and not before["errors"]:
+            regressions.append(f"{name}: {result['errors']} erro(s), a baseline não tinha nenhum")
+        for metric in ("p50_ms", "p99_ms"):
+            if (result[metric] > before[metric] * (1 + tolerance)
+                    and result[metric] - before[metric] > LATENCY_FLOOR_MS):
+                regressions.append(f"{name}: {metric} {before[metric]:.2f} -> {result[metric]:.2f}")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: req/s {before['throughput_rps']:.1f} -> {result['throughput_rps']:.1f}"
+            )
+        if (result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + rss_tolerance)
+                and result["peak_rss_mb"] - before["peak_rss_mb"] > RSS_FLOOR_MB):
+            regressions.append(
+                f"{name}: RSS {before['peak_rss_mb']:.1f} MB -> {result['peak_rss_mb']:.1f} MB"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=("run", "check"))
+    parser.add_argument("--transport", choices=("inprocess", "hypercorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do Hypercorn")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", default=",".join(SCENARIO_GROUPS),
+                        help=f"Grupos de cenários separados por vírgula ({', '.join(SCENARIO_GROUPS)})")
+    parser.add_argument("--requests", type=int, help="Requisições por cenário (padrão do perfil)")
+    parser.add_argument("--concurrency", type=int, help="Requisições simultâneas (padrão do perfil)")
+    parser.add_argument("--admin-users", type=int, default=1000, help="Usuários listados no painel")
+    parser.add_argument("--hash-rounds", type=int, help="PASSWORD_HASH_ROUNDS da aplicação testada")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava o resultado como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Piora relativa aceita em latência e vazão")
+    parser.add_argument("--rss-tolerance", type=float, default=0.25, help="Piora relativa aceita no pico de RSS")
+    parser.add_argument("--output", help="Também grava o resultado neste arquivo JSON")
+    args = parser.parse_args()
+
+    args.groups = [group.strip() for group in args.only.split(",") if group.strip()]
+    unknown = set(args.groups) - set(SCENARIO_GROUPS)
+    if unknown:
+        parser.error(f"grupos desconhecidos: {', '.join(sorted(unknown))}")
+    profile = dict(PROFILES[args.profile])
+    profile["requests"] = args.requests or profile["requests"]
+    profile["concurrency"] = args.concurrency or profile["concurrency"]
+
+    baseline = None
+    if args.command == "check":
+        path = baseline_path(args.transport, args.profile)
+        if not os.path.exists(path):
+            sys.exit(f"Sem baseline em {path}; gere uma com: run --save-baseline")
+        with open(path) as source:
+            baseline = json.load(source)
+
+    directory = common.temp_dir()
+    configure_environment(directory, max(profile["files"]), args.hash_rounds)
+    # Templates e arquivos estáticos são resolvidos a partir da raiz do projeto
+    os.chdir(common.ROOT)
+
+    started = time.perf_counter()
+    context = seed(args.groups, profile["listing"], profile["files"], args.admin_users)
+    print(f"Dados preparados em {time.perf_counter() - started:.1f}s ({directory})")
+    print(f"Transporte: {args.transport}, perfil: {args.profile}")
+    print_header()
+    results = asyncio.run(run_suite(args, profile, context, directory))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "transport": args.transport,
+        "workers": args.workers if args.transport == "hypercorn" else None,
+        "profile": args.profile,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as target:
+            json.dump(report, target, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = baseline_path(args.transport, args.profile)
+        if os.path.exists(path):
+            # Baseline parcial (--only) atualiza só os cenários medidos
+            with open(path) as source:
+                report["scenarios"] = {**json.load(source)["scenarios"], **results}
+        with open(path, "w") as target:
+            json.dump(report, target, indent=2)
+        print(f"\nBaseline gravada em {path}")
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.tolerance, args.rss_tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) em relação a {baseline['created_at']}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\nSem regressões em relação à baseline de {baseline['created_at']}.")
+
+
+if __name__ == "__main__":
+    main()
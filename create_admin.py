@@ -1,11 +1,11 @@
-from app.db.session import get_db
+from app.db.session import SessionLocal
 from app.models.user import User
 from app.core.hashing import get_password_hash
 from app.core.config import settings
 
 def create_admin():
     # Obtém a sessão do banco de dados
-    db = next(get_db())
+    db = SessionLocal()
     
     try:
         # Verifica se o usuário já existe
@@ -1,10 +1,14 @@
+from collections import Counter
+from contextlib import contextmanager
 import os
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
+from app.core.metrics import instrument_engine
 from app.db.base_class import Base
 from app.db.session import get_db
 from app.main import app
@@ -12,38 +16,45 @@ from app.main import app
 # Configurar o arquivo .env.test para os testes
 os.environ["ENV_FILE"] = ".env.test"
 
-# Criar um banco de dados SQLite em memória para os testes
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Banco SQLite em arquivo temporário: os testes preparam os dados com uma
+# sessão síncrona e a aplicação lê o mesmo arquivo pela engine assíncrona
+@pytest.fixture(scope="function")
+def database_path(tmp_path):
+    return tmp_path / "test.db"
 
 @pytest.fixture(scope="function")
-def db_session():
+def db_session(database_path):
+    engine = create_engine(
+        f"sqlite:///{database_path}",
+        connect_args={"check_same_thread": False},
+    )
     # Criar as tabelas
     Base.metadata.create_all(bind=engine)
     
     # Criar uma nova sessão para o teste
-    session = TestingSessionLocal()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
     try:
         yield session
     finally:
         session.close()
         # Remover as tabelas após o teste
         Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+@pytest.fixture(scope="function")
+def async_session_factory(database_path):
+    # NullPool: cada requisição abre sua conexão no event loop do TestClient
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    # Mesmos eventos da engine da aplicação (métricas de consultas)
+    instrument_engine(engine.sync_engine)
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, async_session_factory):
     # Sobrescrever a dependência do banco de dados
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            db_session.close()
+    async def override_get_db():
+        async with async_session_factory() as session:
+            yield session
     
     app.dependency_overrides[get_db] = override_get_db
     
@@ -52,4 +63,36 @@ def client(db_session):
     yield test_client
     
     # Limpar as dependências após o teste
-    app.dependency_overrides.clear() 
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def assert_max_queries(async_session_factory):
+    """
+    Orçamento de consultas: falha o teste se o bloco fizer mais de
+    max_queries consultas pela engine da aplicação, listando as repetidas.
+
+        with assert_max_queries(3):
+            client.get("/rota")
+    """
+    engine = async_session_factory.kw["bind"].sync_engine
+
+    @contextmanager
+    def budget(max_queries: int):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "after_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", record)
+        if len(statements) > max_queries:
+            repeated = "\n".join(
+                f"  {count}x {statement}" for statement, count in Counter(statements).most_common(5)
+            )
+            pytest.fail(f"{len(statements)} consultas, o máximo era {max_queries}:\n{repeated}")
+
+    return budget
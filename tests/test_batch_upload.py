@@ -0,0 +1,68 @@
+import io
+import tarfile
+import zipfile
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models import Document, Job, User
+
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("contratos/aluguel.txt", "contrato de aluguel")
+        archive.writestr("contratos/", "")
+        archive.writestr("__MACOSX/._aluguel.txt", "lixo")
+        archive.writestr("grande.bin", b"x" * 200)
+    return buffer.getvalue()
+
+
+def make_tar():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in (("a.txt", b"primeiro"), ("b.txt", b"segundo")):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def test_batch_upload_expands_archives_and_isolates_failures(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 100)
+    user = User(email="lote@example.com", hashed_password="x", full_name="Lote")
+    db_session.add(user)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/documents/batch",
+        headers={"Authorization": f"Bearer {create_access_token(subject=user.email)}"},
+        files=[
+            ("files", ("recibo.pdf", b"%PDF recibo", "application/pdf")),
+            ("files", ("arquivo.zip", make_zip(), "application/zip")),
+            ("files", ("fotos.tar.gz", make_tar(), "application/gzip")),
+            ("files", ("quebrado.zip", b"nao e zip", "application/zip")),
+        ],
+        data={"description": "Migração"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(r["filename"], r["status"]) for r in body["results"]] == [
+        ("recibo.pdf", "created"),
+        ("aluguel.txt", "created"),
+        ("grande.bin", "error"),
+        ("a.txt", "created"),
+        ("b.txt", "created"),
+        ("quebrado.zip", "error"),
+    ]
+    assert (body["created"], body["failed"]) == (4, 2)
+
+    documents = db_session.scalars(select(Document).order_by(Document.id)).all()
+    assert [doc.id for doc in documents] == [r["document_id"] for r in body["results"] if "document_id" in r]
+    aluguel = documents[1]
+    assert (aluguel.title, aluguel.content_type, aluguel.description) == ("aluguel", "text/plain", "Migração")
+    assert (tmp_path / aluguel.storage_filename).read_bytes() == b"contrato de aluguel"
+    assert len(db_session.scalars(select(Job).where(Job.kind == "extract_content")).all()) == 4
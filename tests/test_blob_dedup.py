@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+import io
+import os
+import time
+
+from fastapi import UploadFile
+
+from app import crud
+from app.core.config import settings
+from app.core.storage import save_upload_file
+from app.models import Job, StorageBlob
+from app.services.storage_service import StorageService
+
+
+def test_identical_uploads_share_one_blob(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_DEDUP", True)
+
+    names = set()
+    for filename in ("rg.pdf", "copia_rg.pdf"):
+        upload = UploadFile(file=io.BytesIO(b"mesmo conteudo"), filename=filename)
+        _, storage_filename, _ = asyncio.run(save_upload_file(upload))
+        names.add(storage_filename)
+
+    assert len(names) == 1
+    stored = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert [p.relative_to(tmp_path).as_posix() for p in stored] == list(names)
+
+
+def test_blob_is_released_only_with_last_reference(db_session, async_session_factory):
+    async def scenario():
+        async with async_session_factory() as db:
+            await crud.blob.acquire(db, "abc", 10)
+            await crud.blob.acquire(db, "abc", 10)
+            await db.commit()
+
+            assert await crud.blob.release(db, "abc") is False
+            assert await crud.blob.release(db, "abc") is True
+            await db.commit()
+
+            assert await db.get(StorageBlob, "abc") is None
+            # Arquivos gravados sem deduplicação não têm registro e não são compartilhados
+            assert await crud.blob.release(db, "legacy.pdf") is True
+
+    asyncio.run(scenario())
+
+
+def test_recent_unreferenced_blob_is_kept_and_deletion_rescheduled(
+    db_session, async_session_factory, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_DEDUP", True)
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+
+    names = []
+    for content in (b"upload em andamento", b"orfao antigo"):
+        upload = UploadFile(file=io.BytesIO(content), filename="a.pdf")
+        names.append(asyncio.run(save_upload_file(upload))[1])
+    fresh, old = names
+    an_hour_ago = time.time() - 3600
+    os.utime(tmp_path / old, (an_hour_ago, an_hour_ago))
+
+    async def scenario():
+        async with async_session_factory() as db:
+            return await StorageService().delete_unreferenced_files(db, [fresh, old])
+
+    assert asyncio.run(scenario()) == []
+    # O recente pode ser de um upload ainda sem commit: fica e é conferido de novo depois
+    assert (tmp_path / fresh).exists()
+    assert not (tmp_path / old).exists()
+    job = db_session.query(Job).one()
+    assert (job.kind, job.payload) == ("delete_files", {"storage_filenames": [fresh]})
+    assert job.run_at > datetime.utcnow()
@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.db.pool import apply_sqlite_pragmas, engine_options
+from app.db.session import make_async_url
+
+
+def test_make_async_url_picks_async_driver():
+    assert make_async_url("sqlite:///./guarda_docs.db") == "sqlite+aiosqlite:///./guarda_docs.db"
+    assert (
+        make_async_url("postgresql://postgres:postgres@db:5432/guardadocs")
+        == "postgresql+asyncpg://postgres:postgres@db:5432/guardadocs"
+    )
+    # URLs que já indicam o driver ficam como estão
+    assert make_async_url("sqlite+aiosqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+    assert make_async_url("sqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+    # Um driver síncrono explícito é trocado pelo assíncrono do mesmo banco
+    assert (
+        make_async_url("postgresql+psycopg2://postgres:postgres@db:5432/guardadocs")
+        == "postgresql+asyncpg://postgres:postgres@db:5432/guardadocs"
+    )
+    assert make_async_url("sqlite+pysqlite:///./guarda_docs.db") == "sqlite+aiosqlite:///./guarda_docs.db"
+    assert make_async_url("postgres://u:p@db/guardadocs") == "postgresql+asyncpg://u:p@db/guardadocs"
+
+
+def test_sqlite_connections_use_wal_and_report_pool_waits(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(database_url, **engine_options(database_url))
+    apply_sqlite_pragmas(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT
+
+    stats = engine.pool.metrics.snapshot(engine.pool)
+    assert stats["checkouts"] >= 1
+    assert stats["checked_out"] == 0
+
+    # Cada engine tem os próprios contadores
+    other_url = f"sqlite:///{tmp_path / 'other.db'}"
+    other = create_engine(other_url, **engine_options(other_url))
+    assert other.pool.metrics is not engine.pool.metrics
+    assert other.pool.metrics.snapshot(other.pool)["checkouts"] == 0
+    other.dispose()
+    engine.dispose()
+
+    # SQLite em memória mantém o pool padrão de conexão única
+    assert "poolclass" not in engine_options("sqlite:///:memory:")
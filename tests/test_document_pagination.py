@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud
+from app.crud.crud_document import InvalidCursor
+from app.models import Document, User
+
+
+def seed_documents(db_session, count):
+    user = User(email="paginas@example.com", hashed_password="x", full_name="Paginas")
+    db_session.add(user)
+    db_session.commit()
+
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        db_session.add(Document(
+            title=f"doc {i}",
+            original_filename=f"doc{i}.pdf",
+            storage_filename=f"doc{i}.pdf",
+            file_size=1,
+            content_type="application/pdf",
+            # Pares de documentos com o mesmo created_at: o desempate é pelo id
+            created_at=base + timedelta(minutes=i // 2),
+            user_id=user.id
+        ))
+    db_session.commit()
+    return user.id
+
+
+def test_keyset_pages_cover_all_documents_newest_first(db_session, async_session_factory):
+    user_id = seed_documents(db_session, 7)
+
+    async def scenario():
+        pages = []
+        cursor = None
+        async with async_session_factory() as db:
+            while True:
+                page = await crud.document.list_by_user(db, user_id, limit=3, cursor=cursor)
+                pages.append([doc.title for doc in page.items])
+                cursor = page.next_cursor
+                if cursor is None:
+                    return pages
+
+    pages = asyncio.run(scenario())
+    assert pages == [
+        ["doc 6", "doc 5", "doc 4"],
+        ["doc 3", "doc 2", "doc 1"],
+        ["doc 0"],
+    ]
+
+
+def test_invalid_cursor_is_rejected(db_session, async_session_factory):
+    user_id = seed_documents(db_session, 1)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await crud.document.list_by_user(db, user_id, limit=3, cursor="não-é-cursor")
+
+    with pytest.raises(InvalidCursor):
+        asyncio.run(scenario())
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.downloads import (
+    RangeNotSatisfiable,
+    build_download_response,
+    build_offload_response,
+    parse_range_header,
+)
+
+CONTENT = bytes(range(256)) * 4
+ETAG = '"abc123"'
+LAST_MODIFIED = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def download_client():
+    app = FastAPI()
+
+    async def open_range(start: int, end: int):
+        yield CONTENT[start:end + 1]
+
+    @app.get("/file")
+    async def get_file(request: Request):
+        return build_download_response(
+            request,
+            open_range=open_range,
+            file_size=len(CONTENT),
+            etag=ETAG,
+            last_modified=LAST_MODIFIED,
+            filename="relatório.pdf",
+            media_type="application/pdf",
+        )
+
+    @app.get("/offload")
+    async def get_offloaded(request: Request):
+        return build_offload_response(
+            request,
+            etag=ETAG,
+            last_modified=LAST_MODIFIED,
+            filename="doc.pdf",
+            media_type="application/pdf",
+            redirect_header="x-accel-redirect",
+            redirect_target="/protected-uploads/ab/cd/doc.pdf",
+        )
+
+    return TestClient(app)
+
+
+def test_parse_range_header_merges_and_clamps():
+    assert parse_range_header("bytes=0-9,5-19,-10", 100) == [(0, 19), (90, 99)]
+    assert parse_range_header("bytes=50-", 100) == [(50, 99)]
+    assert parse_range_header("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=200-300", 100)
+
+
+def test_full_download_has_validators(download_client):
+    response = download_client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "filename*=utf-8''relat%C3%B3rio.pdf" in response.headers["content-disposition"]
+
+
+def test_single_range(download_client):
+    response = download_client.get("/file", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+
+def test_multiple_ranges(download_client):
+    response = download_client.get("/file", headers={"Range": "bytes=0-3,100-103"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert CONTENT[0:4] in response.content
+    assert CONTENT[100:104] in response.content
+
+
+def test_unsatisfiable_range(download_client):
+    response = download_client.get("/file", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_conditional_get(download_client):
+    response = download_client.get("/file", headers={"If-None-Match": ETAG})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    last_modified = download_client.get("/file").headers["last-modified"]
+    response = download_client.get("/file", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+def test_if_range_mismatch_serves_full_file(download_client):
+    response = download_client.get(
+        "/file", headers={"Range": "bytes=0-9", "If-Range": '"outro"'}
+    )
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_offload_hands_transfer_to_proxy(download_client):
+    response = download_client.get("/offload")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == "/protected-uploads/ab/cd/doc.pdf"
+    assert response.headers["content-type"] == "application/pdf"
+
+    response = download_client.get("/offload", headers={"If-None-Match": ETAG})
+    assert response.status_code == 304
+    assert "x-accel-redirect" not in response.headers
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import zipfile
+from datetime import datetime
+
+from app.core import zip_stream
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.core.zip_stream import ZipEntry, should_compress, stream_zip
+from app.models import Document, User
+from app.services.export_service import ExportService
+
+MODIFIED = datetime(2024, 5, 6, 7, 8, 10)
+
+
+def entry(name, content, **kwargs):
+    async def read():
+        for start in range(0, len(content), 7):
+            yield content[start:start + 7]
+    return ZipEntry(name=name, modified=MODIFIED, open=read, **kwargs)
+
+
+def build_zip(entries):
+    async def scenario():
+        async def source():
+            for item in entries:
+                yield item
+        return b"".join([chunk async for chunk in stream_zip(source())])
+    return zipfile.ZipFile(io.BytesIO(asyncio.run(scenario())))
+
+
+def test_stream_zip_is_readable_and_keeps_compressed_types_stored():
+    archive = build_zip([
+        entry("relatório.txt", b"linha\n" * 100),
+        entry("foto.jpg", b"\xff\xd8jpeg", compress=False),
+        entry("vazio.txt", b""),
+    ])
+    assert archive.testzip() is None
+    infos = {info.filename: info for info in archive.infolist()}
+    assert archive.read("relatório.txt") == b"linha\n" * 100
+    assert infos["relatório.txt"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos["relatório.txt"].compress_size < 100
+    assert infos["foto.jpg"].compress_type == zipfile.ZIP_STORED
+    assert infos["foto.jpg"].date_time == (2024, 5, 6, 7, 8, 10)
+    assert archive.read("vazio.txt") == b""
+
+    assert not should_compress("scan.pdf", "application/pdf")
+    assert not should_compress("video", "video/mp4")
+    assert should_compress("planilha.csv", "text/csv")
+
+
+def test_zip64_entries_and_end_record(monkeypatch):
+    monkeypatch.setattr(zip_stream, "ZIP64_COUNT_LIMIT", 2)
+    archive = build_zip([
+        # Anunciado como grande: a entrada sai em ZIP64 desde o cabeçalho local
+        entry("grande.bin", b"conteudo", size_hint=5 * 2**30),
+        entry("b.txt", b"b"),
+        entry("c.txt", b"c"),
+    ])
+    assert archive.testzip() is None
+    assert [info.filename for info in archive.infolist()] == ["grande.bin", "b.txt", "c.txt"]
+    assert archive.read("grande.bin") == b"conteudo"
+
+
+def test_export_service_streams_user_documents(db_session, async_session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    (tmp_path / "a.txt").write_bytes(b"primeiro")
+    (tmp_path / "b.txt").write_bytes(b"segundo")
+    user = User(email="export@example.com", hashed_password="x", full_name="Export")
+    other = User(email="outro@example.com", hashed_password="x", full_name="Outro")
+    db_session.add_all([user, other])
+    db_session.commit()
+    db_session.add_all([
+        Document(title="A", original_filename="nota.txt", storage_filename="a.txt",
+                 file_size=8, content_type="text/plain", user_id=user.id),
+        Document(title="B", original_filename="nota.txt", storage_filename="b.txt",
+                 file_size=7, content_type="text/plain", user_id=user.id),
+        Document(title="C", original_filename="sumiu.pdf", storage_filename="sumiu.pdf",
+                 file_size=3, content_type="application/pdf", user_id=user.id),
+        Document(title="D", original_filename="alheio.txt", storage_filename="a.txt",
+                 file_size=8, content_type="text/plain", user_id=other.id),
+    ])
+    db_session.commit()
+    service = ExportService(async_session_factory)
+
+    async def scenario():
+        return b"".join([chunk async for chunk in service.stream(user.id)])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(scenario())))
+    assert archive.namelist() == ["nota.txt", "nota (2).txt", "ARQUIVOS_AUSENTES.txt"]
+    assert archive.read("nota (2).txt") == b"segundo"
+    assert b"sumiu.pdf" in archive.read("ARQUIVOS_AUSENTES.txt")
+
+
+def test_export_route_limits_selection_to_own_documents(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    user = User(email="dono@example.com", hashed_password="x", full_name="Dono")
+    other = User(email="vizinho@example.com", hashed_password="x", full_name="Vizinho")
+    db_session.add_all([user, other])
+    db_session.commit()
+    document = Document(title="X", original_filename="x.txt", storage_filename="x.txt",
+                        file_size=1, content_type="text/plain", user_id=other.id)
+    db_session.add(document)
+    db_session.commit()
+
+    response = client.get(
+        f"/api/v1/documents/export?ids={document.id}",
+        headers={"Authorization": f"Bearer {create_access_token(subject=user.email)}"},
+    )
+    assert response.status_code == 404
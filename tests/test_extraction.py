@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+import zipfile
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Document, DocumentExtraction, User
+from app.services.extraction_service import (
+    ExtractionService,
+    chunk_text,
+    extract_chunks,
+    iter_plain_text,
+    reader_for,
+)
+from app.services.search_service import search_service
+
+DOCX_XML = (
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>Cláusula primeira:</w:t></w:r><w:r><w:t xml:space="preserve"> do aluguel</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Vistoria do imóvel</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+def write_docx(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", DOCX_XML)
+
+
+def test_chunk_text_cuts_on_spaces_and_normalizes():
+    chunks = list(chunk_text(["um  dois\ntrês ", "qua", "tro cinco seis"], 10))
+    assert chunks == ["um dois", "três", "quatro", "cinco seis"]
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert list(chunk_text(["x" * 25], 10)) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_plain_text_falls_back_to_cp1252(tmp_path):
+    path = tmp_path / "notas.txt"
+    path.write_bytes("Relatório de manutenção".encode("cp1252"))
+    assert "".join(iter_plain_text(str(path))) == "Relatório de manutenção"
+
+
+def test_office_documents_are_read_paragraph_by_paragraph(tmp_path):
+    path = tmp_path / "contrato.docx"
+    write_docx(path)
+    result = extract_chunks(
+        str(path), reader_for("contrato.docx", None), chunk_size=100, max_chars=1000, timeout=5
+    )
+    assert result.status == "indexed"
+    assert result.chunks == ["Cláusula primeira: do aluguel Vistoria do imóvel"]
+
+
+def test_limits(tmp_path):
+    path = tmp_path / "grande.txt"
+    path.write_text("palavra " * 1000)
+    result = extract_chunks(str(path), iter_plain_text, chunk_size=100, max_chars=250, timeout=5)
+    assert result.char_count == 250
+    assert sum(len(chunk) for chunk in result.chunks) == 250
+
+    result = extract_chunks(str(path), iter_plain_text, chunk_size=100, max_chars=10000, timeout=-1)
+    assert result.status == "timeout"
+
+    assert reader_for("foto.jpg", "image/jpeg") is None
+
+
+def test_process_document_indexes_content(db_session, async_session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    write_docx(tmp_path / "ab.docx")
+    (tmp_path / "cd.txt").write_text("recibo de pagamento")
+
+    user = User(email="conteudo@example.com", hashed_password="x", full_name="Conteúdo")
+    db_session.add(user)
+    db_session.commit()
+    contract = Document(
+        title="Contrato", original_filename="contrato.docx", storage_filename="ab.docx",
+        file_size=1, content_type="application/octet-stream", user_id=user.id
+    )
+    receipt = Document(
+        title="Recibo", original_filename="recibo.txt", storage_filename="cd.txt",
+        file_size=1, content_type="text/plain", user_id=user.id
+    )
+    db_session.add_all([contract, receipt])
+    db_session.commit()
+
+    service = ExtractionService(session_factory=async_session_factory)
+
+    async def scenario():
+        statuses = [await service.process_document(doc.id) for doc in (contract, receipt)]
+        async with async_session_factory() as db:
+            found = await search_service.search(db, user.id, "vistoria imovel", limit=10)
+            extraction = await db.get(DocumentExtraction, contract.id)
+            await search_service.remove_documents(db, [contract.id])
+            await db.commit()
+            after_removal = await search_service.search(db, user.id, "vistoria", limit=10)
+            remaining = (await db.scalars(select(DocumentExtraction.document_id))).all()
+        return statuses, found, extraction, after_removal, remaining
+
+    statuses, found, extraction, after_removal, remaining = asyncio.run(scenario())
+    assert statuses == ["indexed", "indexed"]
+    assert [doc.title for doc in found.items] == ["Contrato"]
+    assert extraction.storage_filename == "ab.docx" and extraction.chunk_count == 1
+    assert after_removal.items == []
+    assert remaining == [receipt.id]
+
+
+def test_replaced_file_discards_stale_extraction(db_session, async_session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    (tmp_path / "antigo.txt").write_text("conteúdo antigo")
+    user = User(email="troca@example.com", hashed_password="x", full_name="Troca")
+    db_session.add(user)
+    db_session.commit()
+    document = Document(
+        title="Doc", original_filename="doc.txt", storage_filename="antigo.txt",
+        file_size=1, content_type="text/plain", user_id=user.id
+    )
+    db_session.add(document)
+    db_session.commit()
+
+    service = ExtractionService(session_factory=async_session_factory)
+    original_extract = service.extract
+
+    def extract_then_replace(*args):
+        result = original_extract(*args)
+        # O usuário troca o arquivo enquanto a extração roda
+        document.storage_filename = "novo.txt"
+        db_session.commit()
+        return result
+
+    service.extract = extract_then_replace
+    assert asyncio.run(service.process_document(document.id)) is None
+    assert db_session.get(DocumentExtraction, document.id) is None
+
+
+def test_stuck_reader_is_killed_at_the_deadline(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "EXTRACTION_TIMEOUT", 1)
+    # Abrir um FIFO sem ninguém escrevendo bloqueia: o leitor nunca devolve nada
+    os.mkfifo(tmp_path / "preso.txt")
+
+    started = time.monotonic()
+    result = ExtractionService().extract("preso.txt", "preso.txt", "text/plain", 1)
+
+    assert result.status == "timeout"
+    assert time.monotonic() - started < 10
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Job
+from app.services.job_queue import DatabaseJobQueue, JobWorker, RedisJobQueue
+
+
+def all_jobs(db_session):
+    db_session.expire_all()
+    return db_session.scalars(select(Job).order_by(Job.id)).all()
+
+
+def test_enqueue_follows_the_callers_transaction(db_session, async_session_factory):
+    queue = DatabaseJobQueue(async_session_factory)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await queue.enqueue(db, "extract_content", {"document_id": 1})
+            await db.rollback()
+            await queue.enqueue(db, "extract_content", {"document_id": 2})
+            await db.commit()
+
+    asyncio.run(scenario())
+    assert [job.payload for job in all_jobs(db_session)] == [{"document_id": 2}]
+
+
+def test_idempotency_key_coalesces_only_queued_jobs(db_session, async_session_factory):
+    queue = DatabaseJobQueue(async_session_factory)
+
+    async def enqueue_twice():
+        async with async_session_factory() as db:
+            for _ in range(2):
+                await queue.enqueue(db, "extract_content", {"document_id": 7}, idempotency_key="extract:7")
+            await db.commit()
+
+    asyncio.run(enqueue_twice())
+    assert len(all_jobs(db_session)) == 1
+
+    # Depois que o job começa, a mesma chave volta a enfileirar
+    claimed = asyncio.run(queue.claim("worker-a", 10))
+    asyncio.run(enqueue_twice())
+    assert [job.status for job in all_jobs(db_session)] == ["running", "queued"]
+    assert claimed[0].attempts == 1
+
+
+def test_worker_retries_with_backoff_then_gives_up(db_session, async_session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF", 0)
+    queue = DatabaseJobQueue(async_session_factory)
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload["n"])
+        if payload["n"] == 2:
+            raise ValueError("falhou")
+
+    async def scenario():
+        async with async_session_factory() as db:
+            for n in (1, 2):
+                await queue.enqueue(db, "flaky", {"n": n}, max_attempts=3)
+            await queue.enqueue(db, "unknown", {})
+            await db.commit()
+        await JobWorker(queue, {"flaky": flaky}, worker_id="worker-a").run_until_empty()
+
+    asyncio.run(scenario())
+    jobs = all_jobs(db_session)
+    assert sorted(calls) == [1, 2, 2, 2]
+    assert [(job.status, job.attempts) for job in jobs] == [("done", 1), ("dead", 3), ("dead", 1)]
+    assert jobs[1].last_error == "ValueError: falhou"
+    assert "desconhecido" in jobs[2].last_error
+
+
+def test_failed_attempt_waits_for_backoff(db_session, async_session_factory):
+    queue = DatabaseJobQueue(async_session_factory)
+
+    async def failing(payload):
+        raise RuntimeError("indisponível")
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await queue.enqueue(db, "failing", {})
+            await db.commit()
+        await JobWorker(queue, {"failing": failing}).run_until_empty()
+
+    asyncio.run(scenario())
+    (job,) = all_jobs(db_session)
+    assert job.status == "retry" and job.attempts == 1
+    assert job.run_at > datetime.utcnow()
+
+
+def test_expired_visibility_timeout_redelivers(db_session, async_session_factory, monkeypatch):
+    queue = DatabaseJobQueue(async_session_factory)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await queue.enqueue(db, "slow", {})
+            await db.commit()
+        monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", -1)
+        (first,) = await queue.claim("worker-a", 1)
+        # worker-a "morreu": o prazo venceu e o job volta para a fila
+        (second,) = await queue.claim("worker-b", 1)
+        # A conclusão atrasada de worker-a não vale mais
+        await queue.complete(first, "worker-a")
+        return second
+
+    second = asyncio.run(scenario())
+    (job,) = all_jobs(db_session)
+    assert second.attempts == 2
+    assert job.status == "running" and job.locked_by == "worker-b"
+
+
+def test_redis_jobs_wait_in_the_outbox_until_forwarded(db_session, async_session_factory):
+    # Nenhuma conexão é aberta até o primeiro comando enviado ao Redis
+    queue = RedisJobQueue("redis://localhost:1/0", async_session_factory)
+    pushed = []
+
+    async def redis_down(keys, args):
+        raise ConnectionError("Redis fora do ar")
+
+    async def redis_up(keys, args):
+        pushed.append(args)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await queue.enqueue(db, "extract_content", {"document_id": 1})
+            await db.rollback()
+            await queue.enqueue(db, "extract_content", {"document_id": 2}, idempotency_key="extract:2")
+            await db.commit()
+        queue._enqueue = redis_down
+        try:
+            await queue.forward_outbox()
+        except ConnectionError:
+            pass
+        assert [(job.status, job.payload) for job in all_jobs(db_session)] == [("outbox", {"document_id": 2})]
+        queue._enqueue = redis_up
+        return await queue.forward_outbox()
+
+    assert asyncio.run(scenario()) == 1
+    assert all_jobs(db_session) == []
+    kind, payload, idempotency_key = pushed[0][:3]
+    assert (kind, payload, idempotency_key) == ("extract_content", '{"document_id": 2}', "extract:2")
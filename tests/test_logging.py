@@ -0,0 +1,44 @@
+import json
+import logging
+
+from app.core import log
+from app.core.config import settings
+
+
+def make_record(level=logging.INFO, **extra):
+    record = logging.LogRecord("app.teste", level, __file__, 1, "Documento %s salvo", (7,), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_request_id_and_extra_fields():
+    token = log._request_id.set("req-123")
+    try:
+        record = make_record(document_id=7)
+        log.RequestIdFilter().filter(record)
+    finally:
+        log._request_id.reset(token)
+
+    entry = json.loads(log.JsonFormatter().format(record))
+    assert entry["message"] == "Documento 7 salvo"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.teste"
+    assert entry["request_id"] == "req-123"
+    assert entry["document_id"] == 7
+
+
+def test_sampling_only_drops_debug_records(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_DEBUG_SAMPLE_RATE", 0)
+    sampler = log.SamplingFilter()
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert sampler.filter(make_record(logging.WARNING))
+    assert not sampler.filter(make_record(logging.INFO, sample_rate=0))
+
+
+def test_request_id_is_echoed_or_generated(client):
+    response = client.get("/nao-existe", headers={"X-Request-ID": "abc-1"})
+    assert response.headers["x-request-id"] == "abc-1"
+
+    response = client.get("/nao-existe", headers={"X-Request-ID": "com espaco"})
+    generated = response.headers["x-request-id"]
+    assert generated != "com espaco" and len(generated) == 32
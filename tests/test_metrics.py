@@ -0,0 +1,44 @@
+from app.core.security import create_access_token
+from app.main import templates
+from app.models import Document, User
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_route_metrics_use_route_template_and_count_queries(client, db_session):
+    user = User(email="metricas@example.com", hashed_password="x", full_name="Métricas")
+    db_session.add(user)
+    db_session.commit()
+    document = Document(title="A", original_filename="a.txt", storage_filename="a.txt",
+                        file_size=1, content_type="text/plain", user_id=user.id)
+    db_session.add(document)
+    db_session.commit()
+    route = "/api/v1/documents/{document_id}"
+    before = sample("guardadocs_http_request_duration_seconds_count", method="DELETE", route=route, status="200")
+    queries_before = sample("guardadocs_db_queries_per_request_sum", route=route)
+
+    response = client.delete(
+        f"/api/v1/documents/{document.id}",
+        headers={"Authorization": f"Bearer {create_access_token(subject=user.email)}"},
+    )
+    assert response.status_code == 200
+
+    assert sample("guardadocs_http_request_duration_seconds_count",
+                  method="DELETE", route=route, status="200") == before + 1
+    assert sample("guardadocs_db_queries_per_request_sum", route=route) > queries_before
+
+
+def test_metrics_endpoint_exposes_prometheus_text(client):
+    templates.env.get_template("error.html").render(request=None, error="x")
+    client.get("/nao-existe")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'guardadocs_template_render_seconds_count{template="error.html"}' in body
+    assert 'route="<unmatched>"' in body
+    assert "/nao-existe" not in body
@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.core.executors import get_pool_stats
+from app.core.hashing import check_password, get_password_hash, hash_password, needs_rehash
+from app.core.security import authenticate_password
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_hash_and_check_run_in_pool(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 4)
+
+    async def scenario():
+        hashed = await hash_password("segredo")
+        results = await asyncio.gather(
+            check_password("segredo", hashed), check_password("errada", hashed)
+        )
+        return hashed, results
+
+    hashed, results = asyncio.run(scenario())
+    assert results == [True, False]
+    assert not needs_rehash(hashed)
+    stats = get_pool_stats()["password-hash"]
+    assert stats["queued"] == 0 and stats["running"] == 0
+
+
+def test_login_rehashes_when_cost_changes(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 4)
+    user = SimpleNamespace(hashed_password=get_password_hash("segredo"))
+    db = FakeSession()
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 5)
+    assert needs_rehash(user.hashed_password)
+    assert asyncio.run(authenticate_password(db, user, "segredo"))
+    assert user.hashed_password.startswith("$2b$05$")
+    assert db.commits == 1
+
+    assert not asyncio.run(authenticate_password(db, user, "errada"))
+    assert asyncio.run(authenticate_password(db, user, "segredo"))
+    assert db.commits == 1
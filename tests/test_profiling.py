@@ -0,0 +1,55 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+from app.models import User
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_counts_folded_stacks():
+    sampler = profiling.StackSampler(0.001)
+    sampler.start()
+    busy_loop(0.05)
+    stacks = sampler.stop()
+
+    assert sampler.samples > 0
+    busy = [stack for stack in stacks if "busy_loop (test_profiling.py:" in stack]
+    assert busy and all(stack.startswith("MainThread;") for stack in busy)
+
+
+def test_admin_flag_profiles_request_and_admin_route_serves_it(
+    client, db_session, async_session_factory, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    admin = User(email="perfil@example.com", hashed_password="x", full_name="Admin", is_admin=True)
+    regular = User(email="comum@example.com", hashed_password="x", full_name="Comum")
+    db_session.add_all([admin, regular])
+    db_session.commit()
+    admin_auth = {"Authorization": f"Bearer {create_access_token(subject=admin.email)}"}
+    # Mesmo app do fixture client (banco sobrescrito), agora com o middleware
+    profiled = TestClient(profiling.ProfilingMiddleware(app, session_factory=async_session_factory))
+
+    regular_auth = {"Authorization": f"Bearer {create_access_token(subject=regular.email)}"}
+    response = profiled.get("/api/v1/auth/me", headers={"X-Profile": "1", **regular_auth})
+    assert profiling.PROFILE_ID_HEADER not in response.headers
+
+    response = profiled.get("/admin/profiles?_profile=1", headers=admin_auth)
+    assert response.status_code == 200
+    profile_id = response.headers[profiling.PROFILE_ID_HEADER]
+
+    listed = client.get("/admin/profiles", headers=admin_auth).json()["profiles"]
+    assert [(p["id"], p["path"], p["status"], p["reason"]) for p in listed] == [
+        (profile_id, "/admin/profiles", 200, "admin")
+    ]
+    response = client.get(f"/admin/profiles/{profile_id}", headers=admin_auth)
+    assert response.status_code == 200
+    assert client.get("/admin/profiles/..%2Fsegredo", headers=admin_auth).status_code == 404
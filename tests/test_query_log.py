@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core import query_log
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models import User
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def query_records():
+    handler = ListHandler()
+    query_log.logger.addHandler(handler)
+    yield handler.records
+    query_log.logger.removeHandler(handler)
+
+
+def auth_header(db_session, email):
+    user = User(email=email, hashed_password="x", full_name="Consultas")
+    db_session.add(user)
+    db_session.commit()
+    return {"Authorization": f"Bearer {create_access_token(subject=email)}"}
+
+
+def test_slow_query_is_logged_with_truncated_parameters(monkeypatch, query_records):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0.1)
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_PARAMETERS", True)
+    assert not query_log.log_slow_query("SELECT 1", (), False, 0.05)
+
+    assert query_log.log_slow_query("SELECT * FROM users WHERE email = ?", ("a" * 500,), False, 0.2)
+    record = query_records[-1]
+    assert record.statement == "SELECT * FROM users WHERE email = ?"
+    assert record.duration_seconds == 0.2
+    assert record.parameters.startswith("('aaa") and record.parameters.endswith("...)")
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_PARAMETERS", False)
+    query_log.log_slow_query("SELECT 1", ("segredo",), False, 0.2)
+    assert query_records[-1].parameters is None
+
+
+def test_credential_parameters_are_masked(monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_PARAMETERS", True)
+
+    named = query_log.format_parameters({"email": "a@b.com", "hashed_password": "$2b$12$x"}, False)
+    assert named == "(email='a@b.com', hashed_password='***')"
+    # Posicionais não têm nome: todos são mascarados se a consulta cita uma credencial
+    positional = query_log.format_parameters(
+        [("a@b.com", "$2b$12$x")], True, "INSERT INTO users (email, hashed_password) VALUES (?, ?)"
+    )
+    assert positional == "1 conjuntos, o primeiro: ('***', '***')"
+    assert query_log.format_parameters(("a@b.com",), False, "SELECT * FROM users WHERE email = ?") == "('a@b.com')"
+
+
+def test_repeated_statements_in_a_request_are_reported(client, db_session, monkeypatch, query_records):
+    headers = auth_header(db_session, "repetidas@example.com")
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 1e-9)
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 1)
+    route = "/api/v1/auth/me"
+    repeated_before = sample("guardadocs_db_repeated_queries_total", route=route)
+
+    assert client.get(route, headers=headers).status_code == 200
+
+    assert sample("guardadocs_db_repeated_queries_total", route=route) > repeated_before
+    messages = [record.getMessage() for record in query_records]
+    assert any(message.startswith(f"Possível N+1 em {route}") for message in messages)
+    assert any(message.startswith("Consulta lenta") for message in messages)
+
+
+def test_assert_max_queries_enforces_the_budget(client, db_session, assert_max_queries):
+    # Usuário ainda fora do cache: a primeira requisição consulta o banco
+    headers = auth_header(db_session, "orcamento@example.com")
+
+    with assert_max_queries(2) as statements:
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert statements
+
+    with pytest.raises(pytest.fail.Exception, match="consultas, o máximo era 0"):
+        with assert_max_queries(0):
+            client.get("/api/v1/users/1", headers=headers)
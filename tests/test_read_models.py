@@ -0,0 +1,33 @@
+import asyncio
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from app import crud
+from app.crud.read_models import UserListItem
+from app.models import User
+
+
+def test_admin_user_list_is_projected_and_read_only(db_session, async_session_factory):
+    db_session.add_all([
+        User(email="antigo@example.com", hashed_password="x", full_name="Antigo",
+             created_at=datetime(2024, 1, 1)),
+        User(email="novo@example.com", hashed_password="x", full_name="Novo",
+             is_admin=True, created_at=datetime(2024, 6, 1)),
+    ])
+    db_session.commit()
+
+    async def scenario():
+        async with async_session_factory() as db:
+            users = await crud.user.list_for_admin(db)
+            # Nada entra no identity map da sessão
+            assert len(db.identity_map) == 0
+            return users
+
+    users = asyncio.run(scenario())
+    assert [u.email for u in users] == ["novo@example.com", "antigo@example.com"]
+    assert isinstance(users[0], UserListItem)
+    assert users[0].is_admin and not hasattr(users[0], "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        users[0].email = "outro@example.com"
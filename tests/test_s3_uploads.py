@@ -0,0 +1,203 @@
+import asyncio
+import io
+
+import pytest
+
+moto = pytest.importorskip("moto")
+import boto3
+import requests
+
+from app.core.config import settings
+from app.services.storage_service import StorageService
+
+BUCKET = "guardadocs-test"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "s3")
+    monkeypatch.setattr(settings, "AWS_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(settings, "AWS_REGION", "us-east-1")
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_MULTIPART_THRESHOLD", 5 * MB)
+    monkeypatch.setattr(settings, "S3_MULTIPART_CHUNK_SIZE", 5 * MB)
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield StorageService()
+
+
+@pytest.fixture
+def s3_app(s3_storage, tmp_path, monkeypatch):
+    """A aplicação usando o bucket do moto; a pasta de uploads fica vazia."""
+    from app import main
+
+    monkeypatch.setattr(main, "storage_service", s3_storage)
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    return s3_storage
+
+
+def auth_headers(db_session, email):
+    from app.core.security import create_access_token
+    from app.models import User
+
+    db_session.add(User(email=email, hashed_password="x", full_name="S3"))
+    db_session.commit()
+    return {"Authorization": f"Bearer {create_access_token(subject=email)}"}
+
+
+def upload_through_form(client, headers, content, filename="contrato.pdf"):
+    response = client.post(
+        "/api/v1/documents/",
+        data={"title": "Contrato"},
+        files={"file": (filename, content, "application/pdf")},
+        headers=headers,
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    return response
+
+
+def test_large_file_is_uploaded_in_parts(s3_storage):
+    content = b"a" * (11 * MB)
+
+    asyncio.run(s3_storage.save_file(io.BytesIO(content), "grande.bin"))
+
+    head = s3_storage.s3_client.head_object(Bucket=BUCKET, Key="grande.bin")
+    assert head["ContentLength"] == len(content)
+    # ETag de objeto multipart termina com o número de partes
+    assert head["ETag"].strip('"').endswith("-3")
+
+
+def test_presigned_post_upload(s3_storage):
+    presigned = asyncio.run(s3_storage.create_presigned_post("ab/cd/doc.pdf", "application/pdf", MB))
+
+    response = requests.post(
+        presigned["url"],
+        data=presigned["fields"],
+        files={"file": ("doc.pdf", b"%PDF-1.4 conteudo")},
+    )
+
+    assert response.status_code in (200, 204)
+    assert asyncio.run(s3_storage.get_object_size("ab/cd/doc.pdf")) == len(b"%PDF-1.4 conteudo")
+
+
+def test_presigned_multipart_upload(s3_storage):
+    content = b"b" * (6 * MB)
+    part_size = settings.S3_MULTIPART_CHUNK_SIZE
+
+    upload_id = asyncio.run(s3_storage.create_multipart_upload("ab/cd/big.bin", "application/octet-stream"))
+    parts = asyncio.run(s3_storage.presign_upload_parts("ab/cd/big.bin", upload_id, 2))
+
+    etags = []
+    for part in parts:
+        offset = (part["part_number"] - 1) * part_size
+        response = requests.put(part["url"], data=content[offset:offset + part_size])
+        assert response.status_code == 200
+        etags.append((part["part_number"], response.headers["ETag"]))
+
+    asyncio.run(s3_storage.complete_multipart_upload("ab/cd/big.bin", upload_id, etags))
+
+    assert asyncio.run(s3_storage.get_object_size("ab/cd/big.bin")) == len(content)
+
+
+def test_download_checks_the_object_before_streaming(s3_storage, client, db_session, monkeypatch):
+    from app import main
+    from app.core.security import create_access_token
+    from app.models import Document, User
+
+    monkeypatch.setattr(main, "storage_service", s3_storage)
+    monkeypatch.setattr(settings, "S3_DOWNLOAD_DELIVERY", "app")
+    user = User(email="s3download@example.com", hashed_password="x", full_name="S3")
+    db_session.add(user)
+    db_session.commit()
+    documents = [
+        Document(original_filename="a.pdf", storage_filename=key, file_size=999,
+                 content_type="application/pdf", user_id=user.id)
+        for key in ("ab/cd/existe.pdf", "ab/cd/sumiu.pdf")
+    ]
+    db_session.add_all(documents)
+    db_session.commit()
+    s3_storage.s3_client.put_object(Bucket=BUCKET, Key="ab/cd/existe.pdf", Body=b"12345")
+    headers = {"Authorization": f"Bearer {create_access_token(subject=user.email)}"}
+
+    response = client.get(f"/api/v1/documents/{documents[0].id}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.content == b"12345"
+    # Tamanho e ETag vêm do objeto, não do registro do documento
+    assert response.headers["content-length"] == "5"
+    assert response.headers["etag"] == s3_storage.s3_client.head_object(
+        Bucket=BUCKET, Key="ab/cd/existe.pdf")["ETag"]
+
+    response = client.get(f"/api/v1/documents/{documents[1].id}/download", headers=headers)
+    assert response.status_code == 404
+
+
+def test_form_upload_is_stored_in_the_bucket(s3_app, client, db_session, async_session_factory, tmp_path):
+    from app.models import Document
+
+    headers = auth_headers(db_session, "s3form@example.com")
+    upload_through_form(client, headers, b"%PDF-1.4 enviado pelo formulario")
+    document = db_session.query(Document).one()
+
+    assert s3_app.s3_client.head_object(Bucket=BUCKET, Key=document.storage_filename)
+    # Nem o arquivo nem o temporário ficam no disco local
+    assert [p for p in (tmp_path / "uploads").rglob("*") if p.is_file()] == []
+
+    response = client.get(f"/api/v1/documents/{document.id}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4 enviado pelo formulario"
+
+    assert client.delete(f"/api/v1/documents/{document.id}", headers=headers).status_code == 200
+
+    async def delete_files_job():
+        async with async_session_factory() as db:
+            return await s3_app.delete_unreferenced_files(db, [document.storage_filename])
+
+    assert asyncio.run(delete_files_job()) == []
+    assert asyncio.run(s3_app.head_object(document.storage_filename)) is None
+
+
+def test_form_upload_is_delivered_and_exported_from_the_bucket(
+    s3_app, client, db_session, async_session_factory, monkeypatch
+):
+    from app.models import Document
+    from app.services.export_service import ExportService
+
+    headers = auth_headers(db_session, "s3presigned@example.com")
+    upload_through_form(client, headers, b"%PDF-1.4 pre-assinado", filename="laudo.pdf")
+    document = db_session.query(Document).one()
+
+    monkeypatch.setattr(settings, "S3_DOWNLOAD_DELIVERY", "presigned")
+    response = client.get(
+        f"/api/v1/documents/{document.id}/download", headers=headers, follow_redirects=False
+    )
+    assert response.status_code == 302
+    delivered = requests.get(response.headers["location"])
+    assert delivered.status_code == 200
+    assert delivered.content == b"%PDF-1.4 pre-assinado"
+
+    export = ExportService(session_factory=async_session_factory)
+    export._storage = s3_app
+
+    async def exported():
+        return {
+            entry.name: b"".join([chunk async for chunk in entry.open()])
+            async for entry in export.entries(document.user_id)
+        }
+
+    assert asyncio.run(exported()) == {"laudo.pdf": b"%PDF-1.4 pre-assinado"}
+
+
+def test_large_form_upload_uses_multipart(s3_app, client, db_session, monkeypatch):
+    from app.models import Document
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 20 * MB)
+    headers = auth_headers(db_session, "s3multipart@example.com")
+    upload_through_form(client, headers, b"c" * (11 * MB), filename="grande.pdf")
+    document = db_session.query(Document).one()
+
+    head = s3_app.s3_client.head_object(Bucket=BUCKET, Key=document.storage_filename)
+    assert head["ContentLength"] == 11 * MB
+    assert head["ETag"].strip('"').endswith("-3")
@@ -0,0 +1,115 @@
+import asyncio
+
+from app.models import Document, User
+from app.services.search_service import query_terms, search_service
+
+
+def seed(db_session, email, titles):
+    user = User(email=email, hashed_password="x", full_name=email)
+    db_session.add(user)
+    db_session.commit()
+    documents = []
+    for title, description, filename in titles:
+        document = Document(
+            title=title,
+            description=description,
+            original_filename=filename,
+            storage_filename=filename,
+            file_size=1,
+            content_type="application/pdf",
+            user_id=user.id
+        )
+        db_session.add(document)
+        documents.append(document)
+    db_session.commit()
+    return user.id, documents
+
+
+def run_search(async_session_factory, user_id, query, **kwargs):
+    async def scenario():
+        async with async_session_factory() as db:
+            return await search_service.search(db, user_id, query, **kwargs)
+    return asyncio.run(scenario())
+
+
+def index_all(async_session_factory, documents):
+    async def scenario():
+        async with async_session_factory() as db:
+            for document in documents:
+                await search_service.index_document(db, document)
+            await db.commit()
+    asyncio.run(scenario())
+
+
+def test_query_terms_strip_index_syntax():
+    assert query_terms('Relatório "anual" OR x* -- NEAR(') == ["relatório", "anual", "or", "x", "near"]
+    assert query_terms("  ") == []
+
+
+def test_search_ignores_accents_and_matches_prefixes(db_session, async_session_factory):
+    user_id, documents = seed(db_session, "busca@example.com", [
+        ("Relatório de Manutenção", "Frota 2024", "frota.pdf"),
+        ("Contrato de aluguel", "Imóvel comercial", "contrato_locacao.pdf"),
+    ])
+    index_all(async_session_factory, documents)
+
+    assert [d.title for d in run_search(async_session_factory, user_id, "manutencao", limit=10).items] == [
+        "Relatório de Manutenção"
+    ]
+    assert [d.title for d in run_search(async_session_factory, user_id, "RELAT", limit=10).items] == [
+        "Relatório de Manutenção"
+    ]
+    assert [d.title for d in run_search(async_session_factory, user_id, "imovel", limit=10).items] == [
+        "Contrato de aluguel"
+    ]
+    # Nome do arquivo é separado em palavras pelo tokenizador
+    assert [d.title for d in run_search(async_session_factory, user_id, "locacao", limit=10).items] == [
+        "Contrato de aluguel"
+    ]
+
+
+def test_search_is_scoped_to_owner_and_paginated(db_session, async_session_factory):
+    owner_id, owned = seed(db_session, "dono@example.com", [
+        (f"Nota fiscal {i}", None, f"nf{i}.pdf") for i in range(3)
+    ])
+    other_id, others = seed(db_session, "outro@example.com", [("Nota fiscal alheia", None, "nf.pdf")])
+    index_all(async_session_factory, owned + others)
+
+    first = run_search(async_session_factory, owner_id, "nota fiscal", limit=2)
+    second = run_search(async_session_factory, owner_id, "nota fiscal", limit=2, page=first.next_page)
+    titles = [d.title for d in first.items + second.items]
+    assert len(first.items) == 2 and first.next_page == 2
+    assert second.next_page is None
+    assert sorted(titles) == ["Nota fiscal 0", "Nota fiscal 1", "Nota fiscal 2"]
+    assert [d.title for d in run_search(async_session_factory, other_id, "nota", limit=10).items] == [
+        "Nota fiscal alheia"
+    ]
+
+
+def test_title_matches_rank_above_description(db_session, async_session_factory):
+    user_id, documents = seed(db_session, "rank@example.com", [
+        ("Comprovante", "Pagamento do seguro", "a.pdf"),
+        ("Seguro do carro", "Apólice", "b.pdf"),
+    ])
+    index_all(async_session_factory, documents)
+    assert [d.title for d in run_search(async_session_factory, user_id, "seguro", limit=10).items] == [
+        "Seguro do carro", "Comprovante"
+    ]
+
+
+def test_reindex_and_removal_keep_index_in_sync(db_session, async_session_factory):
+    user_id, documents = seed(db_session, "sync@example.com", [("Escritura", None, "documento.pdf")])
+    index_all(async_session_factory, documents)
+
+    documents[0].title = "Matrícula do imóvel"
+    db_session.commit()
+    index_all(async_session_factory, documents)
+    assert run_search(async_session_factory, user_id, "escritura", limit=10).items == []
+    assert len(run_search(async_session_factory, user_id, "matricula", limit=10).items) == 1
+
+    async def remove():
+        async with async_session_factory() as db:
+            await search_service.remove_documents(db, [documents[0].id])
+            await db.commit()
+    asyncio.run(remove())
+    assert run_search(async_session_factory, user_id, "matricula", limit=10).items == []
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.core.storage import FileTooLargeError, get_file_path, save_upload_file
+from app.db.base_class import Base
+from app.db.migrations import shard_upload_folder
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+    return tmp_path
+
+
+def make_upload(content: bytes, filename: str = "test_file.txt") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+def test_save_upload_file_streams_in_chunks(upload_dir):
+    content = os.urandom(10 * 1024 + 7)
+
+    original_filename, storage_filename, file_size = asyncio.run(
+        save_upload_file(make_upload(content))
+    )
+
+    assert original_filename == "test_file.txt"
+    assert storage_filename.endswith(".txt")
+    # Layout em shards: dois níveis de dois caracteres hexadecimais
+    assert len(storage_filename.split("/")) == 3
+    assert file_size == len(content)
+    path = asyncio.run(get_file_path(storage_filename))
+    with open(path, "rb") as f:
+        assert f.read() == content
+
+
+def test_save_upload_file_rejects_oversized_file(upload_dir):
+    content = b"x" * 4096
+
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(save_upload_file(make_upload(content), max_size=2048))
+
+    # Nenhum arquivo, nem mesmo o temporário, pode ficar na pasta de uploads
+    assert list(upload_dir.iterdir()) == []
+
+
+def test_shard_migration_moves_files_and_is_resumable(upload_dir, monkeypatch):
+    database_url = f"sqlite:///{upload_dir / 'shard.db'}"
+    monkeypatch.setattr(settings, "DATABASE_URL", database_url)
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, full_name, hashed_password, is_active, is_admin, created_at, updated_at) VALUES (1, 'a@b.com', 'A', 'x', 1, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"))
+        for i in range(1, 6):
+            conn.execute(
+                text("INSERT INTO documents (id, original_filename, storage_filename, file_size, content_type, created_at, user_id) VALUES (:id, 'a.txt', :name, 1, 'text/plain', CURRENT_TIMESTAMP, 1)"),
+                {"id": i, "name": f"flat{i}.txt"}
+            )
+            (upload_dir / f"flat{i}.txt").write_bytes(b"x")
+
+    shard_upload_folder.run_migration(batch_size=2)
+    # Rodar de novo não deve alterar nada
+    shard_upload_folder.run_migration(batch_size=2)
+
+    with engine.connect() as conn:
+        names = [row[0] for row in conn.execute(text("SELECT storage_filename FROM documents"))]
+    assert all(name.count("/") == 2 for name in names)
+    for name in names:
+        assert (upload_dir / name).read_bytes() == b"x"
+    assert not list(upload_dir.glob("flat*.txt"))
@@ -0,0 +1,175 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models import Document, User, UserUsage
+from app.services.job_queue import DatabaseJobQueue
+from app.services.usage_service import UsageService
+
+
+def auth(user):
+    return {"Authorization": f"Bearer {create_access_token(subject=user.email)}"}
+
+
+def upload(client, user, content, title="Doc"):
+    return client.post(
+        "/api/v1/documents/",
+        headers=auth(user),
+        files={"file": ("nota.txt", content, "text/plain")},
+        data={"title": title},
+        follow_redirects=False,
+    )
+
+
+def test_counters_follow_uploads_and_deletes(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    user = User(email="uso@example.com", hashed_password="x", full_name="Uso")
+    db_session.add(user)
+    db_session.commit()
+
+    assert upload(client, user, b"12345").status_code == 303
+    assert upload(client, user, b"123").status_code == 303
+    usage = db_session.get(UserUsage, user.id)
+    assert (usage.document_count, usage.bytes_used) == (2, 8)
+
+    first = db_session.scalars(select(Document).order_by(Document.id)).first()
+    assert client.delete(f"/api/v1/documents/{first.id}", headers=auth(user)).status_code == 200
+    db_session.expire_all()
+    usage = db_session.get(UserUsage, user.id)
+    assert (usage.document_count, usage.bytes_used) == (1, 3)
+
+
+def test_quota_rejects_upload_and_keeps_nothing(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 10)
+    user = User(email="cota@example.com", hashed_password="x", full_name="Cota")
+    db_session.add(user)
+    db_session.commit()
+
+    assert upload(client, user, b"x" * 8).status_code == 303
+    response = upload(client, user, b"x" * 5)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Cota de armazenamento excedida"
+
+    assert len(db_session.scalars(select(Document)).all()) == 1
+    assert len(list(tmp_path.rglob("*.txt"))) == 1
+    assert db_session.get(UserUsage, user.id).bytes_used == 8
+
+
+def test_batch_upload_skips_files_over_quota(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 10)
+    user = User(email="lotecota@example.com", hashed_password="x", full_name="Lote")
+    db_session.add(user)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/documents/batch",
+        headers=auth(user),
+        files=[
+            ("files", ("a.txt", b"x" * 6, "text/plain")),
+            ("files", ("b.txt", b"x" * 6, "text/plain")),
+            ("files", ("c.txt", b"x" * 4, "text/plain")),
+        ],
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "error", "created"]
+    usage = db_session.get(UserUsage, user.id)
+    assert (usage.document_count, usage.bytes_used) == (2, 10)
+
+
+def test_reconcile_fixes_drift(db_session, async_session_factory):
+    users = [User(email=f"r{n}@example.com", hashed_password="x", full_name="R") for n in range(3)]
+    db_session.add_all(users)
+    db_session.commit()
+    db_session.add_all([
+        Document(title="A", original_filename="a.pdf", storage_filename="a.pdf",
+                 file_size=100, content_type="application/pdf", user_id=users[0].id),
+        Document(title="B", original_filename="b.pdf", storage_filename="b.pdf",
+                 file_size=20, content_type="application/pdf", user_id=users[0].id),
+    ])
+    # Contadores errados: sem linha, a mais e correto
+    db_session.add(UserUsage(user_id=users[1].id, document_count=4, bytes_used=999))
+    db_session.add(UserUsage(user_id=users[2].id, document_count=0, bytes_used=0))
+    db_session.commit()
+    service = UsageService(async_session_factory, DatabaseJobQueue(async_session_factory))
+
+    result = asyncio.run(service.reconcile(batch_size=2))
+    assert (result.checked, result.fixed, result.done) == (3, 2, True)
+
+    db_session.expire_all()
+    assert [
+        (usage.document_count, usage.bytes_used)
+        for usage in db_session.scalars(select(UserUsage).order_by(UserUsage.user_id))
+    ] == [(2, 120), (0, 0), (0, 0)]
+
+
+def test_batch_crossing_quota_partway_keeps_the_files_that_fit(client, db_session, tmp_path, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 10)
+    # Tamanhos desconhecidos antes da gravação: a checagem prévia deixa todos passarem
+    async def sizes_unknown(db, user_id, pending):
+        return pending
+    monkeypatch.setattr(main, "mark_over_quota", sizes_unknown)
+    user = User(email="lotemeio@example.com", hashed_password="x", full_name="Lote")
+    db_session.add(user)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/documents/batch",
+        headers=auth(user),
+        files=[
+            ("files", ("a.txt", b"a" * 6, "text/plain")),
+            ("files", ("b.txt", b"b" * 6, "text/plain")),
+            ("files", ("c.txt", b"c" * 4, "text/plain")),
+        ],
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["created", "error", "created"]
+    assert results[1]["error"] == "Cota de armazenamento excedida"
+    usage = db_session.get(UserUsage, user.id)
+    assert (usage.document_count, usage.bytes_used) == (2, 10)
+    # Só o arquivo recusado foi apagado
+    assert sorted(p.read_bytes() for p in tmp_path.rglob("*.txt")) == [b"a" * 6, b"c" * 4]
+
+
+def test_edit_over_quota_keeps_file_and_usage(client, db_session, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import crud
+    from app.main import app
+
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_QUOTA_BYTES", 10)
+    user = User(email="edicaocota@example.com", hashed_password="x", full_name="Edição")
+    db_session.add(user)
+    db_session.commit()
+    assert upload(client, user, b"x" * 8, title="Original").status_code == 303
+    document = db_session.scalars(select(Document)).one()
+
+    # A checagem prévia deixa passar (ex.: outro envio ocupou a cota no meio):
+    # só a cobrança depois da gravação percebe o estouro
+    async def fits(db, user_id, incoming_bytes):
+        return True
+    monkeypatch.setattr(crud.usage, "fits_quota", fits)
+    response = TestClient(app, raise_server_exceptions=False).post(
+        f"/documents/{document.id}/edit",
+        headers=auth(user),
+        data={"title": "Novo título"},
+        files={"file": ("maior.txt", b"y" * 20, "text/plain")},
+        follow_redirects=False,
+    )
+    assert response.status_code != 302
+
+    db_session.expire_all()
+    unchanged = db_session.get(Document, document.id)
+    assert (unchanged.title, unchanged.storage_filename, unchanged.file_size) == (
+        "Original", document.storage_filename, 8
+    )
+    assert [p.read_bytes() for p in tmp_path.rglob("*.txt")] == [b"x" * 8]
+    usage = db_session.get(UserUsage, user.id)
+    assert (usage.document_count, usage.bytes_used) == (1, 8)
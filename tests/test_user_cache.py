@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime
+
+from app.core.user_cache import CurrentUser, MemoryUserCache
+
+
+def make_user(email: str) -> CurrentUser:
+    return CurrentUser(
+        id=1,
+        email=email,
+        full_name="Teste",
+        is_active=True,
+        is_admin=False,
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryUserCache(ttl=60, max_entries=2)
+
+    async def scenario():
+        await cache.set("a@x.com", make_user("a@x.com"))
+        await cache.set("b@x.com", make_user("b@x.com"))
+        await cache.get("a@x.com")
+        await cache.set("c@x.com", make_user("c@x.com"))
+        return [await cache.get(email) for email in ("a@x.com", "b@x.com", "c@x.com")]
+
+    a, b, c = asyncio.run(scenario())
+    assert a is not None and c is not None
+    assert b is None
+
+
+def test_memory_cache_expires_and_invalidates():
+    cache = MemoryUserCache(ttl=0, max_entries=10)
+    asyncio.run(cache.set("a@x.com", make_user("a@x.com")))
+    assert asyncio.run(cache.get("a@x.com")) is None
+
+    cache = MemoryUserCache(ttl=60, max_entries=10)
+    asyncio.run(cache.set("a@x.com", make_user("a@x.com")))
+    asyncio.run(cache.invalidate("a@x.com", "nunca@x.com"))
+    assert asyncio.run(cache.get("a@x.com")) is None
+
+
+def test_current_user_json_round_trip():
+    user = make_user("a@x.com")
+    assert CurrentUser.from_json(user.to_json()) == user
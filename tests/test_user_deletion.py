@@ -0,0 +1,119 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Document, Job, StorageBlob, User
+from app.services.job_queue import DatabaseJobQueue
+from app.services.storage_service import StorageService
+from app.services.user_deletion_service import UserDeletionService
+
+
+def seed_user_with_documents(db_session, count):
+    owner = User(email="saindo@example.com", hashed_password="x", full_name="Saindo")
+    other = User(email="fica@example.com", hashed_password="x", full_name="Fica")
+    db_session.add_all([owner, other])
+    db_session.commit()
+    # "comum.pdf" também é usado por outro usuário (deduplicação)
+    names = ["comum.pdf"] + [f"proprio{n}.pdf" for n in range(1, count)]
+    db_session.add_all([
+        Document(
+            title=f"Doc {n}", original_filename=name, storage_filename=name,
+            file_size=1, content_type="application/pdf", user_id=owner.id
+        )
+        for n, name in enumerate(names)
+    ])
+    db_session.add(Document(
+        title="Compartilhado", original_filename="comum.pdf", storage_filename="comum.pdf",
+        file_size=1, content_type="application/pdf", user_id=other.id
+    ))
+    db_session.add(StorageBlob(storage_filename="comum.pdf", file_size=1, ref_count=2))
+    db_session.commit()
+    return owner, other
+
+
+def test_purge_deletes_in_batches_and_keeps_shared_files(db_session, async_session_factory):
+    owner, other = seed_user_with_documents(db_session, 5)
+    owner_id, other_id = owner.id, other.id
+    service = UserDeletionService(async_session_factory, DatabaseJobQueue(async_session_factory))
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await service.request_deletion(db, owner)
+            await db.commit()
+        return await service.purge_user(owner.id, batch_size=2)
+
+    assert asyncio.run(scenario()) is True
+    db_session.expire_all()
+    assert db_session.get(User, owner_id) is None
+    assert [doc.user_id for doc in db_session.scalars(select(Document))] == [other_id]
+    assert db_session.get(StorageBlob, "comum.pdf").ref_count == 1
+
+    jobs = db_session.scalars(select(Job).order_by(Job.id)).all()
+    assert [job.kind for job in jobs] == ["purge_user"] + ["delete_files"] * 3
+    deleted = [name for job in jobs[1:] for name in job.payload["storage_filenames"]]
+    assert sorted(deleted) == [f"proprio{n}.pdf" for n in range(1, 5)]
+
+
+def test_purge_stops_at_time_budget_and_reschedules(db_session, async_session_factory):
+    owner, _ = seed_user_with_documents(db_session, 3)
+    queue = DatabaseJobQueue(async_session_factory)
+    service = UserDeletionService(async_session_factory, queue)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await service.request_deletion(db, owner)
+            await db.commit()
+        # O job original já foi pego por um worker; a continuação entra na fila
+        await queue.claim("worker-a", 1)
+        finished = await service.purge_user(owner.id, batch_size=2, time_budget=-1)
+        async with async_session_factory() as db:
+            remaining = await service.remaining_documents(db, owner.id)
+        return finished, remaining
+
+    assert asyncio.run(scenario()) == (False, 1)
+    db_session.expire_all()
+    assert db_session.get(User, owner.id).is_active is False
+    queued = db_session.scalars(select(Job).where(Job.kind == "purge_user", Job.status == "queued")).all()
+    assert [job.payload for job in queued] == [{"user_id": owner.id}]
+
+
+def test_delete_unreferenced_files_skips_files_in_use(db_session, async_session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    owner, _ = seed_user_with_documents(db_session, 1)
+    for name in ("comum.pdf", "solto1.pdf", "solto2.pdf"):
+        (tmp_path / name).write_bytes(b"x")
+
+    async def scenario():
+        async with async_session_factory() as db:
+            return await StorageService().delete_unreferenced_files(
+                db, ["comum.pdf", "solto1.pdf", "solto2.pdf", "solto1.pdf"]
+            )
+
+    assert asyncio.run(scenario()) == []
+    assert sorted(path.name for path in tmp_path.glob("*.pdf")) == ["comum.pdf"]
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.calls = []
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        self.calls.append(len(keys))
+        return {"Errors": [{"Key": key, "Message": "AccessDenied"} for key in keys if key == "bloqueado"]}
+
+
+def test_s3_files_are_deleted_in_batches_of_1000(db_session, async_session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "s3")
+    storage = StorageService.__new__(StorageService)
+    storage.s3_client = FakeS3Client()
+    storage.bucket_name = "guardadocs-test"
+    names = [f"arquivo{n}" for n in range(2499)] + ["bloqueado"]
+
+    async def scenario():
+        async with async_session_factory() as db:
+            return await storage.delete_unreferenced_files(db, names)
+
+    assert asyncio.run(scenario()) == ["bloqueado"]
+    assert sorted(storage.s3_client.calls) == [500, 1000, 1000]
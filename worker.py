@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.core.log import setup_logging
+from app.db.session import async_engine
+from app.services import jobs  # noqa: F401  (registra os handlers)
+from app.services.job_queue import JobWorker, job_queue
+
+logger = logging.getLogger("app.worker")
+
+async def main(concurrency: int, burst: bool):
+    worker = JobWorker(job_queue, concurrency=concurrency)
+    try:
+        if burst:
+            # Processa o que está pronto e sai (cron, testes manuais)
+            await worker.run_until_empty()
+            return
+        
+        # SIGTERM/SIGINT: para de pegar jobs e espera os que estão rodando
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info("Worker %s aguardando jobs (%s simultâneos)", worker.worker_id, worker.concurrency)
+        await worker.run(stop)
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa os jobs em segundo plano do GuardaDocs")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--burst", action="store_true", help="Sai quando não houver mais jobs prontos")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(main(args.concurrency, args.burst))